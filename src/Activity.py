@@ -0,0 +1,113 @@
+import numpy as np
+import Vehicle
+
+class ActivityTracker:
+    def __init__(self):
+        """
+        Puts the intersections of a network to sleep while they are idle, and wakes them up as soon
+        as something can happen at them, so that sleeping intersections cost nothing per time-step.
+
+        An intersection falls asleep at the start of a time-step if it is idle (see
+        BaseModel.FourWayIntersectionSimulator.idle) and no vehicle is heading for it. While asleep,
+        only its clock is advanced and the time-step sizes are kept. It wakes up when a vehicle is
+        routed toward it, when one of its queues is due to generate a vehicle, or when its state is
+        read, and then elapses the skipped time-steps in bulk, ending up as if it had never slept.
+
+        network : BaseModel.IntersectionNetworkSimulator
+            The network whose intersections are tracked.
+        sleeping : dict
+            The sizes of the time-steps skipped by each sleeping intersection, keyed by grid index.
+        wake_times : dict
+            The time [s] at which each sleeping intersection generates its next vehicle, keyed by
+            grid index.
+        num_skipped : int
+            Total nbr. of intersection time-steps slept through.
+        """
+        self.network = None
+        self.sleeping = dict()
+        self.wake_times = dict()
+        self.num_skipped = 0
+
+    def initialize(self, network) -> None:
+        """
+        Initializes the ActivityTracker instance.
+
+        network : BaseModel.IntersectionNetworkSimulator
+            The network whose intersections are tracked. All of them start awake.
+        """
+        self.network = network
+        self.sleeping = dict()
+        self.wake_times = dict()
+        self.num_skipped = 0
+
+    def idle(self, grid_ind: (int,int)) -> bool:
+        """
+        Returns whether an intersection is idle and no vehicle is heading for it.
+
+        grid_ind : (int,int)
+            The grid index of the intersection.
+        """
+        if not self.network.intersections[grid_ind].idle():
+            return False
+
+        for direction in Vehicle.DIRECTIONS:
+            if len(self.network.vehicle_index[(grid_ind, direction)]) > 0:
+                return False
+
+        return True
+
+    def asleep(self, grid_ind: (int,int), delta_t: float) -> bool:
+        """
+        Returns whether an intersection sleeps through the current time-step, which it then counts as
+        skipped. Puts the intersection to sleep if it has become idle, and wakes it up if one of its
+        queues is due to generate a vehicle.
+
+        grid_ind : (int,int)
+            The grid index of the intersection.
+        delta_t : float
+            The time-step size.
+        """
+        intersection = self.network.intersections[grid_ind]
+        skipped = self.sleeping.get(grid_ind)
+
+        if skipped == None:
+            if not self.idle(grid_ind):
+                return False
+
+            wake_time = intersection.next_arrival_time()
+            if intersection.time >= wake_time:
+                return False
+
+            skipped = []
+            self.sleeping[grid_ind] = skipped
+            self.wake_times[grid_ind] = wake_time
+        elif intersection.time >= self.wake_times[grid_ind]:
+            self.wake(grid_ind)
+            return False
+
+        skipped += [delta_t]
+        intersection.time += delta_t
+        self.num_skipped += 1
+
+        return True
+
+    def wake(self, grid_ind: (int,int)) -> None:
+        """
+        Wakes an intersection up, elapsing the time-steps it has skipped. Does nothing if it is awake
+        or outside the network.
+
+        grid_ind : (int,int)
+            The grid index of the intersection.
+        """
+        skipped = self.sleeping.pop(grid_ind, None)
+
+        if skipped != None:
+            del self.wake_times[grid_ind]
+            self.network.intersections[grid_ind].skip(delta_ts=np.array(skipped, dtype=float))
+
+    def wake_all(self) -> None:
+        """
+        Wakes all intersections up, so that the whole network's state is up to date.
+        """
+        for grid_ind in list(self.sleeping):
+            self.wake(grid_ind)
@@ -1,19 +1,33 @@
 import random
+import collections
+import itertools
 import numpy as np
 import Vehicle
+import VehicleArray
+import Recorder
+import RandomPool
+import NetworkSpec
+import Profiler
+import Activity
+import Partition
+import Renderer
+import Trajectory
+import Checkpoint
 import TrafficLight
 import math
 import matplotlib
 import matplotlib.pyplot as plt
-import matplotlib.animation as manimation
 import pickle as pkl
+import os
 from pathlib import Path
 
 class Queue:
     def __init__(self):
         """
-        vehicles : list(Vehicle.Vehicle)
-            List (FIFO) of vehicles contained within this queue.
+        vehicles : collections.deque(Vehicle.Vehicle)
+            Deque (FIFO) of vehicles contained within this queue.
+        members : set(Vehicle.Vehicle)
+            The vehicles contained within this queue, for constant-time membership checks.
         direction : (float, float)
             Travel direction of this queue.
         head_position : (float, float)
@@ -26,8 +40,11 @@ class Queue:
             Rate at which vehicles arrive to the queue [1/s].
         departure_rate : float
             Rate at which vehicles depart from the queue [1/s].
+        platoon_size_table : RandomPool.AliasTable
+            Alias table over platoon_size_distribution, for sampling platoon sizes.
         """
-        self.vehicles = []
+        self.vehicles = collections.deque()
+        self.members = set()
         self.departing_vehicle = None
         self.last_arriving_vehicle = None
         self.direction = (0, 0)
@@ -38,6 +55,7 @@ class Queue:
         self.arrival_rate = 0
         self.departure_rate = 0
         self.platoon_size_distribution = []
+        self.platoon_size_table = None
     
     def initialize(self, avg_departure_time: float, direction: (int, int), head_position: (float, float), arrival_rate=lambda t: 0, platoon_size_distribution=[1.]) -> None:
         """
@@ -61,6 +79,7 @@ class Queue:
         self.tail_position = head_position
         self.edge_position = (head_position[0]-direction[0]*50, head_position[1]-direction[1]*50)
         self.platoon_size_distribution = platoon_size_distribution
+        self.platoon_size_table = RandomPool.AliasTable(platoon_size_distribution)
     
     def append(self, vehicle: Vehicle.Vehicle) -> bool:
         """
@@ -69,7 +88,7 @@ class Queue:
         vehicle : Vehicle.Vehicle
             The vehicle to be appended to the queue.
         """
-        if vehicle not in self.vehicles:
+        if vehicle not in self.members:
             #vehicle.stop()
             if len(self.vehicles) > 0:
                 if vehicle.speed <= 0:
@@ -77,7 +96,8 @@ class Queue:
             #else:
                 #if vehicle.speed <= 0:
                     #vehicle.update_position(new_position=(self.tail_position[0], self.tail_position[1]))
-            self.vehicles += [vehicle]
+            self.vehicles.append(vehicle)
+            self.members.add(vehicle)
             self.queue_length = len(self.vehicles)
              
             return True
@@ -90,8 +110,9 @@ class Queue:
         if len(self.vehicles) > 0:
             departing_vehicle = self.vehicles[0]
             
-            if (departing_vehicle.direction == Vehicle.NORTH and departing_vehicle.position[1] >= self.head_position[1]) or (departing_vehicle.direction == Vehicle.EAST and departing_vehicle.position[0] >= self.head_position[0]) or (departing_vehicle.direction == Vehicle.SOUTH and departing_vehicle.position[1] <= self.head_position[1]) or (departing_vehicle.direction == Vehicle.WEST and departing_vehicle.position[0] <= self.head_position[0]):
-                self.vehicles.remove(departing_vehicle)
+            if (departing_vehicle.heading == Vehicle.NORTH_CODE and departing_vehicle.position[1] >= self.head_position[1]) or (departing_vehicle.heading == Vehicle.EAST_CODE and departing_vehicle.position[0] >= self.head_position[0]) or (departing_vehicle.heading == Vehicle.SOUTH_CODE and departing_vehicle.position[1] <= self.head_position[1]) or (departing_vehicle.heading == Vehicle.WEST_CODE and departing_vehicle.position[0] <= self.head_position[0]):
+                self.vehicles.popleft()
+                self.members.discard(departing_vehicle)
                 self.queue_length = len(self.vehicles)
                 self.update_tail_position()
                 self.departing_vehicle = departing_vehicle
@@ -103,33 +124,55 @@ class Queue:
                 
         return None
     
+    def dequeue(self) -> Vehicle.Vehicle:
+        """
+        Removes the frontmost vehicle from the queue, regardless of its position.
+        """
+        if len(self.vehicles) > 0:
+            departing_vehicle = self.vehicles.popleft()
+            self.members.discard(departing_vehicle)
+            self.queue_length = len(self.vehicles)
+            
+            if departing_vehicle == self.last_arriving_vehicle:
+                self.last_arriving_vehicle = None
+                
+            return departing_vehicle
+        
+        return None
+    
+    def __setstate__(self, state: dict) -> None:
+        # Queues pickled before vehicles were kept in a deque hold a list and no members.
+        self.__dict__.update(state)
+        self.vehicles = collections.deque(self.vehicles)
+        self.members = set(self.vehicles)
+    
     def update_tail_position(self) -> None:
         if len(self.vehicles) > 0:
             self.tail_position = self.vehicles[-1].tail_position
             
         elif self.departing_vehicle != None:
-            if self.departing_vehicle.direction == Vehicle.NORTH:
+            if self.departing_vehicle.heading == Vehicle.NORTH_CODE:
                 if self.departing_vehicle.tail_position[1] > self.head_position[1]:
                     self.departing_vehicle = None
                     self.tail_position = self.head_position
                 else:
                     self.tail_position = (self.departing_vehicle.tail_position[0], self.departing_vehicle.tail_position[1]-3)
                         
-            elif self.departing_vehicle.direction == Vehicle.EAST:
+            elif self.departing_vehicle.heading == Vehicle.EAST_CODE:
                 if self.departing_vehicle.tail_position[0] > self.head_position[0]:
                     self.departing_vehicle = None
                     self.tail_position = self.head_position
                 else:
                     self.tail_position = (self.departing_vehicle.tail_position[0]-3, self.departing_vehicle.tail_position[1])
                     
-            elif self.departing_vehicle.direction == Vehicle.SOUTH:
+            elif self.departing_vehicle.heading == Vehicle.SOUTH_CODE:
                 if self.departing_vehicle.tail_position[1] < self.head_position[1]:
                     self.departing_vehicle = None
                     self.tail_position = self.head_position
                 else:
                     self.tail_position = (self.departing_vehicle.tail_position[0], self.departing_vehicle.tail_position[1]+3)
                     
-            elif self.departing_vehicle.direction == Vehicle.WEST:
+            elif self.departing_vehicle.heading == Vehicle.WEST_CODE:
                 if self.departing_vehicle.tail_position[0] < self.head_position[0]:
                     self.departing_vehicle = None
                     self.tail_position = self.head_position
@@ -145,8 +188,10 @@ class Queue:
 class ConnectedQueue(Queue):
     def __init__(self):
         """
-        vehicles : list(Vehicle.Vehicle)
-            List (FIFO) of vehicles contained within this queue.
+        vehicles : collections.deque(Vehicle.Vehicle)
+            Deque (FIFO) of vehicles contained within this queue.
+        members : set(Vehicle.Vehicle)
+            The vehicles contained within this queue, for constant-time membership checks.
         direction : (float, float)
             Travel direction of this queue.
         head_position : (float, float)
@@ -160,7 +205,8 @@ class ConnectedQueue(Queue):
         departure_rate : float
             Rate at which vehicles depart from the queue [1/s].
         """
-        self.vehicles = []
+        self.vehicles = collections.deque()
+        self.members = set()
         self.direction = (0, 0)
         self.head_position = (0, 0)
         self.tail_position = (0, 0)
@@ -196,31 +242,39 @@ class QueueSimulator:
             Time since last arrival to the queue [s].
         time_served : float
             Amount of time frontmost vehicle has been served without departing from queue [s].
-        queue_length : list(int)
+        queue_length : Recorder.TimeSeries
             Nbr of vehicles in queue over time.
-        departures : list(int)
+        departures : Recorder.TimeSeries
             Total nbr of departures over time.
-        arrivals : list(int)
+        arrivals : Recorder.TimeSeries
             Totalt nbr of arrivals over time.
+        num_generated : int
+            Total nbr of vehicles generated by the queue.
         tot_wait_time : float
             Total wait time for all vehicles that are and have been in the queue.
         next_arrival_timestamp : float
             The timestamp at which the next arrival occurs.
         next_time_to_depart : float
             The time between the last departure and the next [s].
+        vehicle_type : callable
+            Creates the vehicles arriving to the queue.
+        random_pool : RandomPool.RandomPool
+            The buffered random draws of the queue.
         """
         self.queue = Queue()
         self.time = 0
         self.time_since_arrival = 0
         self.time_served = 0
-        self.queue_length = [0]
-        self.departures = [0]
-        self.arrivals = [0]
+        self.queue_length = Recorder.TimeSeries()
+        self.departures = Recorder.TimeSeries()
+        self.arrivals = Recorder.TimeSeries()
+        self.num_generated = 0
         self.tot_wait_time = 0
         self.next_arrival_timestamp = 0
         self.visual = None
         self.edge = True
-        self.random_variable = random.random()
+        self.vehicle_type = Vehicle.Vehicle
+        self.random_pool = RandomPool.RandomPool()
         
     def initialize(self, avg_departure_time=np.inf, arrival_rate=lambda t: 0, direction=Vehicle.NORTH, head_position=(0.,0.), platoon_size_distribution=[1.]) -> None:
         """
@@ -263,75 +317,55 @@ class QueueSimulator:
         self.time_served += delta_t
         
     def update_vehicle_positions(self, delta_t: float, saturation_rate: float) -> None:
+        """
+        Stops or accelerates the queued vehicles depending on their distance to the vehicle ahead.
+        
+        The vehicles are projected onto the queue's axis, so that every direction reduces to the
+        same comparison: a vehicle within reach of the queue's head (the frontmost one) or within
+        3 m of the tail of the vehicle ahead (the others) stops when the light is red, and moves
+        on otherwise.
+        
+        delta_t : float
+            The time-step size.
+        saturation_rate : float
+            The current saturation rate. Determined by an external traffic light.
+        """
         self.queue.update_tail_position()
         
-        vehicle_tail_positions = [(vehicle.tail_position[0], vehicle.tail_position[1]) for vehicle in self.queue.vehicles]
-        
-        for i,vehicle in enumerate(self.queue.vehicles):
-            if vehicle.direction == Vehicle.NORTH:
-                if i == 0:
-                    if vehicle.position[1] > self.queue.head_position[1] - vehicle.full_speed*delta_t:
-                        if saturation_rate <= 0:
-                            vehicle.stop()
-                            vehicle.update_position(new_position=self.queue.head_position)
-                    elif vehicle.speed <= 0 and vehicle.position != self.queue.head_position:
-                        vehicle.accelerate()
-                elif i > 0:
-                    if vehicle.position[1] > vehicle_tail_positions[i-1][1] - vehicle.full_speed*delta_t - 3:
-                        #vehicle.update_position(new_position=(vehicle_tail_positions[i-1][0], vehicle_tail_positions[i-1][1]-2))
-                        if saturation_rate <= 0:
-                            vehicle.stop()
-                    else:
-                        vehicle.accelerate()
-                    
-            elif vehicle.direction == Vehicle.EAST:
-                if i == 0:
-                    if vehicle.position[0] > self.queue.head_position[0] - vehicle.full_speed*delta_t:
-                        if saturation_rate <= 0:
-                            vehicle.stop()
-                            vehicle.update_position(new_position=self.queue.head_position)
-                    elif vehicle.speed <= 0 and vehicle.position != self.queue.head_position:
-                        vehicle.accelerate()
-                elif i > 0:
-                    if vehicle.position[0] > vehicle_tail_positions[i-1][0] - vehicle.full_speed*delta_t - 3:
-                        #vehicle.update_position(new_position=(vehicle_tail_positions[i-1][0]-2, vehicle_tail_positions[i-1][1]))
-                        if saturation_rate <= 0:
-                            vehicle.stop()
-                    else:
-                        vehicle.accelerate()
-                    
-            elif vehicle.direction == Vehicle.SOUTH:
-                if i == 0:
-                    if vehicle.position[1] < self.queue.head_position[1] + vehicle.full_speed*delta_t:
-                        if saturation_rate <= 0:
-                            vehicle.stop()
-                            vehicle.update_position(new_position=self.queue.head_position)
-                    elif vehicle.speed <= 0 and vehicle.position != self.queue.head_position:
-                        vehicle.accelerate()
-                elif i > 0:
-                    if vehicle.position[1] < vehicle_tail_positions[i-1][1] + vehicle.full_speed*delta_t + 3:
-                        #vehicle.update_position(new_position=(vehicle_tail_positions[i-1][0], vehicle_tail_positions[i-1][1]+2))
-                        if saturation_rate <= 0:
-                            vehicle.stop()
-                    else:
-                        vehicle.accelerate()
-                    
-            elif vehicle.direction == Vehicle.WEST:
-                if i == 0:
-                    if vehicle.position[0] < self.queue.head_position[0] + vehicle.full_speed*delta_t:
-                        if saturation_rate <= 0:
-                            vehicle.stop()
-                            vehicle.update_position(new_position=self.queue.head_position)
-                    elif vehicle.speed <= 0 and vehicle.position != self.queue.head_position:
-                        vehicle.accelerate()
-                elif i > 0:
-                    if vehicle.position[0] < vehicle_tail_positions[i-1][0] + vehicle.full_speed*delta_t + 3:
-                        #vehicle.update_position(new_position=(vehicle_tail_positions[i-1][0]+2, vehicle_tail_positions[i-1][1]))
-                        if saturation_rate <= 0:
-                            vehicle.stop()
-                    else:
-                        vehicle.accelerate()
+        if len(self.queue.vehicles) <= 0:
+            return
+        
+        code = Vehicle.direction_code(self.queue.direction)
+        axis = Vehicle.AXES[code]
+        sign = Vehicle.SIGNS[code]
+        
+        if sign == 0:
+            return
+        
+        head = self.queue.vehicles[0]
+        # The vehicles behind follow the head's tail as it was before the head is moved.
+        head_tail = sign*head.tail_position[axis]
+        
+        if sign*head.position[axis] > sign*self.queue.head_position[axis]-head.full_speed*delta_t:
+            if saturation_rate <= 0:
+                head.stop()
+                head.update_position(new_position=self.queue.head_position)
+        elif head.speed <= 0 and head.position != self.queue.head_position:
+            head.accelerate()
+        
+        vehicles = iter(self.queue.vehicles)
+        next(vehicles)
+        tail = head_tail
+        
+        for vehicle in vehicles:
+            if sign*vehicle.position[axis] > tail-vehicle.full_speed*delta_t-3:
+                if saturation_rate <= 0:
+                    vehicle.stop()
+            else:
+                vehicle.accelerate()
             
+            tail = sign*vehicle.tail_position[axis]
+    
     def adjust_position(self, vehicle) -> None:
         """
         Adjusts the position of the vehicle to this queue.
@@ -356,15 +390,82 @@ class QueueSimulator:
     
     def get_stats(self) -> (list, list, list, float):
         """
-        Returns stats.
+        Returns stats. The series are copied into lists, so they do not change as the simulation
+        continues.
+        """
+        return self.queue_length[1:].tolist(), self.departures[1:].tolist(), self.arrivals[1:].tolist(), self.avg_wait_time()
+    
+    def reserve(self, num_steps: int) -> None:
+        """
+        Preallocates the recorded series for a known nbr. of additional time-steps.
+        
+        num_steps : int
+            The nbr. of time-steps still to be run.
+        """
+        self.queue_length.reserve(num_steps)
+        self.departures.reserve(num_steps)
+        self.arrivals.reserve(num_steps)
+    
+    def idle(self) -> bool:
+        """
+        Returns whether time-steps leave the queue unchanged apart from its clocks and recorded
+        series, as long as no vehicle arrives to it: it is empty, no departed vehicle is still
+        leaving it and it has not just had an arrival.
+        """
+        return len(self.queue.vehicles) <= 0 and getattr(self.queue, "departing_vehicle", None) == None and self.time_since_arrival > 0
+    
+    def next_arrival_time(self) -> float:
+        """
+        Returns the time [s] at which the queue next generates a vehicle of its own. Infinite if it
+        never does.
         """
-        return self.queue_length[1:], self.departures[1:], self.arrivals[1:], self.avg_wait_time()
+        return np.inf
+    
+    def skip(self, delta_ts: np.ndarray) -> None:
+        """
+        Elapses several time-steps of an idle queue at once, leaving it as run_event would.
+        
+        delta_ts : np.ndarray
+            The time-step sizes.
+        """
+        num_steps = len(delta_ts)
+        
+        self.queue.update_tail_position()
+        self.arrivals.pad(len(self.arrivals)+num_steps, self.arrivals[-1])
+        self.departures.pad(len(self.departures)+num_steps, self.departures[-1])
+        self.queue_length.pad(len(self.queue_length)+num_steps, self.queue.queue_length)
+        
+        self.time = Recorder.cumulative(self.time, delta_ts)[-1].item()
+        self.time_since_arrival = Recorder.cumulative(self.time_since_arrival, delta_ts)[-1].item()
+        self.time_served = Recorder.cumulative(self.time_served, delta_ts)[-1].item()
+    
+    def hold(self, num_steps: int) -> None:
+        """
+        Records time-steps in which nothing happens, repeating the last recorded entries. Follows a
+        run_event covering several time-steps at once.
+        
+        num_steps : int
+            The nbr. of time-steps to record.
+        """
+        self.arrivals.pad(len(self.arrivals)+num_steps, self.arrivals[-1])
+        self.departures.pad(len(self.departures)+num_steps, self.departures[-1])
+        self.queue_length.pad(len(self.queue_length)+num_steps, self.queue_length[-1])
+    
+    def sample_platoon_size(self) -> int:
+        """
+        Returns a sampled platoon size of an arrival. Unseeded queues sample it from np.random, as
+        they always have.
+        """
+        if not self.random_pool.independent():
+            return np.random.choice(range(1,len(self.queue.platoon_size_distribution)+1), p=self.queue.platoon_size_distribution)
+        
+        return self.queue.platoon_size_table.sample(self.random_pool.random())+1
     
     def generate_vehicle(self) -> None:
         self.queue.update_tail_position()
         tail_position = self.queue.tail_position
         
-        vehicle = Vehicle.Vehicle()
+        vehicle = self.vehicle_type()
         vehicle.initialize(position=self.queue.edge_position, direction=self.queue.direction)
         
         if self.queue.last_arriving_vehicle != None:
@@ -380,6 +481,7 @@ class QueueSimulator:
            
         self.time_since_arrival = 0
         self.queue.last_arriving_vehicle = vehicle
+        self.num_generated += 1
         
         return vehicle
         
@@ -414,6 +516,12 @@ class FourWayIntersectionSimulator:
             The width of the roads.
         time : float
             The current simulation time [s].
+        green_onsets_ns : [(int, int)]
+            The step indices of the last two north-south green onsets and the nbr. of queued vehicles at each.
+        green_onsets_ew : [(int, int)]
+            The step indices of the last two east-west green onsets and the nbr. of queued vehicles at each.
+        num_queued_vehicles : Recorder.TimeSeries
+            Total nbr. of vehicles queued at the intersection over time.
         """
         self.queue_n = ConnectedQueueSimulator()
         self.queue_w = ConnectedQueueSimulator()
@@ -428,7 +536,7 @@ class FourWayIntersectionSimulator:
         self.estimator = None
         self.horizontal_crossers = []
         self.vertical_crossers = []
-        self.num_queued_vehicles = [0]
+        self.num_queued_vehicles = Recorder.TimeSeries()
         self.avg_clearance_rate_ns = 0.
         self.avg_clearance_rate_ew = 0.
         self.arrivals = 0
@@ -436,6 +544,8 @@ class FourWayIntersectionSimulator:
         self.arrivals_on_green_rate = 0.
         self.cum_clearance_rate_ns = 0.
         self.cum_clearance_rate_ew = 0.
+        self.green_onsets_ns = []
+        self.green_onsets_ew = []
         self.avg_wait_time = 0.
         
     def set_queues(self, queue_n=None, queue_w=None, queue_s=None, queue_e=None) -> None:
@@ -526,27 +636,193 @@ class FourWayIntersectionSimulator:
         self.queue_e.initialize(arrival_rate=arrival_rate_e, avg_departure_time=avg_departure_time, direction=self.queue_e.direction, head_position=self.queue_e.head_position, platoon_size_distribution=platoon_size_distribution)
         
     def queue_vehicle(self, arriving_vehicle) -> None:
-        if arriving_vehicle.direction == Vehicle.NORTH:
+        if arriving_vehicle.heading == Vehicle.NORTH_CODE:
             if self.queue_n.queue.append(vehicle=arriving_vehicle):
                 self.arrivals += 1
                 if self.traffic_light_ns.saturation_rate() > 0:
                     self.arrivals_on_green += 1
-        elif arriving_vehicle.direction == Vehicle.EAST:
+        elif arriving_vehicle.heading == Vehicle.EAST_CODE:
             if self.queue_e.queue.append(vehicle=arriving_vehicle):
                 self.arrivals += 1
                 if self.traffic_light_ew.saturation_rate() > 0:
                     self.arrivals_on_green += 1
-        elif arriving_vehicle.direction == Vehicle.SOUTH:
+        elif arriving_vehicle.heading == Vehicle.SOUTH_CODE:
             if self.queue_s.queue.append(vehicle=arriving_vehicle):
                 self.arrivals += 1
                 if self.traffic_light_ns.saturation_rate() > 0:
                     self.arrivals_on_green += 1
-        elif arriving_vehicle.direction == Vehicle.WEST:
+        elif arriving_vehicle.heading == Vehicle.WEST_CODE:
             if self.queue_w.queue.append(vehicle=arriving_vehicle):
                 self.arrivals += 1
                 if self.traffic_light_ew.saturation_rate() > 0:
                     self.arrivals_on_green += 1
         
+    def reserve(self, num_steps: int) -> None:
+        """
+        Preallocates the recorded series of the intersection, its queues and its traffic lights.
+        
+        num_steps : int
+            The nbr. of time-steps still to be run.
+        """
+        self.num_queued_vehicles.reserve(num_steps)
+        
+        for queue in [self.queue_n, self.queue_w, self.queue_s, self.queue_e]:
+            queue.reserve(num_steps)
+            
+        self.traffic_light_ns.reserve(num_steps)
+        self.traffic_light_ew.reserve(num_steps)
+        
+    def idle(self) -> bool:
+        """
+        Returns whether time-steps leave the intersection unchanged apart from its clocks, traffic
+        lights and recorded series, as long as no vehicle is heading for it: its queues are idle, no
+        vehicle is crossing it, its traffic lights only depend on time and it is observable, so that
+        no estimator runs for it.
+        """
+        if len(self.horizontal_crossers) > 0 or len(self.vertical_crossers) > 0 or not self.observable:
+            return False
+        
+        # Mirrors are only skipped along with the light they mirror.
+        for traffic_light, other in [(self.traffic_light_ns, self.traffic_light_ew), (self.traffic_light_ew, self.traffic_light_ns)]:
+            if not traffic_light.can_skip() or (isinstance(traffic_light, TrafficLight.TrafficLightMirror) and traffic_light.traffic_light is not other):
+                return False
+        
+        for queue in [self.queue_n, self.queue_w, self.queue_s, self.queue_e]:
+            if not queue.idle():
+                return False
+        
+        return True
+    
+    def next_arrival_time(self) -> float:
+        """
+        Returns the time [s] at which a queue of the intersection next generates a vehicle of its own.
+        Infinite if none does.
+        """
+        return min(queue.next_arrival_time() for queue in [self.queue_n, self.queue_w, self.queue_s, self.queue_e])
+    
+    def time_until_event(self) -> float:
+        """
+        Returns the time [s] for which the intersection is left to itself, as long as no vehicle
+        arrives to it: until one of its queues generates a vehicle or one of its traffic lights
+        switches. Zero if it is not idle (see idle) or one of its traffic lights has just switched,
+        as run_event still has to account for the switch.
+        """
+        if not self.idle():
+            return 0.
+        
+        time = self.next_arrival_time()-self.time
+        
+        for traffic_light in [self.traffic_light_ns, self.traffic_light_ew]:
+            if traffic_light.switches[-1] != 0:
+                return 0.
+            
+            # Mirrors switch along with the light they mirror.
+            if not isinstance(traffic_light, TrafficLight.TrafficLightMirror):
+                time = min(time, traffic_light.time_until_switch())
+        
+        return time
+    
+    def skip(self, delta_ts: np.ndarray) -> None:
+        """
+        Elapses several time-steps of an idle intersection at once, leaving it, its queues and its
+        traffic lights as run_event would.
+        
+        delta_ts : np.ndarray
+            The time-step sizes.
+        """
+        num_steps = len(delta_ts)
+        
+        self.num_queued_vehicles.pad(len(self.num_queued_vehicles)+num_steps, self.queue_n.queue.queue_length+self.queue_e.queue.queue_length+self.queue_s.queue.queue_length+self.queue_w.queue.queue_length)
+        if self.arrivals > 0:
+            self.arrivals_on_green_rate = self.arrivals_on_green/self.arrivals
+        
+        tot_wait_time = self.queue_n.tot_wait_time+self.queue_e.tot_wait_time+self.queue_s.tot_wait_time+self.queue_w.tot_wait_time
+        departures = self.queue_n.departures[-1]+self.queue_e.departures[-1]+self.queue_s.departures[-1]+self.queue_w.departures[-1]
+        
+        if departures > 0:
+            self.avg_wait_time = tot_wait_time/departures
+        
+        for queue in [self.queue_n, self.queue_w, self.queue_s, self.queue_e]:
+            queue.skip(delta_ts)
+        
+        # Each time-step looks at the switch recorded by the previous one, starting with the last
+        # switch recorded before skipping.
+        first_ns = len(self.traffic_light_ns.switches)-1
+        first_ew = len(self.traffic_light_ew.switches)-1
+        
+        # The north-south light is stepped first, so a mirror of the east-west light sees its service
+        # of the previous time-step.
+        if isinstance(self.traffic_light_ns, TrafficLight.TrafficLightMirror):
+            self.traffic_light_ew.skip(delta_ts)
+            self.traffic_light_ns.skip(delta_ts, lag=1)
+        else:
+            self.traffic_light_ns.skip(delta_ts)
+            self.traffic_light_ew.skip(delta_ts)
+        
+        self.green_onsets_ns, self.cum_clearance_rate_ns, self.avg_clearance_rate_ns = self.skip_green_onsets(self.traffic_light_ns, first_ns, self.green_onsets_ns, self.cum_clearance_rate_ns, self.avg_clearance_rate_ns, delta_ts)
+        self.green_onsets_ew, self.cum_clearance_rate_ew, self.avg_clearance_rate_ew = self.skip_green_onsets(self.traffic_light_ew, first_ew, self.green_onsets_ew, self.cum_clearance_rate_ew, self.avg_clearance_rate_ew, delta_ts)
+        
+        self.time = self.queue_n.time
+    
+    def skip_green_onsets(self, traffic_light: TrafficLight.TrafficLight, first: int, green_onsets: list, cum_clearance_rate: float, avg_clearance_rate: float, delta_ts: np.ndarray) -> (list, float, float):
+        """
+        Returns the green onsets, cumulative and average clearance rates of one direction after the
+        bookkeeping that run_event does at the start of each of several skipped time-steps.
+        
+        traffic_light : TrafficLight.TrafficLight
+            The traffic light of the direction, already skipped over the time-steps.
+        first : int
+            The index of the switch seen by the first skipped time-step, the last one recorded before.
+        green_onsets : [(int, int)]
+            The last two green onsets of the direction.
+        cum_clearance_rate : float
+            The cumulative clearance rate of the direction.
+        avg_clearance_rate : float
+            The average clearance rate of the direction.
+        delta_ts : np.ndarray
+            The time-step sizes.
+        """
+        if first < 0:
+            return green_onsets, cum_clearance_rate, avg_clearance_rate
+        
+        switches = traffic_light.switches.view()[first:first+len(delta_ts)]
+        num_cycles = traffic_light.num_cycles.view()[first:first+len(delta_ts)]
+        
+        for step in np.flatnonzero(switches > 0):
+            switch_ind = first+int(step)
+            
+            if len(green_onsets) > 0 and green_onsets[-1][0] == switch_ind:
+                continue
+            
+            green_onsets = green_onsets[-1:]+[(switch_ind, self.num_queued_vehicles[switch_ind])]
+            
+            if num_cycles[step] > 1:
+                duration = delta_ts[step].item()*(green_onsets[-1][0]-green_onsets[-2][0])
+                growth = green_onsets[-1][1]-green_onsets[-2][1]
+                cum_clearance_rate += growth/duration
+        
+        if num_cycles[-1] > 2:
+            avg_clearance_rate = cum_clearance_rate/(num_cycles[-1]-1)
+        
+        return green_onsets, cum_clearance_rate, avg_clearance_rate
+    
+    def hold(self, num_steps: int) -> None:
+        """
+        Records time-steps in which nothing happens at the intersection, its queues and its traffic
+        lights, repeating the last recorded entries. Follows a run_event covering several time-steps
+        at once, which only idle intersections may run, see time_until_event.
+        
+        num_steps : int
+            The nbr. of time-steps to record.
+        """
+        self.num_queued_vehicles.pad(len(self.num_queued_vehicles)+num_steps, self.num_queued_vehicles[-1])
+        
+        for queue in [self.queue_n, self.queue_w, self.queue_s, self.queue_e]:
+            queue.hold(num_steps)
+        
+        self.traffic_light_ns.hold(num_steps)
+        self.traffic_light_ew.hold(num_steps)
+    
     def run_event(self, delta_t: float, animate=False, plt=None) -> list:
         """
         Runs all events (arrivals/departures) given the current circumstances and elapses time.
@@ -554,29 +830,34 @@ class FourWayIntersectionSimulator:
         delta_t : float
             The time-step size.
         """
-        self.num_queued_vehicles += [self.queue_n.queue.queue_length+self.queue_e.queue.queue_length+self.queue_s.queue.queue_length+self.queue_w.queue.queue_length]
+        self.num_queued_vehicles.append(self.queue_n.queue.queue_length+self.queue_e.queue.queue_length+self.queue_s.queue.queue_length+self.queue_w.queue.queue_length)
         if self.arrivals > 0:
             self.arrivals_on_green_rate = self.arrivals_on_green/self.arrivals
         
         num_cycles_ns, switches_ns = self.traffic_light_ns.num_cycles, self.traffic_light_ns.switches
         
-        if len(num_cycles_ns) > 0 and num_cycles_ns[-1] > 1 and switches_ns[-1] > 0:
-            #print(self.time, self.traffic_light_ns.time)
-            switch_inds = list(np.array(range(int(round(self.time/delta_t,3))+1))[list(map(lambda x: True if x>0 else False, switches_ns))])
-            duration = delta_t*(switch_inds[-1]-switch_inds[-2])
-            growth = self.num_queued_vehicles[switch_inds[-1]]-self.num_queued_vehicles[switch_inds[-2]]
-            self.cum_clearance_rate_ns += growth/duration
+        if len(switches_ns) > 0 and switches_ns[-1] > 0 and (len(self.green_onsets_ns) <= 0 or self.green_onsets_ns[-1][0] != len(switches_ns)-1):
+            switch_ind = len(switches_ns)-1
+            self.green_onsets_ns = self.green_onsets_ns[-1:]+[(switch_ind, self.num_queued_vehicles[switch_ind])]
+            
+            if len(num_cycles_ns) > 0 and num_cycles_ns[-1] > 1:
+                duration = delta_t*(self.green_onsets_ns[-1][0]-self.green_onsets_ns[-2][0])
+                growth = self.green_onsets_ns[-1][1]-self.green_onsets_ns[-2][1]
+                self.cum_clearance_rate_ns += growth/duration
              
         if len(num_cycles_ns) > 0 and num_cycles_ns[-1] > 2:
             self.avg_clearance_rate_ns = self.cum_clearance_rate_ns/(num_cycles_ns[-1]-1)
         
         num_cycles_ew, switches_ew = self.traffic_light_ew.num_cycles, self.traffic_light_ew.switches
         
-        if len(num_cycles_ew) > 0 and num_cycles_ew[-1] > 1 and switches_ew[-1] > 0:
-            switch_inds = list(np.array(range(int(round(self.time/delta_t,3))+1))[list(map(lambda x: True if x>0 else False, switches_ew))])
-            duration = delta_t*(switch_inds[-1]-switch_inds[-2])
-            growth = self.num_queued_vehicles[switch_inds[-1]]-self.num_queued_vehicles[switch_inds[-2]]
-            self.cum_clearance_rate_ew += growth/duration
+        if len(switches_ew) > 0 and switches_ew[-1] > 0 and (len(self.green_onsets_ew) <= 0 or self.green_onsets_ew[-1][0] != len(switches_ew)-1):
+            switch_ind = len(switches_ew)-1
+            self.green_onsets_ew = self.green_onsets_ew[-1:]+[(switch_ind, self.num_queued_vehicles[switch_ind])]
+            
+            if len(num_cycles_ew) > 0 and num_cycles_ew[-1] > 1:
+                duration = delta_t*(self.green_onsets_ew[-1][0]-self.green_onsets_ew[-2][0])
+                growth = self.green_onsets_ew[-1][1]-self.green_onsets_ew[-2][1]
+                self.cum_clearance_rate_ew += growth/duration
             
         if len(num_cycles_ew) > 0 and num_cycles_ew[-1] > 2:
             self.avg_clearance_rate_ew = self.cum_clearance_rate_ew/(num_cycles_ew[-1]-1)
@@ -589,7 +870,7 @@ class FourWayIntersectionSimulator:
         
         horizontal_crossers = []
         for vehicle in self.horizontal_crossers:
-            if (vehicle.direction == Vehicle.EAST and vehicle.tail_position[0] < self.queue_w.queue.head_position[0]) or (vehicle.direction == Vehicle.WEST and vehicle.tail_position[0] > self.queue_e.queue.head_position[0]):
+            if (vehicle.heading == Vehicle.EAST_CODE and vehicle.tail_position[0] < self.queue_w.queue.head_position[0]) or (vehicle.heading == Vehicle.WEST_CODE and vehicle.tail_position[0] > self.queue_e.queue.head_position[0]):
                 horizontal_crossers += [vehicle]
     
         self.horizontal_crossers = horizontal_crossers
@@ -599,7 +880,7 @@ class FourWayIntersectionSimulator:
             
         vertical_crossers = []
         for vehicle in self.vertical_crossers:
-            if (vehicle.direction == Vehicle.NORTH and vehicle.tail_position[1] < self.queue_s.queue.head_position[1]) or (vehicle.direction == Vehicle.SOUTH and vehicle.tail_position[1] > self.queue_n.queue.head_position[1]):
+            if (vehicle.heading == Vehicle.NORTH_CODE and vehicle.tail_position[1] < self.queue_s.queue.head_position[1]) or (vehicle.heading == Vehicle.SOUTH_CODE and vehicle.tail_position[1] > self.queue_n.queue.head_position[1]):
                 vertical_crossers += [vehicle]
         
         self.vertical_crossers = vertical_crossers
@@ -698,10 +979,31 @@ class IntersectionNetworkSimulator:
             The intersections contained in the network.
         grid_inds : [(int,int)]
             The grid indices within the network.
-        moving_vehicles : [Vehicle.Vehicle]
-            The vehicles within the network, not contained in any queue.
+        vehicles : dict
+            The vehicles within the network, as keys in order of arrival. Ordered so that
+            runs do not depend on object addresses.
+        vehicle_array : VehicleArray.VehicleArray
+            Moves the vehicles and checks them for exits and arrivals with array operations. None if
+            they are moved and checked one by one.
+        vehicle_index : dict
+            The vehicles heading for each intersection, keyed by (destination, direction), as
+            keys in order of arrival.
+        vehicle_visuals : dict
+            The plotted line of each vehicle, when animating through run_event.
+        seed_sequence : np.random.SeedSequence
+            The seed of the random streams of the queues and traffic lights. None if they draw
+            from the global random state.
+        profiler : Profiler.Profiler
+            Times each phase of the time-steps. None unless simulating with profile set.
+        activity : Activity.ActivityTracker
+            Puts idle intersections to sleep. None unless simulating with skip_idle set.
+        busy_grid_ind : (int,int)
+            The grid index of the intersection that last kept quiet_steps from running several
+            time-steps as one, checked first the next time. None until one has.
         time : float
             The current simulation time [s].
+        exits : Recorder.TimeSeries
+            Total nbr. of vehicles that have left the network over time.
         """
         self.grid_dimensions = (0,0)
         self.grid_distance = 0.
@@ -709,15 +1011,22 @@ class IntersectionNetworkSimulator:
         self.intersection_type = None
         self.intersections = None
         self.grid_inds = []
-        self.vehicles = set()
+        self.vehicles = dict()
+        self.vehicle_array = None
+        self.vehicle_index = dict()
+        self.vehicle_visuals = dict()
+        self.seed_sequence = None
+        self.profiler = None
+        self.activity = None
+        self.busy_grid_ind = None
         self.time = 0.
         self.tot_wait_time = 0.
-        self.exits = [0]
+        self.exits = Recorder.TimeSeries()
         self.observations = []
         self.avg_wait_time = 0.
         self.observable_intersection_grid_inds = []
         
-    def initialize(self, grid_dimensions: (int,int), grid_distance=150):
+    def initialize(self, grid_dimensions: (int,int), grid_distance=150, vectorized=False, seed=None):
         """
         Initializes the IntersectionNetworkSimulator instance.
         
@@ -725,6 +1034,11 @@ class IntersectionNetworkSimulator:
             The grid dimensions of the intersection network.
         grid_distance : float
             The distance [m] between each intersection centerpoint.
+        vectorized : bool (optional)
+            Whether to keep the vehicle states in a VehicleArray.VehicleArray. Defaults to False.
+        seed : int or np.random.SeedSequence (optional)
+            Seed of the random streams of the queues and traffic lights, see seed. Defaults to None,
+            in which case they draw from the global random state.
         """
         self.grid_dimensions = grid_dimensions
         self.intersections = np.empty(shape=grid_dimensions, dtype=FourWayIntersectionSimulator)
@@ -747,6 +1061,73 @@ class IntersectionNetworkSimulator:
                 self.intersections[grid_ind].set_queues(queue_w=self.edge_type())
                 
             self.intersections[grid_ind].initialize_structure(position=(grid_ind[1]*grid_distance, -grid_ind[0]*grid_distance))
+            
+        self.vehicle_index = {(grid_ind, direction): dict() for grid_ind in grid_inds for direction in [Vehicle.NORTH, Vehicle.WEST, Vehicle.SOUTH, Vehicle.EAST]}
+            
+        if vectorized:
+            self.vehicle_array = VehicleArray.VehicleArray()
+            self.vehicle_array.initialize(grid_inds=grid_inds)
+                    
+        if seed != None:
+            self.seed(seed)
+            
+    def seed(self, seed) -> None:
+        """
+        Gives every queue and traffic light an independent random stream derived from a seed.
+        
+        Each intersection spawns a child of the seed in grid order, and each of its components a
+        child of that, so the streams depend only on the grid layout and not on the order in which
+        components are simulated.
+        
+        seed : int or np.random.SeedSequence
+            The seed.
+        """
+        self.seed_sequence = RandomPool.seed_sequence(seed)
+        
+        for grid_ind in self.grid_inds:
+            self.seed_intersection(grid_ind)
+            
+    def seed_intersection(self, grid_ind: (int,int)) -> None:
+        """
+        Seeds the queues, traffic lights and estimator queues of an intersection from its streams.
+        Does nothing if the network is not seeded.
+        
+        grid_ind : (int,int)
+            The grid index of the intersection.
+        """
+        if self.seed_sequence == None:
+            return
+        
+        intersection = self.intersections[grid_ind]
+        
+        for component, queue in enumerate([intersection.queue_n, intersection.queue_w, intersection.queue_s, intersection.queue_e]):
+            queue.random_pool.seed(self.component_seed(grid_ind, component))
+        
+        # Mirrors copy the initial service of the light they mirror, so they are seeded last.
+        traffic_lights = [(intersection.traffic_light_ns, 4), (intersection.traffic_light_ew, 5)]
+        traffic_lights.sort(key=lambda item: isinstance(item[0], TrafficLight.TrafficLightMirror))
+        
+        for traffic_light, component in traffic_lights:
+            if traffic_light != None:
+                traffic_light.seed(self.component_seed(grid_ind, component))
+        
+        if intersection.estimator != None:
+            estimator = intersection.estimator
+            for component, queue in enumerate([estimator.queue_n, estimator.queue_w, estimator.queue_s, estimator.queue_e], 6):
+                queue.random_pool.seed(self.component_seed(grid_ind, component))
+                
+    def component_seed(self, grid_ind: (int,int), component: int) -> np.random.SeedSequence:
+        """
+        Returns the seed sequence of a component of an intersection: its queues ('N','W','S','E')
+        are components 0-3, its traffic lights ('ns','ew') 4-5 and its estimator's queues 6-9. Equal
+        to spawning a child per intersection in grid order, and 10 children of that.
+        
+        grid_ind : (int,int)
+            The grid index of the intersection.
+        component : int
+            The component.
+        """
+        return RandomPool.spawned(self.seed_sequence, (int(grid_ind[0])*self.grid_dimensions[1]+int(grid_ind[1]), component))
     
     def set_queue_rate_parameters(self, grid_ind: (int,int), avg_departure_time: float, arrival_rate_n=0, arrival_rate_w=0, arrival_rate_s=0, arrival_rate_e=0, platoon_size_distribution=[1.]) -> None:
         """
@@ -779,6 +1160,7 @@ class IntersectionNetworkSimulator:
             The traffic light controlling the east- and westbound queues.
         """
         self.intersections[grid_ind].set_traffic_lights(traffic_light_ns=traffic_light_ns, traffic_light_ew=traffic_light_ew)
+        self.seed_intersection(grid_ind)
         
     def set_observable_intersections(self, grid_inds: [(int,int)]) -> None:
         self.observable_intersection_grid_inds = grid_inds
@@ -790,25 +1172,13 @@ class IntersectionNetworkSimulator:
         for grid_ind in unobservable:
             self.intersections[grid_ind].estimator = FourWayIntersectionEstimator()
             self.intersections[grid_ind].estimator.initialize(intersection=self.intersections[grid_ind])
+            self.seed_intersection(grid_ind)
             
     def reset(self):
-        network = IntersectionNetworkSimulator()
-        network.edge_type = self.edge_type
-        network.intersection_type = self.intersection_type
-        network.initialize(grid_dimensions=self.grid_dimensions, grid_distance=self.grid_distance)
-        
-        for grid_ind in self.grid_inds:
-            intersection = self.intersections[grid_ind]
-                
-            network.set_queue_rate_parameters(grid_ind=grid_ind, avg_departure_time=1/intersection.queue_n.queue.departure_rate, arrival_rate_n=intersection.queue_n.queue.arrival_rate, arrival_rate_w=intersection.queue_w.queue.arrival_rate, arrival_rate_s=intersection.queue_s.queue.arrival_rate, arrival_rate_e=intersection.queue_e.queue.arrival_rate, platoon_size_distribution=intersection.queue_n.queue.platoon_size_distribution)
-            
-            traffic_light_ns = intersection.traffic_light_ns.reset()
-            traffic_light_ew = intersection.traffic_light_ew.reset()
-            network.set_traffic_lights(grid_ind=grid_ind, traffic_light_ns=traffic_light_ns, traffic_light_ew=traffic_light_ew)
-            
-        network.set_observable_intersections(grid_inds=self.observable_intersection_grid_inds)
-        
-        return network
+        """
+        Returns a new network of the same configuration, at time 0, see NetworkSpec.from_network.
+        """
+        return NetworkSpec.from_network(self).build()
         
     def initialize_plot(self, fig_size, plt):
         fig, ax = plt.subplots(figsize=fig_size, dpi=300)
@@ -830,27 +1200,155 @@ class IntersectionNetworkSimulator:
         
         return fig, ax
 
-    def simulate(self, delta_t: float, end_time: float, fig_width=4, animate=False, file_name="simulation.mp4", output_destination="../data/vids/", speed=1) -> None:
-        if animate:
-            FFMpegWriter = manimation.writers['ffmpeg']
-            metadata = dict(title='Simulation', artist='Matplotlib',
-                            comment='Visual representation of the simulation.')
-            fps = int(speed/delta_t)
-            writer = FFMpegWriter(fps=fps, metadata=metadata)
-            
-            fig_height = fig_width*self.grid_dimensions[0]/self.grid_dimensions[1]
-            fig, ax = self.initialize_plot((fig_width, fig_height), plt)
-            text = plt.gcf().text(0, 0.95, "Elapsed time: 0s", fontsize=14)
-
-            with writer.saving(fig, Path(output_destination) / file_name, 100):
+    def reserve(self, num_steps: int) -> None:
+        """
+        Preallocates the recorded series of the network for a known nbr. of additional time-steps.
+        
+        num_steps : int
+            The nbr. of time-steps still to be run.
+        """
+        self.exits.reserve(num_steps)
+        
+        for grid_ind in self.grid_inds:
+            self.intersections[grid_ind].reserve(num_steps)
+        
+    def simulate(self, delta_t: float, end_time: float, fig_width=4, animate=False, file_name="simulation.mp4", output_destination="../data/vids/", speed=1, frame_interval=1, dpi=100, recording=None, profile=False, skip_idle=False, max_delta_t=None, partitions=None) -> Profiler.Profiler:
+        """
+        Runs the simulation until end_time.
+        
+        delta_t : float
+            The time-step size [s].
+        end_time : float
+            The simulation time [s] to stop at.
+        fig_width : float (optional)
+            The width [in] of the video. Defaults to 4.
+        animate : bool (optional)
+            Whether to render a video of the simulation, see Renderer.Renderer. Defaults to False.
+        file_name : str (optional)
+            The video file. Written with ffmpeg, or with Pillow if it ends with '.gif'. Defaults to
+            'simulation.mp4'.
+        output_destination : str (optional)
+            The directory of the video. Defaults to '../data/vids/'.
+        speed : float (optional)
+            Simulated seconds per second of video. Defaults to 1.
+        frame_interval : int (optional)
+            The nbr. of time-steps per frame, so that the frame rate does not depend on delta_t.
+            Defaults to 1, which renders every time-step.
+        dpi : int (optional)
+            The resolution of the video. Defaults to 100.
+        recording : str (optional)
+            Directory to record the vehicles, traffic lights and queue lengths of every
+            frame_interval-th time-step to, so that a video can be rendered later with
+            Trajectory.render. Defaults to None, in which case nothing is recorded.
+        profile : bool (optional)
+            Whether to time each phase of the time-steps. Defaults to False.
+        skip_idle : bool (optional)
+            Whether to let idle intersections sleep through the time-steps in which nothing can happen
+            at them, see Activity.ActivityTracker. The results are the same either way. Defaults to False.
+        max_delta_t : float (optional)
+            The largest time-step size [s], taken while nothing is about to happen in the network
+            (see quiet_steps) and rounded down to a multiple of delta_t. The recorded series keep one
+            entry per delta_t, the entries of a longer time-step being repeated. Cannot be combined
+            with animate, recording or skip_idle. Defaults to None, in which case every time-step is
+            delta_t.
+        partitions : (int,int) (optional)
+            The nbr. of row and column blocks to split the intersections into, each advanced by a
+            worker process of its own, see Partition.simulate. The results are the same as in a single
+            process. Requires a seeded network of plain vehicles, and cannot be combined with animate,
+            recording, profile, skip_idle or max_delta_t. The workers are forked, so partitioned runs
+            raise a ValueError on Windows and macOS. Defaults to None, in which case the network is
+            run in this process.
+        
+        Returns the Profiler.Profiler holding the wall time and nbr. of calls of each phase if
+        profile is set, printable as a table, else None.
+        """
+        max_num_steps = 1
+        if max_delta_t != None:
+            if animate or recording != None or skip_idle:
+                raise ValueError("Time-steps longer than delta_t cannot be combined with animate, recording or skip_idle.")
+            
+            max_num_steps = max(int(max_delta_t/delta_t+1e-9), 1)
+        
+        if partitions != None:
+            if animate or recording != None or profile or skip_idle or max_delta_t != None:
+                raise ValueError("A partitioned run cannot be combined with animate, recording, profile, skip_idle or max_delta_t.")
+        else:
+            # Blocks reserve their own intersections' series.
+            self.reserve(num_steps=int(math.ceil((end_time-self.time)/delta_t))+1)
+        
+        if profile:
+            self.profiler = Profiler.Profiler()
+        
+        # A run that was interrupted may have left intersections asleep.
+        if getattr(self, "activity", None) != None:
+            self.activity.wake_all()
+        
+        self.activity = None
+        if skip_idle:
+            self.activity = Activity.ActivityTracker()
+            self.activity.initialize(network=self)
+        
+        if partitions != None:
+            Partition.simulate(network=self, delta_t=delta_t, end_time=end_time, partitions=partitions)
+        elif animate or recording != None:
+            renderer, writer, recorder = None, None, None
+            
+            try:
+                if animate:
+                    renderer = Renderer.Renderer()
+                    renderer.initialize(network=self, fig_width=fig_width, dpi=dpi)
+                    writer = Renderer.FrameWriter()
+                    writer.initialize(file_name=Path(output_destination) / file_name, frame_size=renderer.frame_size(), fps=speed/(frame_interval*delta_t))
+                
+                if recording != None:
+                    recorder = Trajectory.TrajectoryRecorder()
+                    recorder.initialize(network=self, directory=recording, delta_t=delta_t, frame_interval=frame_interval)
+                
+                num_steps = 0
                 while self.time < end_time:
-                    self.run_event(delta_t=delta_t, animate=True, plt=plt)
-                    text.set_text("Elapsed time: "+str(round(self.time,1))+"s")
-                    writer.grab_frame()
+                    self.run_event(delta_t=delta_t)
+                    num_steps += 1
+                    
+                    if num_steps % frame_interval == 0:
+                        if self.activity != None:
+                            self.activity.wake_all()
+                        if writer != None:
+                            writer.write(renderer.draw_frame())
+                        if recorder != None:
+                            recorder.record()
+            finally:
+                if writer != None:
+                    writer.close()
+                if renderer != None:
+                    renderer.close()
+                if recorder != None:
+                    recorder.close()
+        elif max_num_steps > 1:
+            # As many time-steps as running every one at delta_t would take, rounding included.
+            times = Recorder.cumulative(self.time, np.full(int(math.ceil((end_time-self.time)/delta_t))+1, delta_t))
+            remaining = int(np.searchsorted(times, end_time))+1 if self.time < end_time else 0
+            
+            while remaining > 0:
+                num_steps = self.quiet_steps(delta_t=delta_t, max_num_steps=min(max_num_steps, remaining))
+                self.run_event(delta_t=num_steps*delta_t)
+                
+                if num_steps > 1:
+                    self.hold(num_steps-1)
+                
+                remaining -= num_steps
         else:
             while self.time < end_time:
                 self.run_event(delta_t=delta_t)
         
+        if self.activity != None:
+            self.activity.wake_all()
+            self.activity = None
+        
+        profiler = self.profiler
+        self.profiler = None
+        
+        return profiler
+        
     def run_event(self, delta_t: float, animate=False, plt=None) -> (dict,dict):
         """
         Runs all events (departures/arrivals) given the current circumstances and elapses time.
@@ -858,80 +1356,308 @@ class IntersectionNetworkSimulator:
         delta_t : float
             The time-step size.
         """
-        self.exits += [self.exits[-1]]
+        profiler = self.profiler
+        start = None
+        if profiler != None:
+            start = profiler.clock()
+        
+        self.exits.append(self.exits[-1])
         exits = []
         
-        for vehicle in self.vehicles:
-            if self.out_of_bounds(vehicle):
-                exits += [vehicle]
-                self.exits[-1] += 1
-                self.tot_wait_time += vehicle.tot_wait_time
-                
-                if animate:
-                    vehicle.remove_plot()
-                continue
-                
-            if animate:
-                if vehicle.visual == None:
-                    vehicle.initialize_plot(plt, linewidth=4.5/math.log(math.sqrt(5*len(self.grid_inds))))
-                vehicle.update_plot()
-            
-            if vehicle.destination in self.grid_inds and vehicle.speed > 0 and self.distance_to_destination(vehicle=vehicle) < (3 + vehicle.full_speed*delta_t):
-                self.intersections[vehicle.destination].queue_vehicle(arriving_vehicle=vehicle) 
+        if self.vehicle_array != None:
+            exits = self.scan_vehicle_array(delta_t=delta_t, animate=animate, plt=plt)
+        else:
+            exits = self.scan_vehicles(delta_t=delta_t, animate=animate, plt=plt)
         
         if self.exits[-1] > 0:
             self.avg_wait_time = self.tot_wait_time/self.exits[-1]
         
         for exit in exits:
-            self.vehicles.remove(exit)
+            del self.vehicles[exit]
+            self.unindex_vehicle(exit)
+            
+            if self.vehicle_array != None:
+                self.vehicle_array.release(exit)
+        
+        if profiler != None:
+            start = profiler.record("scan", start)
         
         arrivals = dict()
         departures = dict()
+        activity = self.activity
         
         for grid_ind in self.grid_inds:
+            if activity != None and activity.asleep(grid_ind, delta_t):
+                arrivals[grid_ind] = []
+                departures[grid_ind] = []
+                
+                if profiler != None:
+                    start = profiler.record("asleep", start, grid_ind)
+                continue
+            
             intersection_arrivals, intersection_departures = self.intersections[grid_ind].run_event(delta_t=delta_t, animate=animate, plt=plt)
             arrivals[grid_ind] = intersection_arrivals
             for arrival in intersection_arrivals:
                 arrival.destination = grid_ind
-                self.vehicles.add(arrival)
+                self.vehicles[arrival] = None
+                self.index_vehicle(arrival)
+                
+                if self.vehicle_array != None:
+                    self.vehicle_array.add(arrival)
+            
+            if profiler != None:
+                start = profiler.record("intersection", start, grid_ind)
             
             intersection_departures = [(departure,grid_ind) for departure in intersection_departures]
             departures[grid_ind] = self.update_destinations(intersection_departures)
             
+            if self.vehicle_array != None:
+                for departure in departures[grid_ind]:
+                    # A vehicle can leave the network before departing from its queue.
+                    if departure in self.vehicle_array.rows:
+                        self.vehicle_array.launch(departure)
+            
+            if activity != None:
+                for departure in departures[grid_ind]:
+                    activity.wake(departure.destination)
+            
+            if profiler != None:
+                start = profiler.record("update_destinations", start, grid_ind)
+            
             if self.intersections[grid_ind].observable:
                 self.observe(departures=departures[grid_ind])
+                
+                if profiler != None:
+                    start = profiler.record("observe", start, grid_ind)
         
         for grid_ind in self.grid_inds:
-            northbound = []
-            eastbound = []
-            southbound = []
-            westbound = []
-                
-            if self.intersections[grid_ind].traffic_light_ew.adaptive or self.intersections[grid_ind].traffic_light_ns.adaptive:
-                vehicles = list(filter(lambda vehicle: vehicle.destination == grid_ind, self.vehicles))
-                northbound = list(filter(lambda vehicle: vehicle.direction == Vehicle.NORTH, vehicles))
-                eastbound = list(filter(lambda vehicle: vehicle.direction == Vehicle.EAST, vehicles))
-                southbound = list(filter(lambda vehicle: vehicle.direction == Vehicle.SOUTH, vehicles))
-                westbound = list(filter(lambda vehicle: vehicle.direction == Vehicle.WEST, vehicles))
+            start = self.sense(grid_ind=grid_ind, delta_t=delta_t, start=start)
+        
+        if self.vehicle_array != None:
+            self.vehicle_array.time_step(delta_t=delta_t)
+        else:
+            for vehicle in self.vehicles:
+                vehicle.time_step(delta_t=delta_t)
+        
+        if profiler != None:
+            profiler.record("time_step", start)
+            
+        self.time = self.intersections[(0,0)].time
+        
+        return arrivals, departures
+    
+    def scan_vehicles(self, delta_t: float, animate=False, plt=None) -> list:
+        """
+        Removes exiting vehicles and queues arriving vehicles. Returns the exiting vehicles.
+        
+        delta_t : float
+            The time-step size.
+        """
+        exits = []
+        
+        for vehicle in self.vehicles:
+            if self.out_of_bounds(vehicle):
+                exits += [vehicle]
+                self.exits[-1] += 1
+                self.tot_wait_time += vehicle.tot_wait_time
                 
-                #print(grid_ind, len(vehicles), len(northbound), len(eastbound), len(southbound), len(westbound))
+                if animate:
+                    vehicle.remove_plot(self.vehicle_visuals.pop(vehicle, None))
+                continue
                 
-            if self.intersections[grid_ind].traffic_light_ew.adaptive:
-                self.intersections[grid_ind].traffic_light_ew.sense(queue_1=eastbound, queue_2=westbound, opposite_queue_1=northbound, opposite_queue_2=southbound)
+            if animate:
+                if vehicle not in self.vehicle_visuals:
+                    self.vehicle_visuals[vehicle] = vehicle.initialize_plot(plt, linewidth=4.5/math.log(math.sqrt(5*len(self.grid_inds))))
+                vehicle.update_plot(self.vehicle_visuals[vehicle])
             
-            if self.intersections[grid_ind].traffic_light_ns.adaptive:
-                self.intersections[grid_ind].traffic_light_ns.sense(queue_1=northbound, queue_2=southbound, opposite_queue_1=eastbound, opposite_queue_2=westbound)
-                
-            if not self.intersections[grid_ind].observable:
-                self.observations = self.intersections[grid_ind].estimator.estimate(observations=self.observations)
-                self.intersections[grid_ind].estimator.run_event(delta_t=delta_t)
+            if vehicle.destination in self.grid_inds and vehicle.speed > 0 and self.distance_to_destination(vehicle=vehicle) < (3 + vehicle.full_speed*delta_t):
+                self.intersections[vehicle.destination].queue_vehicle(arriving_vehicle=vehicle) 
+        
+        return exits
+    
+    def sense(self, grid_ind: (int,int), delta_t: float, start=None):
+        """
+        Lets the adaptive traffic lights of an intersection sense the vehicles heading for it, and
+        its estimator estimate its queues from the observations if it is not observable. Returns the
+        profiler clock after each phase timed, see Profiler.Profiler.record.
+        
+        grid_ind : (int,int)
+            The grid index of the intersection.
+        delta_t : float
+            The time-step size.
+        start : float (optional)
+            The profiler clock before. Defaults to None, as when not profiling.
+        """
+        profiler = self.profiler
+        intersection = self.intersections[grid_ind]
+        northbound = []
+        eastbound = []
+        southbound = []
+        westbound = []
+            
+        if intersection.traffic_light_ew.adaptive or intersection.traffic_light_ns.adaptive:
+            northbound = list(self.vehicle_index[(grid_ind, Vehicle.NORTH)])
+            eastbound = list(self.vehicle_index[(grid_ind, Vehicle.EAST)])
+            southbound = list(self.vehicle_index[(grid_ind, Vehicle.SOUTH)])
+            westbound = list(self.vehicle_index[(grid_ind, Vehicle.WEST)])
+            
+        if intersection.traffic_light_ew.adaptive:
+            intersection.traffic_light_ew.sense(queue_1=eastbound, queue_2=westbound, opposite_queue_1=northbound, opposite_queue_2=southbound)
+        
+        if intersection.traffic_light_ns.adaptive:
+            intersection.traffic_light_ns.sense(queue_1=northbound, queue_2=southbound, opposite_queue_1=eastbound, opposite_queue_2=westbound)
+        
+        if profiler != None and (intersection.traffic_light_ew.adaptive or intersection.traffic_light_ns.adaptive):
+            start = profiler.record("sense", start, grid_ind)
+            
+        if not intersection.observable:
+            self.observations = intersection.estimator.estimate(observations=self.observations)
+            
+            if profiler != None:
+                start = profiler.record("estimate", start, grid_ind)
+            
+            intersection.estimator.run_event(delta_t=delta_t)
+            
+            if profiler != None:
+                start = profiler.record("estimator", start, grid_ind)
+        
+        return start
+    
+    def scan_vehicle_array(self, delta_t: float, animate=False, plt=None) -> list:
+        """
+        Removes exiting vehicles and queues arriving vehicles, checking all vehicles against the exit
+        bounds and the moving ones against the queues' tails in one go, see
+        VehicleArray.VehicleArray.scan. Returns the exiting vehicles.
+        
+        delta_t : float
+            The time-step size.
+        """
+        exits, arriving = self.vehicle_array.scan(bounds=self.exit_bounds(), tail_positions=self.tail_positions, delta_t=delta_t)
+        
+        for vehicle in exits:
+            self.exits[-1] += 1
+            self.tot_wait_time += vehicle.tot_wait_time
+            
+            if animate:
+                vehicle.remove_plot(self.vehicle_visuals.pop(vehicle, None))
+        
+        if animate:
+            for vehicle in self.vehicles:
+                if vehicle in exits:
+                    continue
+                if vehicle not in self.vehicle_visuals:
+                    self.vehicle_visuals[vehicle] = vehicle.initialize_plot(plt, linewidth=4.5/math.log(math.sqrt(5*len(self.grid_inds))))
+                vehicle.update_plot(self.vehicle_visuals[vehicle])
+        
+        for vehicle in arriving:
+            self.vehicle_array.land(vehicle)
+            self.intersections[vehicle.destination].queue_vehicle(arriving_vehicle=vehicle)
+            
+        return exits
+    
+    def exit_bounds(self) -> np.ndarray:
+        """
+        Returns the coordinate past which a vehicle has exited the network, along the axis of each
+        direction code, see out_of_bounds.
+        """
+        return np.array([self.intersections[(0,0)].queue_s.queue.head_position[1]+50, self.intersections[(0,0)].queue_e.queue.head_position[0]-50, self.intersections[self.grid_inds[-1]].queue_n.queue.head_position[1]-50, self.intersections[self.grid_inds[-1]].queue_w.queue.head_position[0]+50, 0.])
+    
+    def tail_positions(self, indices: np.ndarray) -> np.ndarray:
+        """
+        Returns the tail positions of the queues of some intersections, shape (len(indices), 4, 2),
+        indexed by direction code.
+        
+        indices : np.ndarray
+            The indices of the intersections into the vehicle array's grid indices.
+        """
+        intersections = [self.intersections[self.vehicle_array.grid_inds[i]] for i in indices.tolist()]
+        tail_positions = [tail_position for intersection in intersections for tail_position in (intersection.queue_n.queue.tail_position, intersection.queue_w.queue.tail_position, intersection.queue_s.queue.tail_position, intersection.queue_e.queue.tail_position)]
+        
+        # Read element-wise, as the coordinates are often numpy scalars, which np.array converts slowly.
+        return np.fromiter(itertools.chain.from_iterable(tail_positions), dtype=float, count=2*len(tail_positions)).reshape(-1,4,2)
+    
+    def time_until_reach(self) -> float:
+        """
+        Returns the time [s] until the first vehicle, moving at full speed, comes within 3 m of its
+        destination queue's tail, where it is queued, or leaves the network. Distances are measured
+        along the vehicles' axes. Infinite if there are no vehicles.
+        
+        Only called once every intersection is idle, when no vehicle is queued, so the vehicle
+        array only checks its moving vehicles.
+        """
+        bounds = self.exit_bounds()
+        
+        if self.vehicle_array != None:
+            return self.vehicle_array.time_until_reach(tail_positions=self.tail_positions, bounds=bounds)
+        
+        time = np.inf
         
         for vehicle in self.vehicles:
-            vehicle.time_step(delta_t=delta_t)
+            code = vehicle.heading
+            axis = Vehicle.AXES[code]
+            sign = Vehicle.SIGNS[code]
             
-        self.time = self.intersections[(0,0)].time
+            if sign == 0:
+                continue
+            
+            if vehicle.destination in self.grid_inds:
+                intersection = self.intersections[vehicle.destination]
+                queue = [intersection.queue_n, intersection.queue_w, intersection.queue_s, intersection.queue_e][code]
+                distance = sign*queue.queue.tail_position[axis]-3-sign*vehicle.position[axis]
+            else:
+                distance = sign*bounds[code]-sign*vehicle.tail_position[axis]
+            
+            time = min(time, distance/vehicle.full_speed)
         
-        return arrivals, departures
+        return time
+    
+    def quiet_steps(self, delta_t: float, max_num_steps: int) -> int:
+        """
+        Returns the nbr. of time-steps that can be run as one, at most max_num_steps: those that pass
+        before any vehicle is queued or leaves the network, any queue generates a vehicle or any
+        traffic light switches, less one to spare rounding errors. 1 while any intersection is not
+        left to itself, see FourWayIntersectionSimulator.time_until_event.
+        
+        delta_t : float
+            The time-step size.
+        max_num_steps : int
+            The largest nbr. of time-steps to return.
+        """
+        if max_num_steps <= 1:
+            return 1
+        
+        # Busy intersections tend to stay busy, so the last one found is checked first.
+        busy_grid_ind = getattr(self, "busy_grid_ind", None)
+        grid_inds = self.grid_inds if busy_grid_ind == None else [busy_grid_ind]+self.grid_inds
+        time = np.inf
+        
+        for grid_ind in grid_inds:
+            time = min(time, self.intersections[grid_ind].time_until_event())
+            
+            if time < 2*delta_t:
+                self.busy_grid_ind = grid_ind
+                return 1
+        
+        time = min(time, self.time_until_reach())
+        
+        if time < 2*delta_t:
+            return 1
+        
+        return int(min(max_num_steps, time/delta_t-1))
+    
+    def hold(self, num_steps: int) -> None:
+        """
+        Records time-steps in which nothing happens in the network, repeating the last recorded
+        entries, so that a run_event covering several time-steps at once leaves the recorded series
+        on the grid of the time-step size.
+        
+        num_steps : int
+            The nbr. of time-steps to record.
+        """
+        self.exits.pad(len(self.exits)+num_steps, self.exits[-1])
+        
+        for grid_ind in self.grid_inds:
+            self.intersections[grid_ind].hold(num_steps)
     
     def observe(self, departures) -> None:
         self.observations += [{"position": vehicle.position, "direction": vehicle.direction, "speed": vehicle.speed, "destination": self.intersections[vehicle.destination]} if vehicle.destination in self.grid_inds else {} for vehicle in departures]
@@ -946,34 +1672,61 @@ class IntersectionNetworkSimulator:
         moving_vehicles = []
         
         for departing_vehicle,prev_pos in departures:
-            if departing_vehicle.direction == Vehicle.NORTH:
+            self.unindex_vehicle(departing_vehicle)
+            
+            if departing_vehicle.heading == Vehicle.NORTH_CODE:
                 departing_vehicle.destination = (prev_pos[0]-1, prev_pos[1])
                 
                 if departing_vehicle.destination in self.grid_inds:
                     self.intersections[departing_vehicle.destination].queue_n.adjust_position(departing_vehicle)
                         
-            elif departing_vehicle.direction == Vehicle.WEST:
+            elif departing_vehicle.heading == Vehicle.WEST_CODE:
                 departing_vehicle.destination = (prev_pos[0], prev_pos[1]-1)
                 
                 if departing_vehicle.destination in self.grid_inds:
                     self.intersections[departing_vehicle.destination].queue_w.adjust_position(departing_vehicle)
                     
-            elif departing_vehicle.direction == Vehicle.SOUTH:
+            elif departing_vehicle.heading == Vehicle.SOUTH_CODE:
                 departing_vehicle.destination = (prev_pos[0]+1, prev_pos[1])
                 
                 if departing_vehicle.destination in self.grid_inds:
                     self.intersections[departing_vehicle.destination].queue_s.adjust_position(departing_vehicle)
                     
-            elif departing_vehicle.direction == Vehicle.EAST:
+            elif departing_vehicle.heading == Vehicle.EAST_CODE:
                 departing_vehicle.destination = (prev_pos[0], prev_pos[1]+1)
                 
                 if departing_vehicle.destination in self.grid_inds:
                     self.intersections[departing_vehicle.destination].queue_e.adjust_position(departing_vehicle)
             
+            self.index_vehicle(departing_vehicle)
             moving_vehicles += [departing_vehicle]
                 
         return moving_vehicles
     
+    def index_vehicle(self, vehicle: Vehicle.Vehicle) -> None:
+        """
+        Adds a vehicle to the index entry of its destination and direction, if its destination is within the network.
+        
+        vehicle : Vehicle.Vehicle
+            The vehicle to be indexed.
+        """
+        key = (vehicle.destination, vehicle.direction)
+        
+        if key in self.vehicle_index:
+            self.vehicle_index[key][vehicle] = None
+            
+    def unindex_vehicle(self, vehicle: Vehicle.Vehicle) -> None:
+        """
+        Removes a vehicle from the index entry of its current destination and direction.
+        
+        vehicle : Vehicle.Vehicle
+            The vehicle to be removed.
+        """
+        key = (vehicle.destination, vehicle.direction)
+        
+        if key in self.vehicle_index:
+            self.vehicle_index[key].pop(vehicle, None)
+    
     def out_of_bounds(self, vehicle: Vehicle.Vehicle) -> bool:
         """
         Checks if the vehicle has exited the network.
@@ -981,13 +1734,13 @@ class IntersectionNetworkSimulator:
         vehicle : Vehicle.Vehicle
             The vehicle being checked.
         """
-        if vehicle.direction == Vehicle.NORTH and vehicle.tail_position[1] > (self.intersections[(0,0)].queue_s.queue.head_position[1]+50):
+        if vehicle.heading == Vehicle.NORTH_CODE and vehicle.tail_position[1] > (self.intersections[(0,0)].queue_s.queue.head_position[1]+50):
             return True
-        elif vehicle.direction == Vehicle.WEST and vehicle.tail_position[0] < (self.intersections[(0,0)].queue_e.queue.head_position[0]-50):
+        elif vehicle.heading == Vehicle.WEST_CODE and vehicle.tail_position[0] < (self.intersections[(0,0)].queue_e.queue.head_position[0]-50):
             return True
-        elif vehicle.direction == Vehicle.SOUTH and vehicle.tail_position[1] < (self.intersections[self.grid_inds[-1]].queue_n.queue.head_position[1]-50):
+        elif vehicle.heading == Vehicle.SOUTH_CODE and vehicle.tail_position[1] < (self.intersections[self.grid_inds[-1]].queue_n.queue.head_position[1]-50):
             return True
-        elif vehicle.direction == Vehicle.EAST and vehicle.tail_position[0] > (self.intersections[self.grid_inds[-1]].queue_w.queue.head_position[0]+50):
+        elif vehicle.heading == Vehicle.EAST_CODE and vehicle.tail_position[0] > (self.intersections[self.grid_inds[-1]].queue_w.queue.head_position[0]+50):
             return True
         
         return False
@@ -1003,28 +1756,28 @@ class IntersectionNetworkSimulator:
         destination_y = 0
         passed = 1
         
-        if vehicle.direction == Vehicle.NORTH:
+        if vehicle.heading == Vehicle.NORTH_CODE:
             destination_x = self.intersections[vehicle.destination].queue_n.queue.tail_position[0]
             destination_y = self.intersections[vehicle.destination].queue_n.queue.tail_position[1]
             
             if vehicle.position[1] > destination_y:
                 passed = -1
                 
-        elif vehicle.direction == Vehicle.WEST:
+        elif vehicle.heading == Vehicle.WEST_CODE:
             destination_x = self.intersections[vehicle.destination].queue_w.queue.tail_position[0]
             destination_y = self.intersections[vehicle.destination].queue_w.queue.tail_position[1]
             
             if vehicle.position[0] < destination_x:
                 passed = -1
                 
-        elif vehicle.direction == Vehicle.SOUTH:
+        elif vehicle.heading == Vehicle.SOUTH_CODE:
             destination_x = self.intersections[vehicle.destination].queue_s.queue.tail_position[0]
             destination_y = self.intersections[vehicle.destination].queue_s.queue.tail_position[1]
             
             if vehicle.position[1] < destination_y:
                 passed = -1
                 
-        elif vehicle.direction == Vehicle.EAST:
+        elif vehicle.heading == Vehicle.EAST_CODE:
             destination_x = self.intersections[vehicle.destination].queue_e.queue.tail_position[0]
             destination_y = self.intersections[vehicle.destination].queue_e.queue.tail_position[1]
             
@@ -1048,7 +1801,7 @@ class IntersectionNetworkSimulator:
             
             
             stats[grid_ind] = {}
-            stats[grid_ind]["num_queued_vehicles"] = self.intersections[grid_ind].num_queued_vehicles[1:]
+            stats[grid_ind]["num_queued_vehicles"] = self.intersections[grid_ind].num_queued_vehicles[1:].tolist()
             stats[grid_ind]["avg_clearance_rate_ns"] = self.intersections[grid_ind].avg_clearance_rate_ns
             stats[grid_ind]["avg_clearance_rate_ew"] = self.intersections[grid_ind].avg_clearance_rate_ew
             stats[grid_ind]["arrivals_on_green_rate"] = self.intersections[grid_ind].arrivals_on_green_rate
@@ -1058,28 +1811,28 @@ class IntersectionNetworkSimulator:
             stats[grid_ind]["N"]["arrivals"] = n_arrivals
             stats[grid_ind]["N"]["departures"] = n_departures
             stats[grid_ind]["N"]["wait_time"] = n_wait_time
-            stats[grid_ind]["N"]["avg_queue_length"] = sum(n_queue_length)/len(n_queue_length)
+            stats[grid_ind]["N"]["avg_queue_length"] = np.sum(n_queue_length)/len(n_queue_length)
 
             stats[grid_ind]["W"] = {}
             stats[grid_ind]["W"]["queue_length"] = w_queue_length
             stats[grid_ind]["W"]["arrivals"] = w_arrivals
             stats[grid_ind]["W"]["departures"] = w_departures
             stats[grid_ind]["W"]["wait_time"] = w_wait_time
-            stats[grid_ind]["W"]["avg_queue_length"] = sum(w_queue_length)/len(w_queue_length)
+            stats[grid_ind]["W"]["avg_queue_length"] = np.sum(w_queue_length)/len(w_queue_length)
             
             stats[grid_ind]["S"] = {}
             stats[grid_ind]["S"]["queue_length"] = s_queue_length
             stats[grid_ind]["S"]["arrivals"] = s_arrivals
             stats[grid_ind]["S"]["departures"] = s_departures
             stats[grid_ind]["S"]["wait_time"] = s_wait_time
-            stats[grid_ind]["S"]["avg_queue_length"] = sum(s_queue_length)/len(s_queue_length)
+            stats[grid_ind]["S"]["avg_queue_length"] = np.sum(s_queue_length)/len(s_queue_length)
 
             stats[grid_ind]["E"] = {}
             stats[grid_ind]["E"]["queue_length"] = e_queue_length
             stats[grid_ind]["E"]["arrivals"] = e_arrivals
             stats[grid_ind]["E"]["departures"] = e_departures
             stats[grid_ind]["E"]["wait_time"] = e_wait_time
-            stats[grid_ind]["E"]["avg_queue_length"] = sum(e_queue_length)/len(e_queue_length)
+            stats[grid_ind]["E"]["avg_queue_length"] = np.sum(e_queue_length)/len(e_queue_length)
             
             stats["avg_wait_time"] = self.avg_wait_time
             
@@ -1089,6 +1842,39 @@ class IntersectionNetworkSimulator:
         f = open(Path(output_destination) / file_name,"wb")
         pkl.dump(self,f)
         f.close()
+        
+    def save_checkpoint(self, file_name: str, output_destination="./data/") -> None:
+        """
+        Saves the simulation state, so that a network built with the same configuration can continue
+        the simulation exactly where it stopped, see load_checkpoint. Plots and arrival rate
+        functions are left out. The file is replaced only once the checkpoint is completely written.
+        
+        file_name : str
+            The name of the checkpoint file.
+        output_destination : str (optional)
+            The directory of the checkpoint file. Defaults to './data/'.
+        """
+        path = Path(output_destination) / file_name
+        temporary = path.with_name(path.name+".tmp")
+        
+        with open(temporary, "wb") as f:
+            f.write(Checkpoint.dumps(self))
+            
+        os.replace(temporary, path)
+        
+    def load_checkpoint(self, file_name: str, destination="./data/") -> None:
+        """
+        Restores the simulation state saved by save_checkpoint into this network, which must have
+        been built with the same configuration (grid, queue rates and traffic lights). Also restores
+        the global random states, for networks that are not seeded.
+        
+        file_name : str
+            The name of the checkpoint file.
+        destination : str (optional)
+            The directory of the checkpoint file. Defaults to './data/'.
+        """
+        with open(Path(destination) / file_name, "rb") as f:
+            Checkpoint.loads(f.read(), network=self)
     
     def plot_queue_stats(self, plt, grid_ind: (int,int), direction: (int,int), end_time: float, delta_t: float, fig_size=(float,float), start_time=0, traffic_light=None):
         """
@@ -1230,6 +2016,8 @@ class QueueEstimator():
             The timestamp at which the next arrival occurs.
         next_time_to_depart : float
             The time between the last departure and the next [s].
+        random_pool : RandomPool.RandomPool
+            The buffered random draws of the queue.
         """
         self.time = 0
         self.arrival_timestamps = []
@@ -1241,6 +2029,7 @@ class QueueEstimator():
         self.head_position = (0.,0.)
         self.tail_position = (0.,0.)
         self.direction = (0,0)
+        self.random_pool = RandomPool.RandomPool()
         
     def initialize(self, direction=Vehicle.NORTH, head_position=(0.,0.), external_arrivals=False) -> None:
         """
@@ -1274,7 +2063,7 @@ class QueueEstimator():
         arrival, departure = 0, 0
         
         if self.external_arrivals and len(self.arrival_timestamps) <= 0:
-            self.arrival_timestamps += [self.time+np.random.normal(loc=10, scale=5)]
+            self.arrival_timestamps += [self.time+self.random_pool.normal(loc=10, scale=5)]
                 
         
         if len(self.arrival_timestamps) > 0 and self.time >= self.arrival_timestamps[0]:
@@ -1306,9 +2095,10 @@ class QueueEstimator():
     
     def get_stats(self) -> (list, list, list, float):
         """
-        Returns stats.
+        Returns stats. The series are copied into lists, so they do not change as the simulation
+        continues.
         """
-        return self.queue_length[1:], self.departures[1:], self.arrivals[1:]
+        return self.queue_length[1:].tolist(), self.departures[1:].tolist(), self.arrivals[1:].tolist()
 
 class FourWayIntersectionEstimator:
     def __init__(self):
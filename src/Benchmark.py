@@ -0,0 +1,329 @@
+import sys
+import time
+import json
+import platform
+import argparse
+import numpy as np
+import Model1
+import Model2
+import TrafficLight
+import NetworkSpec
+
+GRID_SIZES = [(1,1), (3,3), (10,10), (30,30)]
+MODELS = ["Model1", "Model2"]
+TRAFFIC_LIGHTS = ["periodic", "memoryless", "adaptive_1", "adaptive_2", "adaptive_3"]
+DEMANDS = {"light": 1/20, "saturated": 1/2}
+VEHICLE_PHASES = ["scan", "time_step"]
+
+def traffic_lights(light: str, grid_ind: (int,int)) -> (TrafficLight.TrafficLight, TrafficLight.TrafficLight):
+    """
+    Returns the north-south and east-west traffic lights of a benchmark intersection.
+
+    light : str
+        The traffic light type: 'periodic', 'memoryless' or 'adaptive_<rule>'.
+    grid_ind : (int,int)
+        The grid index of the intersection. Offsets the periodic lights along the grid.
+    """
+    if light == "periodic":
+        time_delay = 10*(grid_ind[0]+grid_ind[1]) % 60
+        traffic_light_ew = TrafficLight.PeriodicTrafficLight()
+        traffic_light_ew.initialize(period=60, time_delay=time_delay)
+        traffic_light_ns = TrafficLight.PeriodicTrafficLight()
+        traffic_light_ns.initialize(period=60, time_delay=(time_delay+30) % 60)
+    elif light == "memoryless":
+        traffic_light_ew = TrafficLight.MemoryLessTrafficLight()
+        traffic_light_ew.initialize(green_to_red_rate=1/60, red_to_green_rate=1/60)
+        traffic_light_ns = TrafficLight.TrafficLightMirror()
+        traffic_light_ns.initialize(traffic_light=traffic_light_ew)
+    elif light.startswith("adaptive_"):
+        traffic_light_ew = TrafficLight.AdaptiveTrafficLight()
+        traffic_light_ew.initialize(sensor_depth=3, rule=int(light[len("adaptive_"):]))
+        traffic_light_ns = TrafficLight.TrafficLightMirror()
+        traffic_light_ns.initialize(traffic_light=traffic_light_ew)
+    else:
+        raise ValueError("Unknown traffic light type '"+light+"'.")
+
+    return traffic_light_ns, traffic_light_ew
+
+def build_network(model: str, grid_dimensions: (int,int), light: str, arrival_rate: float, vectorized=False, seed=0):
+    """
+    Returns a benchmark network, with arrivals to every lane entering the grid.
+
+    model : str
+        The model: 'Model1' or 'Model2'.
+    grid_dimensions : (int,int)
+        The grid dimensions of the network.
+    light : str
+        The traffic light type, see traffic_lights.
+    arrival_rate : float
+        The arrival rate [vehicles/s] of each lane entering the grid.
+    vectorized : bool (optional)
+        Whether to keep the vehicle states in a VehicleArray.VehicleArray. Defaults to False.
+    seed : int (optional)
+        The seed of the network's random streams. Defaults to 0.
+    """
+    if model == "Model1":
+        network = Model1.IntersectionNetworkSimulator()
+        rate = NetworkSpec.ConstantRate(arrival_rate)
+    elif model == "Model2":
+        network = Model2.IntersectionNetworkSimulator()
+        rate = arrival_rate
+    else:
+        raise ValueError("Unknown model '"+model+"'.")
+
+    network.initialize(grid_dimensions=grid_dimensions, grid_distance=150, vectorized=vectorized, seed=seed)
+
+    for grid_ind in network.grid_inds:
+        arrival_rates = dict()
+        if grid_ind[0] == 0: # upper edge
+            arrival_rates["arrival_rate_s"] = rate
+        if grid_ind[0] == grid_dimensions[0]-1: # lower edge
+            arrival_rates["arrival_rate_n"] = rate
+        if grid_ind[1] == 0: # left edge
+            arrival_rates["arrival_rate_e"] = rate
+        if grid_ind[1] == grid_dimensions[1]-1: # right edge
+            arrival_rates["arrival_rate_w"] = rate
+
+        network.set_queue_rate_parameters(grid_ind=grid_ind, avg_departure_time=2, **arrival_rates)
+
+        traffic_light_ns, traffic_light_ew = traffic_lights(light=light, grid_ind=grid_ind)
+        network.set_traffic_lights(grid_ind=grid_ind, traffic_light_ns=traffic_light_ns, traffic_light_ew=traffic_light_ew)
+
+    network.set_observable_intersections(grid_inds=network.grid_inds)
+
+    return network
+
+def num_generated_vehicles(network) -> int:
+    """
+    Returns the nbr. of vehicles that have entered a network.
+
+    network : BaseModel.IntersectionNetworkSimulator
+        The network.
+    """
+    num_vehicles = 0
+
+    for grid_ind in network.grid_inds:
+        intersection = network.intersections[grid_ind]
+        for queue in [intersection.queue_n, intersection.queue_w, intersection.queue_s, intersection.queue_e]:
+            num_vehicles += queue.num_generated
+
+    return num_vehicles
+
+def run_case(model: str, grid_dimensions: (int,int), light: str, demand: str, end_time: float, delta_t: float, vectorized=False, skip_idle=False, max_delta_t=None, partitions=None, seed=0) -> dict:
+    """
+    Builds and simulates one benchmark network and returns its throughput.
+
+    Construction is timed separately from the simulation, so that the rates only cover simulate.
+
+    model : str
+        The model: 'Model1' or 'Model2'.
+    grid_dimensions : (int,int)
+        The grid dimensions of the network.
+    light : str
+        The traffic light type, see traffic_lights.
+    demand : str
+        The demand level, a key of DEMANDS.
+    end_time : float
+        The simulated time [s].
+    delta_t : float
+        The time-step size [s].
+    vectorized : bool (optional)
+        Whether to keep the vehicle states in a VehicleArray.VehicleArray. Defaults to False.
+    skip_idle : bool (optional)
+        Whether to let idle intersections sleep, see Activity.ActivityTracker. Defaults to False.
+    max_delta_t : float (optional)
+        The largest time-step size [s], see BaseModel.IntersectionNetworkSimulator.simulate. Defaults
+        to None, which runs every time-step at delta_t.
+    partitions : (int,int) (optional)
+        The nbr. of row and column blocks to run the network in, one worker process each, see
+        BaseModel.IntersectionNetworkSimulator.simulate. Clipped to the grid dimensions. Defaults to
+        None, which runs the network in this process.
+    seed : int (optional)
+        The seed of the network's random streams. Defaults to 0.
+    """
+    if partitions != None:
+        partitions = (min(partitions[0], grid_dimensions[0]), min(partitions[1], grid_dimensions[1]))
+    
+    start = time.perf_counter()
+    network = build_network(model=model, grid_dimensions=grid_dimensions, light=light, arrival_rate=DEMANDS[demand], vectorized=vectorized, seed=seed)
+    build_time = time.perf_counter()-start
+
+    start = time.perf_counter()
+    network.simulate(delta_t=delta_t, end_time=end_time, skip_idle=skip_idle, max_delta_t=max_delta_t, partitions=partitions)
+    wall_time = time.perf_counter()-start
+
+    num_steps = len(network.exits)-1
+    num_vehicles = num_generated_vehicles(network)
+
+    return {"model": model,
+            "grid_dimensions": list(grid_dimensions),
+            "traffic_light": light,
+            "demand": demand,
+            "arrival_rate": DEMANDS[demand],
+            "vectorized": vectorized,
+            "skip_idle": skip_idle,
+            "max_delta_t": max_delta_t,
+            "partitions": None if partitions == None else list(partitions),
+            "seed": seed,
+            "end_time": end_time,
+            "delta_t": delta_t,
+            "build_time": build_time,
+            "wall_time": wall_time,
+            "num_steps": num_steps,
+            "num_vehicles": num_vehicles,
+            "num_exits": int(network.exits[-1]),
+            "sim_seconds_per_second": network.time/wall_time,
+            "steps_per_second": num_steps/wall_time,
+            "vehicles_per_second": num_vehicles/wall_time}
+
+def describe_machine(results: list) -> dict:
+    """
+    Returns benchmark results with a description of the machine they were measured on.
+
+    results : [dict]
+        The results.
+    """
+    return {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "results": results}
+
+def compare_vectorized(model: str, grid_dimensions: (int,int), light: str, demand: str, end_time: float, delta_t: float, seed=0) -> dict:
+    """
+    Simulates one benchmark network with and without a VehicleArray.VehicleArray, profiled, and
+    returns the time each spends on the vehicles (the phases in VEHICLE_PHASES: exits, arrivals
+    to queues and moving the vehicles) and in total, and the speedups of the vehicle array.
+
+    model : str
+        The model: 'Model1' or 'Model2'.
+    grid_dimensions : (int,int)
+        The grid dimensions of the network.
+    light : str
+        The traffic light type, see traffic_lights.
+    demand : str
+        The demand level, a key of DEMANDS.
+    end_time : float
+        The simulated time [s].
+    delta_t : float
+        The time-step size [s].
+    seed : int (optional)
+        The seed of the network's random streams. Defaults to 0.
+    """
+    result = {"model": model,
+              "grid_dimensions": list(grid_dimensions),
+              "traffic_light": light,
+              "demand": demand,
+              "seed": seed,
+              "end_time": end_time,
+              "delta_t": delta_t}
+    stats = []
+
+    for vectorized in [False, True]:
+        network = build_network(model=model, grid_dimensions=grid_dimensions, light=light, arrival_rate=DEMANDS[demand], vectorized=vectorized, seed=seed)
+        profiler = network.simulate(delta_t=delta_t, end_time=end_time, profile=True)
+        key = "vectorized" if vectorized else "object"
+
+        result[key+"_vehicle_time"] = sum(profiler.times.get(phase, 0.) for phase in VEHICLE_PHASES)
+        result[key+"_total_time"] = profiler.total_time()
+        result["num_vehicles"] = len(network.vehicles)
+        stats += [repr(network.get_stats())]
+
+    result["vehicle_speedup"] = result["object_vehicle_time"]/result["vectorized_vehicle_time"]
+    result["total_speedup"] = result["object_total_time"]/result["vectorized_total_time"]
+    result["same_stats"] = stats[0] == stats[1]
+
+    return result
+
+def run_suite(grid_sizes=GRID_SIZES, models=MODELS, lights=TRAFFIC_LIGHTS, demands=list(DEMANDS), end_time=60., delta_t=0.1, vectorized=False, skip_idle=False, max_delta_t=None, partitions=None, seed=0, verbose=False) -> dict:
+    """
+    Runs every combination of grid size, model, traffic light and demand, and returns the results
+    with a description of the machine they were measured on.
+
+    grid_sizes : [(int,int)] (optional)
+        The grid dimensions. Defaults to GRID_SIZES.
+    models : [str] (optional)
+        The models. Defaults to MODELS.
+    lights : [str] (optional)
+        The traffic light types. Defaults to TRAFFIC_LIGHTS.
+    demands : [str] (optional)
+        The demand levels. Defaults to all of DEMANDS.
+    end_time : float (optional)
+        The simulated time [s] of each case. Defaults to 60.
+    delta_t : float (optional)
+        The time-step size [s]. Defaults to 0.1.
+    vectorized : bool (optional)
+        Whether to keep the vehicle states in a VehicleArray.VehicleArray. Defaults to False.
+    skip_idle : bool (optional)
+        Whether to let idle intersections sleep, see Activity.ActivityTracker. Defaults to False.
+    max_delta_t : float (optional)
+        The largest time-step size [s], see BaseModel.IntersectionNetworkSimulator.simulate. Defaults
+        to None, which runs every time-step at delta_t.
+    partitions : (int,int) (optional)
+        The nbr. of row and column blocks to run each network in, see run_case. Defaults to None.
+    seed : int (optional)
+        The seed of each network's random streams. Defaults to 0.
+    verbose : bool (optional)
+        Whether to print each case's throughput as it finishes. Defaults to False.
+    """
+    results = []
+
+    for grid_dimensions in grid_sizes:
+        for model in models:
+            for light in lights:
+                for demand in demands:
+                    result = run_case(model=model, grid_dimensions=tuple(grid_dimensions), light=light, demand=demand, end_time=end_time, delta_t=delta_t, vectorized=vectorized, skip_idle=skip_idle, max_delta_t=max_delta_t, partitions=partitions, seed=seed)
+                    results += [result]
+
+                    if verbose:
+                        print("{}x{} {} {} {}: {:.1f} sim s/s, {:.0f} steps/s, {:.0f} vehicles/s".format(grid_dimensions[0], grid_dimensions[1], model, light, demand, result["sim_seconds_per_second"], result["steps_per_second"], result["vehicles_per_second"]), file=sys.stderr)
+
+    return describe_machine(results)
+
+def parse_grid_size(text: str) -> (int,int):
+    rows, cols = text.lower().split("x")
+
+    return (int(rows), int(cols))
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Measures the simulation throughput across grid sizes, models, traffic lights and demand levels.")
+    parser.add_argument("--grid-sizes", nargs="+", type=parse_grid_size, default=GRID_SIZES, help="grid dimensions, e.g. 1x1 3x3")
+    parser.add_argument("--models", nargs="+", choices=MODELS, default=MODELS)
+    parser.add_argument("--lights", nargs="+", choices=TRAFFIC_LIGHTS, default=TRAFFIC_LIGHTS)
+    parser.add_argument("--demands", nargs="+", choices=list(DEMANDS), default=list(DEMANDS))
+    parser.add_argument("--end-time", type=float, default=60., help="simulated time [s] of each case")
+    parser.add_argument("--delta-t", type=float, default=0.1, help="time-step size [s]")
+    parser.add_argument("--vectorized", action="store_true", help="keep the vehicle states in a VehicleArray")
+    parser.add_argument("--compare-vectorized", action="store_true", help="time the vehicle phases with and without a VehicleArray instead")
+    parser.add_argument("--skip-idle", action="store_true", help="let idle intersections sleep")
+    parser.add_argument("--max-delta-t", type=float, default=None, help="largest time-step size [s] while nothing is about to happen")
+    parser.add_argument("--partitions", type=parse_grid_size, default=None, help="row and column blocks to run each network in, one worker process each, e.g. 2x2")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="JSON file to write the results to. Defaults to stdout")
+    args = parser.parse_args(argv)
+
+    if args.compare_vectorized:
+        results = []
+
+        for grid_dimensions in args.grid_sizes:
+            for model in args.models:
+                for light in args.lights:
+                    for demand in args.demands:
+                        result = compare_vectorized(model=model, grid_dimensions=tuple(grid_dimensions), light=light, demand=demand, end_time=args.end_time, delta_t=args.delta_t, seed=args.seed)
+                        results += [result]
+                        print("{}x{} {} {} {}: vehicle phases {:.3f} s -> {:.3f} s ({:.2f}x), total {:.2f}x, same stats: {}".format(grid_dimensions[0], grid_dimensions[1], model, light, demand, result["object_vehicle_time"], result["vectorized_vehicle_time"], result["vehicle_speedup"], result["total_speedup"], result["same_stats"]), file=sys.stderr)
+
+        report = describe_machine(results)
+    else:
+        report = run_suite(grid_sizes=args.grid_sizes, models=args.models, lights=args.lights, demands=args.demands, end_time=args.end_time, delta_t=args.delta_t, vectorized=args.vectorized, skip_idle=args.skip_idle, max_delta_t=args.max_delta_t, partitions=args.partitions, seed=args.seed, verbose=True)
+
+    if args.output == None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+if __name__ == "__main__":
+    main()
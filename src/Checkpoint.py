@@ -0,0 +1,141 @@
+import io
+import copyreg
+import pickle
+import random
+import types
+import itertools
+import numpy as np
+import matplotlib.artist
+import RandomPool
+
+VERSION = 1
+
+def callables(network) -> dict:
+    """
+    Returns the arrival rate functions of a network's queues, keyed by (grid_ind, direction). These
+    are configuration rather than state, so a checkpoint refers to them by key instead of storing
+    them, and they are taken from the network the checkpoint is loaded into.
+
+    network : BaseModel.IntersectionNetworkSimulator
+        The network.
+    """
+    functions = dict()
+
+    for grid_ind in network.grid_inds:
+        intersection = network.intersections[grid_ind]
+        for direction, queue in zip(["N", "W", "S", "E"], [intersection.queue_n, intersection.queue_w, intersection.queue_s, intersection.queue_e]):
+            if isinstance(queue.queue.arrival_rate, types.FunctionType):
+                functions[(tuple(int(i) for i in grid_ind), direction)] = queue.queue.arrival_rate
+
+    return functions
+
+BUFFERS = [("uniforms", "uniform_ind"), ("exponentials", "exponential_ind"), ("normals", "normal_ind")]
+
+def reduce_random_pool(pool: RandomPool.RandomPool):
+    # Unlike copies of a network, a checkpoint must replay the buffered draws. Only the unused draws
+    # are stored, along with the buffer length that the next refill size depends on.
+    state = pool.__dict__.copy()
+
+    for buffer, index in BUFFERS:
+        state[buffer] = (len(state[buffer]), state[buffer][state[index]:].copy())
+
+    return (restore_random_pool, (state,))
+
+def restore_random_pool(state: dict) -> RandomPool.RandomPool:
+    pool = RandomPool.RandomPool()
+
+    for buffer, index in BUFFERS:
+        length, unused = state[buffer]
+        state[buffer] = np.concatenate([np.zeros(length-len(unused)), unused])
+
+    pool.__dict__.update(state)
+
+    return pool
+
+def reduce_count(count: itertools.count):
+    # Pickling itertools.count is deprecated, so the counter is stored by its next value.
+    return (itertools.count, (int(repr(count)[len("count("):-1]),))
+
+class CheckpointPickler(pickle.Pickler):
+    def __init__(self, file, functions: dict):
+        """
+        Pickles the state of a network, leaving out plots and arrival rate functions.
+
+        functions : dict
+            The arrival rate functions of the network, see callables.
+        """
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.function_keys = {id(function): key for key, function in functions.items()}
+        self.dispatch_table = copyreg.dispatch_table.copy()
+        self.dispatch_table[RandomPool.RandomPool] = reduce_random_pool
+        self.dispatch_table[itertools.count] = reduce_count
+
+    def persistent_id(self, obj):
+        if isinstance(obj, matplotlib.artist.Artist):
+            return ("artist",)
+
+        if isinstance(obj, types.FunctionType) and id(obj) in self.function_keys:
+            return ("function", self.function_keys[id(obj)])
+
+        return None
+
+class CheckpointUnpickler(pickle.Unpickler):
+    def __init__(self, file, functions: dict):
+        """
+        Unpickles the state of a network, taking the arrival rate functions from another network.
+
+        functions : dict
+            The arrival rate functions of the other network, see callables.
+        """
+        super().__init__(file)
+        self.functions = functions
+
+    def persistent_load(self, pid):
+        if pid[0] == "artist":
+            return None
+
+        if pid[0] == "function":
+            if pid[1] not in self.functions:
+                raise pickle.UnpicklingError("The network has no arrival rate function for "+str(pid[1])+".")
+
+            return self.functions[pid[1]]
+
+        raise pickle.UnpicklingError("Unknown persistent id "+str(pid)+".")
+
+def dumps(network) -> bytes:
+    """
+    Returns a checkpoint of a network: the state of its queues, vehicles, traffic lights, random
+    streams and recorded series, its clock, and the global random states.
+
+    network : BaseModel.IntersectionNetworkSimulator
+        The network.
+    """
+    file = io.BytesIO()
+    state = {"version": VERSION, "network": network, "random_state": random.getstate(), "numpy_random_state": np.random.get_state()}
+    CheckpointPickler(file, functions=callables(network)).dump(state)
+
+    return file.getvalue()
+
+def loads(data: bytes, network):
+    """
+    Restores a checkpoint into a network built with the same configuration, including the arrival
+    rate functions, and restores the global random states. Returns the network.
+
+    data : bytes
+        The checkpoint, as returned by dumps.
+    network : BaseModel.IntersectionNetworkSimulator
+        The network.
+    """
+    state = CheckpointUnpickler(io.BytesIO(data), functions=callables(network)).load()
+
+    if state["version"] != VERSION:
+        raise ValueError("Unsupported checkpoint version "+str(state["version"])+".")
+
+    if state["network"].__class__ != network.__class__:
+        raise TypeError("Checkpoint of a "+state["network"].__class__.__name__+" cannot be loaded into a "+network.__class__.__name__+".")
+
+    network.__dict__ = state["network"].__dict__
+    random.setstate(state["random_state"])
+    np.random.set_state(state["numpy_random_state"])
+
+    return network
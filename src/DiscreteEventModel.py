@@ -0,0 +1,509 @@
+import BaseModel
+import Model1
+import heapq
+import itertools
+import math
+import numpy as np
+import Vehicle
+import NetworkSpec
+import TrafficLight
+import Profiler
+
+ARRIVAL = 0
+LINK = 1
+DEPARTURE = 2
+CLEARANCE = 3
+SWITCH = 4
+EXIT = 5
+EVENT_NAMES = ["arrival", "link", "departure", "clearance", "switch", "exit"]
+
+MIN_SWITCH_TIME = 1e-6
+# The gap [m] a stopped vehicle keeps to the tail of the vehicle ahead, as in the time-stepped queues.
+STANDSTILL_GAP = 3.
+# The time [s] a stopped vehicle takes to move off once it may, as the time-stepped queues take a
+# time-step of 0.1 s to start a vehicle once the one ahead has pulled away.
+START_UP_TIME = 0.1
+
+class FourWayIntersectionSimulator(Model1.FourWayIntersectionSimulator):
+    def __init__(self):
+        """
+        See Model1.FourWayIntersectionSimulator. Additionally:
+
+        grid_ind : (int,int)
+            The grid index of the intersection.
+        scheduled_departures : dict
+            The event id of the pending departure of each queue ('N','W','S','E'). None if no departure is pending.
+        discharge_times : dict
+            The time [s] at which the next stopped vehicle of each queue can reach the stop line, as
+            it moves off behind the last departing vehicle.
+        vertical_busy_until : float
+            The time [s] at which the last north- or southbound vehicle has cleared the intersection.
+        horizontal_busy_until : float
+            The time [s] at which the last east- or westbound vehicle has cleared the intersection.
+        num_arrivals : dict
+            The current total nbr. of arrivals to each queue.
+        num_departures : dict
+            The current total nbr. of departures from each queue.
+        num_switches : dict
+            The current total nbr. of green-to-red switches of each traffic light ('ns','ew').
+        """
+        super().__init__()
+        self.grid_ind = (0,0)
+        self.scheduled_departures = {"N": None, "W": None, "S": None, "E": None}
+        self.discharge_times = {"N": 0., "W": 0., "S": 0., "E": 0.}
+        self.vertical_busy_until = 0.
+        self.horizontal_busy_until = 0.
+        self.num_arrivals = {"N": 0, "W": 0, "S": 0, "E": 0}
+        self.num_departures = {"N": 0, "W": 0, "S": 0, "E": 0}
+        self.num_switches = {"ns": 0, "ew": 0}
+
+    def approaches(self) -> list:
+        """
+        Returns the queues of the intersection with their keys and controlling traffic lights.
+        """
+        return [("N", self.queue_n, self.traffic_light_ns), ("W", self.queue_w, self.traffic_light_ew), ("S", self.queue_s, self.traffic_light_ns), ("E", self.queue_e, self.traffic_light_ew)]
+
+    def get_queue(self, key: str) -> BaseModel.QueueSimulator:
+        """
+        Returns the queue with the given key, 'N', 'W', 'S' or 'E'.
+        """
+        return {"N": self.queue_n, "W": self.queue_w, "S": self.queue_s, "E": self.queue_e}[key]
+
+    def num_queued(self) -> int:
+        return self.queue_n.queue.queue_length+self.queue_w.queue.queue_length+self.queue_s.queue.queue_length+self.queue_e.queue.queue_length
+
+    def record(self, step: int) -> None:
+        """
+        Extends all per-step series up to (not including) the given step with the current state.
+
+        step : int
+            The index of the current time-step.
+        """
+        length = step+1
+
+        self.num_queued_vehicles.pad(length, self.num_queued())
+
+        for key, queue, traffic_light in self.approaches():
+            queue.queue_length.pad(length, queue.queue.queue_length)
+            queue.arrivals.pad(length, self.num_arrivals[key])
+            queue.departures.pad(length, self.num_departures[key])
+
+        for key, traffic_light in [("ns", self.traffic_light_ns), ("ew", self.traffic_light_ew)]:
+            traffic_light.service_history.pad(length, traffic_light.service)
+            traffic_light.num_cycles.pad(length, self.num_switches[key])
+            traffic_light.switches.pad(length, 0)
+
+    def synchronize(self, time: float) -> None:
+        """
+        Sets the clocks of the intersection, its queues and its traffic lights.
+
+        time : float
+            The current simulation time [s].
+        """
+        self.time = time
+        self.traffic_light_ns.time = time
+        self.traffic_light_ew.time = time
+
+        for key, queue, traffic_light in self.approaches():
+            queue.time = time
+
+    def update_light(self, key: str, previous_service, step: int, delta_t: float) -> None:
+        """
+        Updates the service of a traffic light and records any switch.
+
+        key : str
+            The traffic light, 'ns' or 'ew'.
+        previous_service
+            The service of the traffic light before the event.
+        step : int
+            The index of the current time-step.
+        delta_t : float
+            The time-step size of the recorded series.
+        """
+        traffic_light = self.traffic_light_ns if key == "ns" else self.traffic_light_ew
+        traffic_light.service = traffic_light.saturation_rate()
+        switch = float(traffic_light.service)-float(previous_service)
+
+        if switch == 0:
+            return
+
+        if len(traffic_light.switches) <= step+1:
+            traffic_light.switches.append(switch)
+        else:
+            traffic_light.switches[-1] += switch
+
+        if switch < 0:
+            self.num_switches[key] += 1
+
+        num_cycles = self.num_switches[key]
+
+        if key == "ns":
+            if switch > 0:
+                self.green_onsets_ns = self.green_onsets_ns[-1:]+[(step+1, self.num_queued())]
+
+                if num_cycles > 1:
+                    duration = delta_t*(self.green_onsets_ns[-1][0]-self.green_onsets_ns[-2][0])
+                    growth = self.green_onsets_ns[-1][1]-self.green_onsets_ns[-2][1]
+                    self.cum_clearance_rate_ns += growth/duration
+
+            if num_cycles > 2:
+                self.avg_clearance_rate_ns = self.cum_clearance_rate_ns/(num_cycles-1)
+        else:
+            if switch > 0:
+                self.green_onsets_ew = self.green_onsets_ew[-1:]+[(step+1, self.num_queued())]
+
+                if num_cycles > 1:
+                    duration = delta_t*(self.green_onsets_ew[-1][0]-self.green_onsets_ew[-2][0])
+                    growth = self.green_onsets_ew[-1][1]-self.green_onsets_ew[-2][1]
+                    self.cum_clearance_rate_ew += growth/duration
+
+            if num_cycles > 2:
+                self.avg_clearance_rate_ew = self.cum_clearance_rate_ew/(num_cycles-1)
+
+    def can_serve(self, key: str, time: float) -> bool:
+        """
+        Checks if the frontmost vehicle of a queue may depart.
+
+        key : str
+            The queue, 'N', 'W', 'S' or 'E'.
+        time : float
+            The current simulation time [s].
+        """
+        if key in ["N", "S"]:
+            return self.traffic_light_ns.saturation_rate() > 0 and time >= self.horizontal_busy_until
+
+        return self.traffic_light_ew.saturation_rate() > 0 and time >= self.vertical_busy_until
+
+class IntersectionNetworkSimulator(BaseModel.IntersectionNetworkSimulator):
+    def __init__(self):
+        """
+        See BaseModel.IntersectionNetworkSimulator, except that vehicles maps each vehicle to the
+        time [s] of its last event, from which its wait is measured. Additionally:
+
+        events : list
+            The heap of scheduled events, as (time, event id, event type, target).
+        event_ids : itertools.count
+            Issues event ids, which also break ties between simultaneous events.
+        scheduled : bool
+            Whether the initial events have been scheduled.
+        num_exits : int
+            The current total nbr. of vehicles that have exited the network.
+        num_steps : int
+            The nbr. of recorded time-steps.
+        """
+        super().__init__()
+        self.edge_type = Model1.PoissonQueueSimulator
+        self.intersection_type = FourWayIntersectionSimulator
+        self.events = []
+        self.event_ids = itertools.count()
+        self.scheduled = False
+        self.num_exits = 0
+        self.num_steps = 0
+
+    def initialize(self, grid_dimensions: (int,int), grid_distance=150, vectorized=False, seed=None):
+        """
+        Initializes the IntersectionNetworkSimulator instance.
+
+        grid_dimensions : (int,int)
+            The grid dimensions of the intersection network.
+        grid_distance : float
+            The distance [m] between each intersection centerpoint.
+        vectorized : bool (optional)
+            Whether to keep the vehicle states in a VehicleArray.VehicleArray. Defaults to False.
+        seed : int or np.random.SeedSequence (optional)
+            Seed of the random streams of the queues and traffic lights. Defaults to None.
+        """
+        super().initialize(grid_dimensions=grid_dimensions, grid_distance=grid_distance, vectorized=vectorized, seed=seed)
+
+        for grid_ind in self.grid_inds:
+            self.intersections[grid_ind].grid_ind = grid_ind
+
+    def schedule(self, time: float, event_type: int, target) -> int:
+        """
+        Schedules an event and returns its id.
+
+        time : float
+            The time [s] of the event.
+        event_type : int
+            The type of the event.
+        target
+            The intersection, queue or vehicle the event concerns.
+        """
+        event_id = next(self.event_ids)
+        heapq.heappush(self.events, (time, event_id, event_type, target))
+
+        return event_id
+
+    def schedule_initial_events(self) -> None:
+        """
+        Schedules the first arrival to each edge queue and the first switch of each traffic light.
+        """
+        for grid_ind in self.grid_inds:
+            intersection = self.intersections[grid_ind]
+
+            for key, queue, traffic_light in intersection.approaches():
+                if not isinstance(queue, (Model1.PoissonQueueSimulator, Model1.ConnectedQueueSimulator)):
+                    raise ValueError("The discrete-event simulation requires Model1 queues, not "+queue.__class__.__name__+".")
+
+            for traffic_light in [intersection.traffic_light_ns, intersection.traffic_light_ew]:
+                if traffic_light.adaptive:
+                    raise ValueError("Adaptive traffic lights require the time-stepped simulation.")
+                if not isinstance(traffic_light, TrafficLight.TrafficLightMirror):
+                    traffic_light.service = traffic_light.saturation_rate()
+
+        for grid_ind in self.grid_inds:
+            intersection = self.intersections[grid_ind]
+
+            for traffic_light in [intersection.traffic_light_ns, intersection.traffic_light_ew]:
+                if isinstance(traffic_light, TrafficLight.TrafficLightMirror):
+                    traffic_light.service = traffic_light.saturation_rate()
+
+            for key, queue, traffic_light in intersection.approaches():
+                if isinstance(queue, self.edge_type):
+                    self.schedule_arrival(intersection=intersection, key=key, time=self.time)
+
+            self.schedule_switch(intersection=intersection, key="ns", time=self.time)
+            self.schedule_switch(intersection=intersection, key="ew", time=self.time)
+
+        self.scheduled = True
+
+    def schedule_arrival(self, intersection: FourWayIntersectionSimulator, key: str, time: float) -> None:
+        queue = intersection.get_queue(key)
+        queue.time = time
+        time_until_arrival = queue.time_until_arrival()
+
+        if time_until_arrival < np.inf:
+            self.schedule(time=time+time_until_arrival, event_type=ARRIVAL, target=(intersection.grid_ind, key))
+
+    def schedule_switch(self, intersection: FourWayIntersectionSimulator, key: str, time: float) -> None:
+        traffic_light = intersection.traffic_light_ns if key == "ns" else intersection.traffic_light_ew
+        traffic_light.time = time
+        time_until_switch = traffic_light.time_until_switch()
+
+        if time_until_switch < np.inf:
+            self.schedule(time=time+max(time_until_switch, MIN_SWITCH_TIME), event_type=SWITCH, target=(intersection.grid_ind, key))
+
+    def serve(self, intersection: FourWayIntersectionSimulator, time: float) -> None:
+        """
+        Schedules departures from the queues that may be served and cancels those of the queues that
+        may not, stopping their vehicles.
+
+        Queues discharge at the saturation headway of the time-stepped models rather than at a
+        sampled rate: a vehicle that is still moving departs as soon as it is at the front, while a
+        stopped one moves off START_UP_TIME after the light turns green or the crossing clears,
+        and not before it has covered the length of the vehicle ahead and the standstill gap
+        behind it, see discharge_times.
+
+        intersection : FourWayIntersectionSimulator
+            The intersection whose queues are served.
+        time : float
+            The current simulation time [s].
+        """
+        for key, queue, traffic_light in intersection.approaches():
+            servable = queue.queue.queue_length > 0 and intersection.can_serve(key=key, time=time)
+
+            if servable and intersection.scheduled_departures[key] == None:
+                departure_time = time
+
+                if queue.queue.vehicles[0].speed <= 0:
+                    departure_time = max(time+START_UP_TIME, intersection.discharge_times[key])
+
+                intersection.scheduled_departures[key] = self.schedule(time=departure_time, event_type=DEPARTURE, target=(intersection.grid_ind, key))
+            elif not servable:
+                intersection.scheduled_departures[key] = None
+
+                for vehicle in queue.queue.vehicles:
+                    vehicle.stop()
+
+    def simulate(self, delta_t: float, end_time: float, fig_width=4, animate=False, file_name="simulation.mp4", output_destination="../data/vids/", speed=1, frame_interval=1, dpi=100, recording=None, profile=False, skip_idle=False, max_delta_t=None, partitions=None) -> Profiler.Profiler:
+        """
+        Processes all events until end_time, jumping from one event to the next.
+
+        Only Model1 queues with periodic or memoryless traffic lights are supported, as the
+        discrete-event simulation samples the times of arrivals and switches ahead. Model2 queues
+        and adaptive traffic lights, which decide as the queues evolve, raise a ValueError and
+        require the time-stepped simulation.
+
+        delta_t : float
+            The time-step size of the recorded series.
+        end_time : float
+            The end time [s] of the simulation.
+        profile : bool (optional)
+            Whether to time each event type. Defaults to False.
+        skip_idle : bool (optional)
+            Unused, as idle intersections have no events to process. Defaults to False.
+        max_delta_t : float (optional)
+            Unused, as the simulation already jumps from one event to the next. Defaults to None.
+        partitions : (int,int) (optional)
+            Not supported, as the events are processed in a single queue. Defaults to None.
+
+        Returns the Profiler.Profiler holding the wall time and nbr. of each event type if profile
+        is set, printable as a table, else None.
+        """
+        if animate or recording != None:
+            raise ValueError("The discrete-event simulation does not track vehicle trajectories and cannot be animated or recorded.")
+
+        if partitions != None:
+            raise ValueError("The discrete-event simulation processes its events in a single queue and cannot be partitioned.")
+
+        self.reserve(num_steps=int(math.ceil((end_time-self.time)/delta_t))+1)
+
+        if not self.scheduled:
+            self.schedule_initial_events()
+
+        profiler = Profiler.Profiler() if profile else None
+
+        while len(self.events) > 0 and self.events[0][0] < end_time:
+            time, event_id, event_type, target = heapq.heappop(self.events)
+
+            if profiler != None:
+                start = profiler.clock()
+
+            self.run_event(time=time, event_id=event_id, event_type=event_type, target=target, delta_t=delta_t)
+
+            if profiler != None:
+                profiler.record(EVENT_NAMES[event_type], start)
+
+        self.num_steps = max(self.num_steps, int(math.ceil(end_time/delta_t-1e-9)))
+        self.time = self.num_steps*delta_t
+
+        for grid_ind in self.grid_inds:
+            self.intersections[grid_ind].record(step=self.num_steps)
+            self.intersections[grid_ind].synchronize(time=self.time)
+        self.exits.pad(self.num_steps+1, self.num_exits)
+
+        return profiler
+
+    def run_event(self, time: float, event_id: int, event_type: int, target, delta_t: float) -> None:
+        """
+        Runs a single event.
+
+        time : float
+            The time [s] of the event.
+        event_id : int
+            The id of the event.
+        event_type : int
+            The type of the event.
+        target
+            The intersection, queue or vehicle the event concerns.
+        delta_t : float
+            The time-step size of the recorded series.
+        """
+        self.time = time
+        step = int(time/delta_t)
+
+        if event_type == ARRIVAL:
+            grid_ind, key = target
+            intersection = self.intersections[grid_ind]
+            queue = intersection.get_queue(key)
+            queue.time = time
+
+            # The end of a window without arrivals only resumes sampling, see Model1.PoissonQueueSimulator.
+            platoon_size = queue.sample_platoon_size() if queue.arrival_due else 0
+
+            for i in range(platoon_size):
+                vehicle = queue.vehicle_type()
+                vehicle.initialize(position=queue.queue.edge_position, direction=queue.queue.direction)
+                vehicle.destination = grid_ind
+                self.vehicles[vehicle] = time
+                self.index_vehicle(vehicle)
+
+                edge_distance = math.hypot(queue.queue.edge_position[0]-queue.queue.head_position[0], queue.queue.edge_position[1]-queue.queue.head_position[1])
+                self.schedule(time=time+(edge_distance+i*(vehicle.length+3))/vehicle.full_speed, event_type=LINK, target=vehicle)
+
+            self.schedule_arrival(intersection=intersection, key=key, time=time)
+
+        elif event_type == LINK:
+            vehicle = target
+            intersection = self.intersections[vehicle.destination]
+            intersection.record(step=step)
+            intersection.synchronize(time=time)
+
+            key = NetworkSpec.DIRECTIONS[vehicle.heading]
+            vehicle.update_position(new_position=intersection.get_queue(key).queue.head_position)
+            intersection.queue_vehicle(arriving_vehicle=vehicle)
+            self.vehicles[vehicle] = time
+            intersection.num_arrivals[key] += 1
+
+            if intersection.arrivals > 0:
+                intersection.arrivals_on_green_rate = intersection.arrivals_on_green/intersection.arrivals
+
+            self.serve(intersection=intersection, time=time)
+
+        elif event_type == DEPARTURE:
+            grid_ind, key = target
+            intersection = self.intersections[grid_ind]
+
+            if intersection.scheduled_departures[key] != event_id:
+                return
+
+            intersection.record(step=step)
+            intersection.synchronize(time=time)
+            intersection.scheduled_departures[key] = None
+
+            queue = intersection.get_queue(key)
+            vehicle = queue.queue.dequeue()
+
+            wait_time = time-self.vehicles[vehicle]
+            vehicle.wait_time += wait_time
+            vehicle.tot_wait_time += wait_time
+            self.vehicles[vehicle] = time
+            queue.tot_wait_time += vehicle.wait_time
+            vehicle.wait_time = 0
+            vehicle.accelerate()
+            intersection.num_departures[key] += 1
+            intersection.discharge_times[key] = time+START_UP_TIME+(vehicle.length+STANDSTILL_GAP)/vehicle.full_speed
+
+            departures = sum(intersection.num_departures.values())
+            intersection.avg_wait_time = (intersection.queue_n.tot_wait_time+intersection.queue_w.tot_wait_time+intersection.queue_s.tot_wait_time+intersection.queue_e.tot_wait_time)/departures
+
+            crossing_time = (intersection.length+vehicle.length)/vehicle.full_speed
+            if key in ["N", "S"]:
+                intersection.vertical_busy_until = max(intersection.vertical_busy_until, time+crossing_time)
+                self.schedule(time=intersection.vertical_busy_until, event_type=CLEARANCE, target=grid_ind)
+            else:
+                intersection.horizontal_busy_until = max(intersection.horizontal_busy_until, time+crossing_time)
+                self.schedule(time=intersection.horizontal_busy_until, event_type=CLEARANCE, target=grid_ind)
+
+            self.update_destinations([(vehicle, grid_ind)])
+
+            if vehicle.destination in self.grid_inds:
+                self.schedule(time=time+self.grid_distance/vehicle.full_speed, event_type=LINK, target=vehicle)
+            else:
+                self.schedule(time=time+(intersection.length+50+vehicle.length)/vehicle.full_speed, event_type=EXIT, target=vehicle)
+
+            self.serve(intersection=intersection, time=time)
+
+        elif event_type == CLEARANCE:
+            intersection = self.intersections[target]
+            intersection.synchronize(time=time)
+            self.serve(intersection=intersection, time=time)
+
+        elif event_type == SWITCH:
+            grid_ind, key = target
+            intersection = self.intersections[grid_ind]
+            intersection.record(step=step)
+            intersection.synchronize(time=time)
+
+            other_key = "ew" if key == "ns" else "ns"
+            traffic_light = intersection.traffic_light_ns if key == "ns" else intersection.traffic_light_ew
+            previous_service = {"ns": intersection.traffic_light_ns.service, "ew": intersection.traffic_light_ew.service}
+
+            if isinstance(traffic_light, TrafficLight.MemoryLessTrafficLight):
+                traffic_light.service = not traffic_light.service
+
+            intersection.update_light(key=key, previous_service=previous_service[key], step=step, delta_t=delta_t)
+            intersection.update_light(key=other_key, previous_service=previous_service[other_key], step=step, delta_t=delta_t)
+
+            self.schedule_switch(intersection=intersection, key=key, time=time)
+            self.serve(intersection=intersection, time=time)
+
+        elif event_type == EXIT:
+            vehicle = target
+            self.exits.pad(step+1, self.num_exits)
+
+            self.num_exits += 1
+            self.tot_wait_time += vehicle.tot_wait_time
+            self.avg_wait_time = self.tot_wait_time/self.num_exits
+            del self.vehicles[vehicle]
+            self.unindex_vehicle(vehicle)
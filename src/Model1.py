@@ -1,36 +1,138 @@
 import BaseModel
 from scipy.stats import poisson
-from scipy.stats import expon
 import random
 import numpy as np
 import Vehicle
 import TrafficLight
+import Recorder
 import math
-    
-class PoissonQueueSimulator(BaseModel.QueueSimulator):    
+
+# Arrivals are thinned in windows of ARRIVAL_RATE_WINDOW seconds, each with its own bound on the
+# arrival rate, found by sampling the rate every ARRIVAL_RATE_RESOLUTION seconds.
+ARRIVAL_RATE_WINDOW = 3600.
+ARRIVAL_RATE_RESOLUTION = 10.
+
+class PoissonQueueSimulator(BaseModel.QueueSimulator):
+    def __init__(self):
+        """
+        See BaseModel.QueueSimulator. Additionally:
+        
+        max_arrival_rate : float
+            Upper bound on the arrival rate [1/s] within the current window, at which candidate
+            arrivals are drawn. None until estimated.
+        window_end : float
+            The end [s] of the current window. None until the first window starts.
+        next_arrival_timestamp : float
+            The timestamp [s] of the next arrival, or of the end of the window if none is left in it,
+            see arrival_due. None until sampled.
+        arrival_due : bool
+            Whether next_arrival_timestamp is an arrival, rather than the time at which sampling
+            resumes in the next window.
+        """
+        super().__init__()
+        self.max_arrival_rate = None
+        self.window_end = None
+        self.next_arrival_timestamp = None
+        self.arrival_due = False
+        
     def time_until_arrival(self) -> float:
         """
-        Returns a sampled time until next arrival [s]. 
+        Returns a sampled time until next arrival [s], or until sampling resumes in the next window
+        if there is no arrival before its end, see arrival_due.
         """
-        rate = self.queue.arrival_rate(self.time)
-        if rate > 0:
-            return np.random.exponential(scale=1/rate)
-        else:
-            return np.inf
+        return self.sample_arrival_timestamp(time=self.time)-self.time
+    
+    def estimate_max_arrival_rate(self, start: float, end: float) -> float:
+        """
+        Returns an upper bound on the arrival rate [1/s] between two times. Rate functions that
+        define upper_bound(start, end), e.g. NetworkSpec.ConstantRate, give it themselves. The rate
+        of others is sampled every ARRIVAL_RATE_RESOLUTION seconds, so that a shorter peak may be
+        underestimated until a candidate arrival lands in it.
+        
+        start : float
+            The start time [s].
+        end : float
+            The end time [s].
+        """
+        upper_bound = getattr(self.queue.arrival_rate, "upper_bound", None)
+        
+        if upper_bound != None:
+            return upper_bound(start, end)
+        
+        return max([self.queue.arrival_rate(t) for t in np.append(np.arange(start, end, ARRIVAL_RATE_RESOLUTION), end)])
+    
+    def sample_arrival_timestamp(self, time: float) -> float:
+        """
+        Returns a sampled timestamp [s] of the first arrival after the given time, or the end of
+        the window if there is no arrival before it, and sets arrival_due accordingly. Sampling
+        then resumes from the end of the window, which is exact as candidates are memoryless.
+        
+        Candidates are drawn at the constant rate max_arrival_rate and each is kept with probability
+        arrival_rate(t)/max_arrival_rate (Lewis-Shedler thinning). The bound is raised if a candidate
+        exceeds it.
+        
+        time : float
+            The time [s] from which to sample.
+        """
+        if self.window_end == None or time >= self.window_end:
+            self.window_end = time+ARRIVAL_RATE_WINDOW
+            self.max_arrival_rate = self.estimate_max_arrival_rate(start=time, end=self.window_end)
+        
+        timestamp = time
+        while self.max_arrival_rate > 0:
+            timestamp += self.random_pool.exponential(scale=1/self.max_arrival_rate)
+            
+            if timestamp >= self.window_end:
+                break
+            
+            rate = self.queue.arrival_rate(timestamp)
+            self.max_arrival_rate = max(self.max_arrival_rate, rate)
+            
+            if self.random_pool.random()*self.max_arrival_rate < rate:
+                self.arrival_due = True
+                return timestamp
+        
+        self.arrival_due = False
+        
+        return self.window_end
     
     def time_to_depart(self) -> float:
         """
         Returns a sampled time to depart [s].
         """
-        return np.random.exponential(scale=1/self.queue.departure_rate)
+        return self.random_pool.exponential(scale=1/self.queue.departure_rate)
     
-    def arrival_probability(self) -> float:
-        rate = self.queue.arrival_rate(self.time)
-        
-        if rate > 0:
-            return expon.cdf(self.time_since_arrival, scale=1/rate)
+    def idle(self) -> bool:
+        """
+        See BaseModel.QueueSimulator.idle. The first arrival must have been sampled.
+        """
+        return self.next_arrival_timestamp != None and super().idle()
+    
+    def next_arrival_time(self) -> float:
+        """
+        Returns the timestamp [s] of the next arrival, or of the end of the window, when sampling
+        resumes, if there is none before it.
+        """
+        return self.next_arrival_timestamp
+    
+    def __setstate__(self, state: dict) -> None:
+        # Queues pickled before arrivals were thinned in windows start a window on their next draw.
+        self.__dict__.update(state)
         
-        return 0
+        if "window_end" not in state:
+            self.window_end = None
+            self.arrival_due = self.next_arrival_timestamp != None and self.next_arrival_timestamp < np.inf
+            
+            if self.next_arrival_timestamp == np.inf:
+                self.next_arrival_timestamp = self.time
+    
+    def skip(self, delta_ts: np.ndarray) -> None:
+        """
+        See BaseModel.QueueSimulator.skip.
+        """
+        super().skip(delta_ts)
+        # Every time-step without a departure restarts the service, so only the last one counts.
+        self.time_served = delta_ts[-1].item()
     
     def run_event(self, delta_t: float, saturation_rate: float, animate=False, plt=None) -> Vehicle.Vehicle:
         """
@@ -46,8 +148,14 @@ class PoissonQueueSimulator(BaseModel.QueueSimulator):
         arriving_vehicles = []
         departing_vehicle = None
         
-        if self.random_variable < self.arrival_probability():
-            platoon_size = np.random.choice(range(1,len(self.queue.platoon_size_distribution)+1), p=self.queue.platoon_size_distribution)
+        if self.next_arrival_timestamp == None:
+            self.next_arrival_timestamp = self.sample_arrival_timestamp(time=self.time)
+        
+        while self.time >= self.next_arrival_timestamp and not self.arrival_due:
+            self.next_arrival_timestamp = self.sample_arrival_timestamp(time=self.next_arrival_timestamp)
+        
+        if self.time >= self.next_arrival_timestamp:
+            platoon_size = self.sample_platoon_size()
             
             for i in range(platoon_size):
                 arriving_vehicles += [self.generate_vehicle()]
@@ -55,10 +163,10 @@ class PoissonQueueSimulator(BaseModel.QueueSimulator):
                 if platoon_size > 1:
                     vehicle = arriving_vehicles[-1]
             
-            self.arrivals += [self.arrivals[-1]+platoon_size]
-            self.random_variable = random.random()
+            self.arrivals.append(self.arrivals[-1]+platoon_size)
+            self.next_arrival_timestamp = self.sample_arrival_timestamp(time=self.time)
         else:
-            self.arrivals += [self.arrivals[-1]]
+            self.arrivals.append(self.arrivals[-1])
         
         self.update_vehicle_positions(delta_t=delta_t, saturation_rate=saturation_rate)
         
@@ -69,18 +177,18 @@ class PoissonQueueSimulator(BaseModel.QueueSimulator):
             departing_vehicle = self.queue.remove()
             if departing_vehicle != None:
                 self.time_served = 0
-                self.departures += [self.departures[-1]+1]
+                self.departures.append(self.departures[-1]+1)
                 self.tot_wait_time += departing_vehicle.wait_time
                 departing_vehicle.wait_time = 0
                 departing_vehicle.accelerate()
                 self.next_time_to_depart = self.time_to_depart()
             else:
-                self.departures += [self.departures[-1]]
+                self.departures.append(self.departures[-1])
                 self.time_served = 0
         else:
-            self.departures += [self.departures[-1]]
+            self.departures.append(self.departures[-1])
         
-        self.queue_length += [self.queue.queue_length]
+        self.queue_length.append(self.queue.queue_length)
         self.time_step(delta_t=delta_t)
         
         return arriving_vehicles, departing_vehicle
@@ -90,7 +198,15 @@ class ConnectedQueueSimulator(BaseModel.QueueSimulator):
         """
         Returns a sampled time to depart [s].
         """
-        return np.random.exponential(scale=1/self.queue.departure_rate)
+        return self.random_pool.exponential(scale=1/self.queue.departure_rate)
+    
+    def skip(self, delta_ts: np.ndarray) -> None:
+        """
+        See BaseModel.QueueSimulator.skip.
+        """
+        super().skip(delta_ts)
+        # Every time-step without a departure restarts the service, so only the last one counts.
+        self.time_served = delta_ts[-1].item()
 
     def run_event(self, delta_t: float, saturation_rate: float, animate=False, plt=None) -> None:
         """
@@ -104,9 +220,9 @@ class ConnectedQueueSimulator(BaseModel.QueueSimulator):
         departing_vehicle = None
         
         if self.time_since_arrival > 0:
-            self.arrivals += [self.arrivals[-1]]
+            self.arrivals.append(self.arrivals[-1])
         else:
-            self.arrivals += [self.arrivals[-1]+1]
+            self.arrivals.append(self.arrivals[-1]+1)
         
         if saturation_rate <= 0:
             self.time_served = 0
@@ -117,18 +233,18 @@ class ConnectedQueueSimulator(BaseModel.QueueSimulator):
             departing_vehicle = self.queue.remove()
             if departing_vehicle != None:
                 self.time_served = 0
-                self.departures += [self.departures[-1]+1]
+                self.departures.append(self.departures[-1]+1)
                 self.tot_wait_time += departing_vehicle.wait_time
                 departing_vehicle.wait_time = 0
                 departing_vehicle.accelerate()
                 self.next_departure_time = self.time_to_depart()
             else:
-                self.departures += [self.departures[-1]]
+                self.departures.append(self.departures[-1])
                 self.time_served = 0
         else:
-            self.departures += [self.departures[-1]]
+            self.departures.append(self.departures[-1])
         
-        self.queue_length += [self.queue.queue_length]
+        self.queue_length.append(self.queue.queue_length)
         self.time_step(delta_t=delta_t)
         
         return [], departing_vehicle
@@ -154,6 +270,12 @@ class FourWayIntersectionSimulator(BaseModel.FourWayIntersectionSimulator):
             The width of the roads.
         time : float
             The current simulation time [s].
+        green_onsets_ns : [(int, int)]
+            The step indices of the last two north-south green onsets and the nbr. of queued vehicles at each.
+        green_onsets_ew : [(int, int)]
+            The step indices of the last two east-west green onsets and the nbr. of queued vehicles at each.
+        num_queued_vehicles : Recorder.TimeSeries
+            Total nbr. of vehicles queued at the intersection over time.
         """
         self.queue_n = ConnectedQueueSimulator()
         self.queue_w = ConnectedQueueSimulator()
@@ -168,7 +290,7 @@ class FourWayIntersectionSimulator(BaseModel.FourWayIntersectionSimulator):
         self.estimator = None
         self.horizontal_crossers = []
         self.vertical_crossers = []
-        self.num_queued_vehicles = [0]
+        self.num_queued_vehicles = Recorder.TimeSeries()
         self.avg_clearance_rate_ns = 0.
         self.avg_clearance_rate_ew = 0.
         self.arrivals = 0
@@ -176,6 +298,8 @@ class FourWayIntersectionSimulator(BaseModel.FourWayIntersectionSimulator):
         self.arrivals_on_green_rate = 0.
         self.cum_clearance_rate_ns = 0.
         self.cum_clearance_rate_ew = 0.
+        self.green_onsets_ns = []
+        self.green_onsets_ew = []
         self.avg_wait_time = 0.
         
 class IntersectionNetworkSimulator(BaseModel.IntersectionNetworkSimulator):
@@ -189,10 +313,31 @@ class IntersectionNetworkSimulator(BaseModel.IntersectionNetworkSimulator):
             The intersections contained in the network.
         grid_inds : [(int,int)]
             The grid indices within the network.
-        moving_vehicles : [Vehicle.Vehicle]
-            The vehicles within the network, not contained in any queue.
+        vehicles : dict
+            The vehicles within the network, as keys in order of arrival. Ordered so that
+            runs do not depend on object addresses.
+        vehicle_array : VehicleArray.VehicleArray
+            Moves the vehicles and checks them for exits and arrivals with array operations. None if
+            they are moved and checked one by one.
+        vehicle_index : dict
+            The vehicles heading for each intersection, keyed by (destination, direction), as
+            keys in order of arrival.
+        vehicle_visuals : dict
+            The plotted line of each vehicle, when animating through run_event.
+        seed_sequence : np.random.SeedSequence
+            The seed of the random streams of the queues and traffic lights. None if they draw
+            from the global random state.
+        profiler : Profiler.Profiler
+            Times each phase of the time-steps. None unless simulating with profile set.
+        activity : Activity.ActivityTracker
+            Puts idle intersections to sleep. None unless simulating with skip_idle set.
+        busy_grid_ind : (int,int)
+            The grid index of the intersection that last kept quiet_steps from running several
+            time-steps as one, checked first the next time. None until one has.
         time : float
             The current simulation time [s].
+        exits : Recorder.TimeSeries
+            Total nbr. of vehicles that have left the network over time.
         """
         self.grid_dimensions = (0,0)
         self.grid_distance = 0.
@@ -200,10 +345,17 @@ class IntersectionNetworkSimulator(BaseModel.IntersectionNetworkSimulator):
         self.intersection_type = FourWayIntersectionSimulator
         self.intersections = None
         self.grid_inds = []
-        self.vehicles = set()
+        self.vehicles = dict()
+        self.vehicle_array = None
+        self.vehicle_index = dict()
+        self.vehicle_visuals = dict()
+        self.seed_sequence = None
+        self.profiler = None
+        self.activity = None
+        self.busy_grid_ind = None
         self.time = 0.
         self.tot_wait_time = 0.
-        self.exits = [0]
+        self.exits = Recorder.TimeSeries()
         self.observations = []
         self.avg_wait_time = 0.
         self.observable_intersection_grid_inds = []
@@ -3,6 +3,7 @@ import random
 import numpy as np
 import Vehicle
 import TrafficLight
+import Recorder
 import math
 
 class SingleQueueSimulator(BaseModel.QueueSimulator):
@@ -27,6 +28,21 @@ class SingleQueueSimulator(BaseModel.QueueSimulator):
         
         return delta_t*self.queue.departure_rate
     
+    def idle(self) -> bool:
+        """
+        See BaseModel.QueueSimulator.idle. An arrival is only known to be due once it has been
+        drawn, so the queue must not have any arrivals at all, and it must draw from a stream of its
+        own, as it keeps drawing while idle.
+        """
+        return self.queue.arrival_rate <= 0 and self.random_pool.independent() and super().idle()
+    
+    def skip(self, delta_ts: np.ndarray) -> None:
+        """
+        See BaseModel.QueueSimulator.skip. Discards the arrival draw of each time-step.
+        """
+        super().skip(delta_ts)
+        self.random_pool.skip(len(delta_ts))
+    
     def run_event(self, delta_t: float, saturation_rate: float, animate=False, plt=None) -> Vehicle.Vehicle:
         """
         Runs all events (arrivals/departures) given the current circumstances and elapses time.
@@ -38,20 +54,20 @@ class SingleQueueSimulator(BaseModel.QueueSimulator):
         """
         self.update_vehicle_positions(delta_t=delta_t, saturation_rate=saturation_rate)
         
-        arriving_vehicle = None
+        arriving_vehicles = []
         departing_vehicle = None
         
-        if random.random() < self.arrival_probability(delta_t=delta_t):
+        if self.random_pool.random() < self.arrival_probability(delta_t=delta_t):
             #arriving_vehicle = Vehicle.Vehicle()
             #arriving_vehicle.initialize(position=self.queue.tail_position, direction=self.queue.direction)
             #self.queue.append(arriving_vehicle)
             #self.time_since_arrival = 0
-            arriving_vehicle = self.generate_vehicle()
+            arriving_vehicles += [self.generate_vehicle()]
         
         if self.time_since_arrival > 0:
-            self.arrivals += [self.arrivals[-1]]
+            self.arrivals.append(self.arrivals[-1])
         else:
-            self.arrivals += [self.arrivals[-1]+1]
+            self.arrivals.append(self.arrivals[-1]+1)
             
         self.update_vehicle_positions(delta_t=delta_t, saturation_rate=saturation_rate)
 
@@ -60,19 +76,19 @@ class SingleQueueSimulator(BaseModel.QueueSimulator):
             departing_vehicle = self.queue.remove()
             if departing_vehicle != None:
                 self.time_served = 0
-                self.departures += [self.departures[-1]+1]
+                self.departures.append(self.departures[-1]+1)
                 self.tot_wait_time += departing_vehicle.wait_time
                 departing_vehicle.wait_time = 0
                 departing_vehicle.accelerate()
             else:
-                self.departures += [self.departures[-1]]
+                self.departures.append(self.departures[-1])
         else:
-            self.departures += [self.departures[-1]]
+            self.departures.append(self.departures[-1])
         
-        self.queue_length += [self.queue.queue_length]
+        self.queue_length.append(self.queue.queue_length)
         self.time_step(delta_t=delta_t)
         
-        return arriving_vehicle, departing_vehicle
+        return arriving_vehicles, departing_vehicle
 
 class ConnectedQueueSimulator(BaseModel.QueueSimulator):
     def departure_probability(self, delta_t: float, saturation_rate) -> float:
@@ -87,6 +103,20 @@ class ConnectedQueueSimulator(BaseModel.QueueSimulator):
         
         return delta_t*self.queue.departure_rate
         
+    def idle(self) -> bool:
+        """
+        See BaseModel.QueueSimulator.idle. The queue must draw from a stream of its own, as it keeps
+        drawing while idle.
+        """
+        return self.random_pool.independent() and super().idle()
+    
+    def skip(self, delta_ts: np.ndarray) -> None:
+        """
+        See BaseModel.QueueSimulator.skip. Discards the departure draw of each time-step.
+        """
+        super().skip(delta_ts)
+        self.random_pool.skip(len(delta_ts))
+    
     def run_event(self, delta_t: float, saturation_rate: float, animate=False, plt=None) -> None:
         """
         Runs all events (departures) given the current circumstances and elapses time.
@@ -101,25 +131,25 @@ class ConnectedQueueSimulator(BaseModel.QueueSimulator):
         departing_vehicle = None
         
         if self.time_since_arrival > 0:
-            self.arrivals += [self.arrivals[-1]]
+            self.arrivals.append(self.arrivals[-1])
         
-        if random.random() < self.departure_probability(delta_t=delta_t, saturation_rate=saturation_rate):
+        if self.random_pool.random() < self.departure_probability(delta_t=delta_t, saturation_rate=saturation_rate):
             departing_vehicle = self.queue.remove()
             if departing_vehicle != None:
                 self.time_served = 0
-                self.departures += [self.departures[-1]+1]
+                self.departures.append(self.departures[-1]+1)
                 self.tot_wait_time += departing_vehicle.wait_time
                 departing_vehicle.wait_time = 0
                 departing_vehicle.accelerate()
             else:
-                self.departures += [self.departures[-1]]
+                self.departures.append(self.departures[-1])
         else:
-            self.departures += [self.departures[-1]]
+            self.departures.append(self.departures[-1])
         
-        self.queue_length += [self.queue.queue_length]
+        self.queue_length.append(self.queue.queue_length)
         self.time_step(delta_t=delta_t)
         
-        return None, departing_vehicle
+        return [], departing_vehicle
     
 class FourWayIntersectionSimulator(BaseModel.FourWayIntersectionSimulator):
     def __init__(self):
@@ -142,6 +172,12 @@ class FourWayIntersectionSimulator(BaseModel.FourWayIntersectionSimulator):
             The width of the roads.
         time : float
             The current simulation time [s].
+        green_onsets_ns : [(int, int)]
+            The step indices of the last two north-south green onsets and the nbr. of queued vehicles at each.
+        green_onsets_ew : [(int, int)]
+            The step indices of the last two east-west green onsets and the nbr. of queued vehicles at each.
+        num_queued_vehicles : Recorder.TimeSeries
+            Total nbr. of vehicles queued at the intersection over time.
         """
         self.queue_n = ConnectedQueueSimulator()
         self.queue_w = ConnectedQueueSimulator()
@@ -156,7 +192,7 @@ class FourWayIntersectionSimulator(BaseModel.FourWayIntersectionSimulator):
         self.estimator = None
         self.horizontal_crossers = []
         self.vertical_crossers = []
-        self.num_queued_vehicles = [0]
+        self.num_queued_vehicles = Recorder.TimeSeries()
         self.avg_clearance_rate_ns = 0.
         self.avg_clearance_rate_ew = 0.
         self.arrivals = 0
@@ -164,6 +200,8 @@ class FourWayIntersectionSimulator(BaseModel.FourWayIntersectionSimulator):
         self.arrivals_on_green_rate = 0.
         self.cum_clearance_rate_ns = 0.
         self.cum_clearance_rate_ew = 0.
+        self.green_onsets_ns = []
+        self.green_onsets_ew = []
         self.avg_wait_time = 0.
         
 class IntersectionNetworkSimulator(BaseModel.IntersectionNetworkSimulator):
@@ -177,10 +215,31 @@ class IntersectionNetworkSimulator(BaseModel.IntersectionNetworkSimulator):
             The intersections contained in the network.
         grid_inds : [(int,int)]
             The grid indices within the network.
-        moving_vehicles : [Vehicle.Vehicle]
-            The vehicles within the network, not contained in any queue.
+        vehicles : dict
+            The vehicles within the network, as keys in order of arrival. Ordered so that
+            runs do not depend on object addresses.
+        vehicle_array : VehicleArray.VehicleArray
+            Moves the vehicles and checks them for exits and arrivals with array operations. None if
+            they are moved and checked one by one.
+        vehicle_index : dict
+            The vehicles heading for each intersection, keyed by (destination, direction), as
+            keys in order of arrival.
+        vehicle_visuals : dict
+            The plotted line of each vehicle, when animating through run_event.
+        seed_sequence : np.random.SeedSequence
+            The seed of the random streams of the queues and traffic lights. None if they draw
+            from the global random state.
+        profiler : Profiler.Profiler
+            Times each phase of the time-steps. None unless simulating with profile set.
+        activity : Activity.ActivityTracker
+            Puts idle intersections to sleep. None unless simulating with skip_idle set.
+        busy_grid_ind : (int,int)
+            The grid index of the intersection that last kept quiet_steps from running several
+            time-steps as one, checked first the next time. None until one has.
         time : float
             The current simulation time [s].
+        exits : Recorder.TimeSeries
+            Total nbr. of vehicles that have left the network over time.
         """
         self.grid_dimensions = (0,0)
         self.grid_distance = 0.
@@ -188,10 +247,17 @@ class IntersectionNetworkSimulator(BaseModel.IntersectionNetworkSimulator):
         self.intersection_type = FourWayIntersectionSimulator
         self.intersections = None
         self.grid_inds = []
-        self.vehicles = set()
+        self.vehicles = dict()
+        self.vehicle_array = None
+        self.vehicle_index = dict()
+        self.vehicle_visuals = dict()
+        self.seed_sequence = None
+        self.profiler = None
+        self.activity = None
+        self.busy_grid_ind = None
         self.time = 0.
         self.tot_wait_time = 0.
-        self.exits = [0]
+        self.exits = Recorder.TimeSeries()
         self.observations = []
         self.avg_wait_time = 0.
         self.observable_intersection_grid_inds = []
\ No newline at end of file
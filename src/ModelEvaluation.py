@@ -1,122 +1,498 @@
 import numpy as np
+import random
+import json
+import RandomPool
+import NetworkSpec
+import ResultStore
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 import dill as pickle
+from scipy.stats import t as student_t
 from matplotlib.ticker import (MultipleLocator,
                                FormatStrFormatter,
                                AutoMinorLocator)
 
+def seed_trial(trial_seed: np.random.SeedSequence) -> None:
+    """
+    Seeds the global random number generators from a trial's seed sequence.
+    
+    trial_seed : np.random.SeedSequence
+        The seed sequence of the trial.
+    """
+    state = trial_seed.generate_state(8)
+    random.seed(int.from_bytes(state.tobytes(), "little"))
+    np.random.seed(state)
+    
+def trial_output(network) -> dict:
+    """
+    Returns the output of a simulated network, in the layout of Evaluator.output for a single trial.
+    
+    network : BaseModel.IntersectionNetworkSimulator
+        The simulated network.
+    """
+    output = {"avg_wait_time": network.avg_wait_time}
+    
+    for grid_ind in network.grid_inds:
+        intersection = network.intersections[grid_ind]
+        
+        output[grid_ind] = {}
+        output[grid_ind]["avg_clearance_rate_ns"] = intersection.avg_clearance_rate_ns
+        output[grid_ind]["avg_clearance_rate_ew"] = intersection.avg_clearance_rate_ew
+        output[grid_ind]["tot_switches_ns"] = intersection.traffic_light_ns.num_cycles[-1]
+        output[grid_ind]["tot_switches_ew"] = intersection.traffic_light_ew.num_cycles[-1]
+        output[grid_ind]["arrivals_on_green_rate"] = intersection.arrivals_on_green_rate
+        output[grid_ind]["num_queued_vehicles"] = intersection.num_queued_vehicles[1:]
+        output[grid_ind]["avg_wait_time"] = intersection.avg_wait_time
+        
+        output[grid_ind]["N"] = {"avg_wait_time": intersection.queue_n.avg_wait_time(), "queue_length": intersection.queue_n.queue_length[1:]}
+        output[grid_ind]["E"] = {"avg_wait_time": intersection.queue_e.avg_wait_time(), "queue_length": intersection.queue_e.queue_length[1:]}
+        output[grid_ind]["S"] = {"avg_wait_time": intersection.queue_s.avg_wait_time(), "queue_length": intersection.queue_s.queue_length[1:]}
+        output[grid_ind]["W"] = {"avg_wait_time": intersection.queue_w.avg_wait_time(), "queue_length": intersection.queue_w.queue_length[1:]}
+        
+    return output
+
+def stacked(values) -> np.ndarray:
+    """
+    Returns per-trial outputs as an array with one row per trial. Also accepts the per-trial dicts
+    of evaluators saved before outputs were stacked.
+    
+    values : np.ndarray or dict
+        The per-trial outputs.
+    """
+    if isinstance(values, dict):
+        return np.array([values[trial] for trial in sorted(values)], dtype=float)
+    
+    return values
+
+def run_trial(spec_state: bytes, trial_seed: np.random.SeedSequence, end_time: float, delta_t: float) -> dict:
+    """
+    Simulates a single trial on a network built from a spec and returns its output.
+    
+    spec_state : bytes
+        The serialized NetworkSpec.NetworkSpec of the network given to Evaluator.initialize.
+    trial_seed : np.random.SeedSequence
+        The seed sequence of the trial.
+    end_time : float
+        The end time [s] of the simulation.
+    delta_t : float
+        The time-step size.
+    """
+    spec = pickle.loads(spec_state)
+    seed_trial(trial_seed)
+    network = spec.build(seed=trial_seed)
+    network.simulate(delta_t=delta_t, end_time=end_time, animate=False)
+    
+    return trial_output(network)
+
+class RunningStatistics:
+    def __init__(self):
+        """
+        The running mean, variance, minimum and maximum of a scalar or a series over trials, updated
+        one trial at a time (Welford's algorithm) so that the trials themselves need not be kept.
+        
+        count : int
+            The nbr. of trials.
+        mean : float or np.ndarray
+            The mean, per time index for a series.
+        m2 : float or np.ndarray
+            The sum of squared deviations from the mean.
+        min : float or np.ndarray
+            The minimum.
+        max : float or np.ndarray
+            The maximum.
+        """
+        self.count = 0
+        self.mean = None
+        self.m2 = None
+        self.min = None
+        self.max = None
+        
+    def update(self, value) -> None:
+        """
+        Adds a trial.
+        
+        value : float or array_like
+            The scalar or series of the trial. Series must be as long in every trial.
+        """
+        if np.ndim(value) > 0:
+            value = np.array(value, dtype=float)
+        else:
+            value = float(value)
+        
+        if self.count == 0:
+            self.count = 1
+            self.mean = value
+            self.m2 = value*0.
+            self.min = value
+            self.max = value
+            return
+        
+        if np.shape(value) != np.shape(self.mean):
+            raise ValueError("Expected a value of shape "+str(np.shape(self.mean))+", got "+str(np.shape(value))+".")
+        
+        self.count += 1
+        delta = value-self.mean
+        self.mean = self.mean+delta/self.count
+        self.m2 = self.m2+delta*(value-self.mean)
+        self.min = np.minimum(self.min, value)
+        self.max = np.maximum(self.max, value)
+        
+    def update_batch(self, values) -> None:
+        """
+        Adds several trials at once, merging their mean and squared deviations with those of the
+        trials added so far (Chan et al.).
+        
+        values : array_like
+            The scalars or series of the trials, one row per trial.
+        """
+        values = np.asarray(values, dtype=float)
+        count = len(values)
+        
+        if count == 0:
+            return
+        
+        mean = np.mean(values, axis=0)
+        m2 = np.sum((values-mean)**2, axis=0)
+        minimum = np.min(values, axis=0)
+        maximum = np.max(values, axis=0)
+        
+        if values.ndim == 1:
+            mean, m2, minimum, maximum = float(mean), float(m2), float(minimum), float(maximum)
+        
+        if self.count == 0:
+            self.count = count
+            self.mean = mean
+            self.m2 = m2
+            self.min = minimum
+            self.max = maximum
+            return
+        
+        if np.shape(mean) != np.shape(self.mean):
+            raise ValueError("Expected values of shape "+str(np.shape(self.mean))+", got "+str(np.shape(mean))+".")
+        
+        total = self.count+count
+        delta = mean-self.mean
+        self.mean = self.mean+delta*count/total
+        self.m2 = self.m2+m2+delta**2*self.count*count/total
+        self.min = np.minimum(self.min, minimum)
+        self.max = np.maximum(self.max, maximum)
+        self.count = total
+        
+    def variance(self):
+        """
+        Returns the sample variance. NaN for less than two trials.
+        """
+        if self.count < 2:
+            return self.m2*np.nan
+        
+        return self.m2/(self.count-1)
+    
+    def std(self):
+        """
+        Returns the sample standard deviation. NaN for less than two trials.
+        """
+        return np.sqrt(self.variance())
+    
+    def confidence_interval(self, level=0.95) -> tuple:
+        """
+        Returns the lower and upper bound of a Student's t confidence interval for the mean.
+        NaN for less than two trials.
+        
+        level : float (optional)
+            The confidence level. Defaults to 0.95.
+        """
+        if self.count < 2:
+            return self.mean*np.nan, self.mean*np.nan
+        
+        half_width = student_t.ppf((1+level)/2, self.count-1)*self.std()/np.sqrt(self.count)
+        
+        return self.mean-half_width, self.mean+half_width
+    
 class Evaluator:
     def __init__(self):
+        """
+        network : BaseModel.IntersectionNetworkSimulator
+            The network to simulate.
+        output : dict
+            The output of every trial, in arrays with one row per trial, see initialize_output.
+            Without rows when streaming.
+        statistics : dict
+            RunningStatistics of every output, in the layout of output without the trial level.
+        average : dict
+            The averages over the trials, see compute_average.
+        streaming : bool
+            Whether only the statistics are kept, and not the output of every trial.
+        grid_inds : [(int,int)]
+            The grid indices of the network.
+        store : ResultStore.ResultStore
+            The on-disk store each trial's output is appended to as it finishes. None if not stored.
+        """
         self.network = None
+        self.grid_inds = []
+        self.store = None
         self.output = dict()
+        self.statistics = dict()
         self.average = dict()
+        self.streaming = False
         self.num_trials = 0
         self.end_time = 0.
         self.delta_t = 0.
     
     def initialize(self, network) -> None:
         self.network = network
-        self.output["avg_wait_time"] = {}
-        
-        for grid_ind in network.grid_inds:
+        self.grid_inds = [tuple(int(i) for i in grid_ind) for grid_ind in network.grid_inds]
+        self.initialize_statistics()
+        self.initialize_output()
+        
+    def initialize_output(self) -> None:
+        """
+        Discards the output of any previous trials and makes room for num_trials trials. Scalars are
+        stored in arrays of length num_trials, and series stacked in (num_trials, steps) arrays that
+        are allocated once the length of the series is known.
+        """
+        self.output = {"avg_wait_time": np.full(self.num_trials, np.nan)}
+        
+        for grid_ind in self.grid_inds:
             self.output[grid_ind] = {}
-            self.output[grid_ind]["avg_clearance_rate_ns"] = {}
-            self.output[grid_ind]["avg_clearance_rate_ew"] = {}
-            self.output[grid_ind]["tot_switches_ns"] = {}
-            self.output[grid_ind]["tot_switches_ew"] = {}
-            self.output[grid_ind]["arrivals_on_green_rate"] = {}
-            self.output[grid_ind]["num_queued_vehicles"] = {}
-            self.output[grid_ind]["avg_wait_time"] = {}
-            self.output[grid_ind]["N"] = {"avg_wait_time": {}, "queue_length": {}}
-            self.output[grid_ind]["E"] = {"avg_wait_time": {}, "queue_length": {}}
-            self.output[grid_ind]["S"] = {"avg_wait_time": {}, "queue_length": {}}
-            self.output[grid_ind]["W"] = {"avg_wait_time": {}, "queue_length": {}}
-        
-    def simulate(self, num_trials: int, end_time: float, delta_t: float) -> dict():
+            self.output[grid_ind]["avg_clearance_rate_ns"] = np.full(self.num_trials, np.nan)
+            self.output[grid_ind]["avg_clearance_rate_ew"] = np.full(self.num_trials, np.nan)
+            self.output[grid_ind]["tot_switches_ns"] = np.full(self.num_trials, np.nan)
+            self.output[grid_ind]["tot_switches_ew"] = np.full(self.num_trials, np.nan)
+            self.output[grid_ind]["arrivals_on_green_rate"] = np.full(self.num_trials, np.nan)
+            self.output[grid_ind]["num_queued_vehicles"] = None
+            self.output[grid_ind]["avg_wait_time"] = np.full(self.num_trials, np.nan)
+            self.output[grid_ind]["N"] = {"avg_wait_time": np.full(self.num_trials, np.nan), "queue_length": None}
+            self.output[grid_ind]["E"] = {"avg_wait_time": np.full(self.num_trials, np.nan), "queue_length": None}
+            self.output[grid_ind]["S"] = {"avg_wait_time": np.full(self.num_trials, np.nan), "queue_length": None}
+            self.output[grid_ind]["W"] = {"avg_wait_time": np.full(self.num_trials, np.nan), "queue_length": None}
+            
+
+    def initialize_statistics(self) -> None:
+        """
+        Discards the statistics of any previous trials.
+        """
+        self.statistics = {"avg_wait_time": RunningStatistics()}
+        
+        for grid_ind in self.grid_inds:
+            self.statistics[grid_ind] = {key: RunningStatistics() for key in ["avg_clearance_rate_ns", "avg_clearance_rate_ew", "tot_switches_ns", "tot_switches_ew", "arrivals_on_green_rate", "num_queued_vehicles", "avg_wait_time"]}
+            
+            for direction in ["N", "E", "S", "W"]:
+                self.statistics[grid_ind][direction] = {"avg_wait_time": RunningStatistics(), "queue_length": RunningStatistics()}
+        
+    def simulate(self, num_trials: int, end_time: float, delta_t: float, num_workers=1, seed=None, streaming=False, store=None) -> dict():
+        """
+        Simulates the network num_trials times and collects the output of each trial.
+        
+        num_trials : int
+            The nbr. of trials.
+        end_time : float
+            The end time [s] of each trial.
+        delta_t : float
+            The time-step size.
+        num_workers : int (optional)
+            The nbr. of worker processes. Defaults to 1, which runs all trials in this process.
+        seed : int or np.random.SeedSequence (optional)
+            Seed from which each trial gets its own random streams, one per queue and traffic light.
+            The output then does not depend on num_workers. Defaults to None, in which case the
+            network's own seed is used if it has one, and the global random state otherwise.
+        streaming : bool (optional)
+            Whether to only keep the running statistics of the trials, so that memory does not grow
+            with num_trials. Defaults to False, which also keeps the output of every trial.
+        store : str or ResultStore.ResultStore (optional)
+            Directory, or store, to append the output of each trial to as soon as it finishes, see
+            read_results. Defaults to None, in which case nothing is written to disk.
+        """
         self.num_trials = num_trials
         self.end_time = end_time
         self.delta_t = delta_t
-        enumerations = list(zip(np.concatenate([[i]*len(self.network.grid_inds) for i in range(num_trials)]), self.network.grid_inds*num_trials))
-        last_trial = -1
+        self.streaming = streaming
+        self.initialize_statistics()
+        self.initialize_output()
+        self.store = self.open_store(store)
+        
+        if seed == None:
+            seed = self.network.seed_sequence
+        
+        spec = NetworkSpec.from_network(self.network)
         
-        for trial, grid_ind in enumerations:
-            if trial != last_trial:
-                network = self.network.reset()
+        if num_workers == 1 and seed == None:
+            for trial in range(num_trials):
+                network = spec.build()
                 network.simulate(delta_t=delta_t, end_time=end_time, animate=False)
+                self.store_trial_output(trial=trial, output=trial_output(network))
                 
                 if trial != 0 and trial % 10  == 0:
                     print("Finished", trial, "trials.")
-            last_trial = trial
-            
-            self.output["avg_wait_time"][trial] = network.avg_wait_time
-            
-            self.output[grid_ind]["avg_clearance_rate_ns"][trial] = network.intersections[grid_ind].avg_clearance_rate_ns
-            self.output[grid_ind]["avg_clearance_rate_ew"][trial] = network.intersections[grid_ind].avg_clearance_rate_ew
-            self.output[grid_ind]["tot_switches_ns"][trial] = network.intersections[grid_ind].traffic_light_ns.num_cycles[-1]
-            self.output[grid_ind]["tot_switches_ew"][trial] = network.intersections[grid_ind].traffic_light_ew.num_cycles[-1]
-            self.output[grid_ind]["arrivals_on_green_rate"][trial] = network.intersections[grid_ind].arrivals_on_green_rate
-            self.output[grid_ind]["num_queued_vehicles"][trial] = network.intersections[grid_ind].num_queued_vehicles[1:]
-            self.output[grid_ind]["avg_wait_time"][trial] = network.intersections[grid_ind].avg_wait_time
-            
-            self.output[grid_ind]["N"]["avg_wait_time"][trial] = network.intersections[grid_ind].queue_n.avg_wait_time()
-            self.output[grid_ind]["N"]["queue_length"][trial] = network.intersections[grid_ind].queue_n.queue_length[1:]
-            self.output[grid_ind]["E"]["avg_wait_time"][trial] = network.intersections[grid_ind].queue_e.avg_wait_time()
-            self.output[grid_ind]["E"]["queue_length"][trial] = network.intersections[grid_ind].queue_e.queue_length[1:]
-            self.output[grid_ind]["S"]["avg_wait_time"][trial] = network.intersections[grid_ind].queue_s.avg_wait_time()
-            self.output[grid_ind]["S"]["queue_length"][trial] = network.intersections[grid_ind].queue_s.queue_length[1:]
-            self.output[grid_ind]["W"]["avg_wait_time"][trial] = network.intersections[grid_ind].queue_w.avg_wait_time()
-            self.output[grid_ind]["W"]["queue_length"][trial] = network.intersections[grid_ind].queue_w.queue_length[1:]
+        else:
+            spec_state = pickle.dumps(spec)
+            trial_seeds = RandomPool.seed_sequence(seed).spawn(num_trials)
+            arguments = ([spec_state]*num_trials, trial_seeds, [end_time]*num_trials, [delta_t]*num_trials)
+            
+            if num_workers == 1:
+                outputs = map(run_trial, *arguments)
+                self.store_trial_outputs(outputs=outputs)
+            else:
+                with ProcessPoolExecutor(max_workers=num_workers) as executor:
+                    outputs = executor.map(run_trial, *arguments)
+                    self.store_trial_outputs(outputs=outputs)
+        
+        if self.store != None:
+            self.store.flush()
             
         print("Finished", self.num_trials, "trials.")
             
         return self.output
     
+    def store_trial_outputs(self, outputs) -> None:
+        """
+        Stores the outputs of consecutive trials, as they become available.
+        
+        outputs : iterable(dict)
+            The outputs of the trials, in trial order.
+        """
+        for trial, output in enumerate(outputs):
+            self.store_trial_output(trial=trial, output=output)
+            
+            if trial != 0 and trial % 10  == 0:
+                print("Finished", trial, "trials.")
+    
+    def store_trial_output(self, trial: int, output: dict) -> None:
+        """
+        Stores the output of a single trial.
+        
+        trial : int
+            The trial index.
+        output : dict
+            The output of the trial, as returned by trial_output.
+        """
+        if self.store != None:
+            self.store.append(trial=trial, output=output)
+            
+        self.update_statistics(output=output)
+        
+        if self.streaming:
+            return
+        
+        self.output["avg_wait_time"][trial] = output["avg_wait_time"]
+        
+        for grid_ind in self.grid_inds:
+            for key in ["avg_clearance_rate_ns", "avg_clearance_rate_ew", "tot_switches_ns", "tot_switches_ew", "arrivals_on_green_rate", "avg_wait_time"]:
+                self.output[grid_ind][key][trial] = output[grid_ind][key]
+            
+            self.store_series(self.output[grid_ind], key="num_queued_vehicles", trial=trial, series=output[grid_ind]["num_queued_vehicles"])
+                
+            for direction in ["N", "E", "S", "W"]:
+                self.output[grid_ind][direction]["avg_wait_time"][trial] = output[grid_ind][direction]["avg_wait_time"]
+                self.store_series(self.output[grid_ind][direction], key="queue_length", trial=trial, series=output[grid_ind][direction]["queue_length"])
+                
+    def store_series(self, output: dict, key: str, trial: int, series) -> None:
+        """
+        Stores a trial's series as a row of the stacked (num_trials, steps) array output[key],
+        allocating the array on the first series.
+        
+        output : dict
+            The dict holding the stacked array.
+        key : str
+            The key of the stacked array.
+        trial : int
+            The trial index.
+        series : array_like
+            The series of the trial.
+        """
+        if output[key] is None:
+            output[key] = np.zeros((self.num_trials, len(series)))
+        
+        output[key][trial] = series
+    
+    def update_statistics(self, output: dict) -> None:
+        """
+        Adds the output of a single trial to the running statistics.
+        
+        output : dict
+            The output of the trial, as returned by trial_output.
+        """
+        self.statistics["avg_wait_time"].update(output["avg_wait_time"])
+        
+        for grid_ind in self.grid_inds:
+            for key in ["avg_clearance_rate_ns", "avg_clearance_rate_ew", "tot_switches_ns", "tot_switches_ew", "arrivals_on_green_rate", "num_queued_vehicles", "avg_wait_time"]:
+                self.statistics[grid_ind][key].update(output[grid_ind][key])
+                
+            for direction in ["N", "E", "S", "W"]:
+                self.statistics[grid_ind][direction]["avg_wait_time"].update(output[grid_ind][direction]["avg_wait_time"])
+                self.statistics[grid_ind][direction]["queue_length"].update(output[grid_ind][direction]["queue_length"])
+                
+    def confidence_intervals(self, level=0.95) -> dict():
+        """
+        Returns the lower and upper bound of the confidence interval for the mean of every output,
+        per time index for series, in the layout of statistics.
+        
+        level : float (optional)
+            The confidence level. Defaults to 0.95.
+        """
+        def intervals(statistics):
+            if isinstance(statistics, RunningStatistics):
+                return statistics.confidence_interval(level=level)
+            
+            return {key: intervals(value) for key, value in statistics.items()}
+        
+        return intervals(self.statistics)
+    
     def compute_average(self) -> dict():
+        if self.streaming:
+            return self.compute_streaming_average()
+        
         data_length = int(self.end_time/self.delta_t)
         
-        self.average["avg_wait_time"] = sum(self.output["avg_wait_time"].values())/self.num_trials
+        self.average["avg_wait_time"] = np.mean(stacked(self.output["avg_wait_time"]))
         
-        for grid_ind in self.network.grid_inds:
+        for grid_ind in self.grid_inds:
+            output = self.output[grid_ind]
             self.average[grid_ind] = {}
             
-            self.average[grid_ind]["avg_clearance_rate_ns"] = sum(self.output[grid_ind]["avg_clearance_rate_ns"].values())/self.num_trials
-            self.average[grid_ind]["avg_clearance_rate_ew"] = sum(self.output[grid_ind]["avg_clearance_rate_ew"].values())/self.num_trials
-            self.average[grid_ind]["avg_clearance_rate"] = (self.average[grid_ind]["avg_clearance_rate_ns"]+self.average[grid_ind]["avg_clearance_rate_ew"])/2
-            self.average[grid_ind]["num_queued_vehicles"] = [sum([num[i]/self.num_trials for num in self.output[grid_ind]["num_queued_vehicles"].values()]) for i in range(data_length)]
-            self.average[grid_ind]["avg_num_queued_vehicles"] = sum([sum(self.output[grid_ind]["num_queued_vehicles"][i])/data_length for i in range(self.num_trials)])/self.num_trials
-            self.average[grid_ind]["avg_queue_length"] = self.average[grid_ind]["avg_num_queued_vehicles"]/4
-            
-            self.average[grid_ind]["avg_wait_time"] = sum(self.output[grid_ind]["avg_wait_time"].values())/self.num_trials
-            
-            self.average[grid_ind]["tot_switches_ns"] = sum(self.output[grid_ind]["tot_switches_ns"].values())/self.num_trials
-            self.average[grid_ind]["tot_switches_ew"] = sum(self.output[grid_ind]["tot_switches_ew"].values())/self.num_trials
-            
-            self.average[grid_ind]["arrivals_on_green_rate"] = sum(self.output[grid_ind]["arrivals_on_green_rate"].values())/self.num_trials
-            
-            self.average[grid_ind]["N"] = {"avg_wait_time": 0., "avg_queue_length": 0., "queue_length": []}
-            self.average[grid_ind]["E"] = {"avg_wait_time": 0., "avg_queue_length": 0., "queue_length": []}
-            self.average[grid_ind]["S"] = {"avg_wait_time": 0., "avg_queue_length": 0., "queue_length": []}
-            self.average[grid_ind]["W"] = {"avg_wait_time": 0., "avg_queue_length": 0., "queue_length": []}
+            for key in ["avg_clearance_rate_ns", "avg_clearance_rate_ew", "avg_wait_time", "tot_switches_ns", "tot_switches_ew", "arrivals_on_green_rate"]:
+                self.average[grid_ind][key] = np.mean(stacked(output[key]))
             
-            self.average[grid_ind]["N"]["avg_wait_time"] = sum(self.output[grid_ind]["N"]["avg_wait_time"].values())/self.num_trials
-            self.average[grid_ind]["E"]["avg_wait_time"] = sum(self.output[grid_ind]["E"]["avg_wait_time"].values())/self.num_trials
-            self.average[grid_ind]["S"]["avg_wait_time"] = sum(self.output[grid_ind]["S"]["avg_wait_time"].values())/self.num_trials
-            self.average[grid_ind]["W"]["avg_wait_time"] = sum(self.output[grid_ind]["W"]["avg_wait_time"].values())/self.num_trials
+            self.average[grid_ind]["avg_clearance_rate"] = (self.average[grid_ind]["avg_clearance_rate_ns"]+self.average[grid_ind]["avg_clearance_rate_ew"])/2
             
-            #self.average[grid_ind]["avg_wait_time"] = sum([self.average[grid_ind][direction]["avg_wait_time"] for direction in ["N", "E", "S", "W"]])/4
+            num_queued_vehicles = stacked(output["num_queued_vehicles"])
+            self.average[grid_ind]["num_queued_vehicles"] = np.mean(num_queued_vehicles[:,:data_length], axis=0)
+            self.average[grid_ind]["avg_num_queued_vehicles"] = np.mean(np.sum(num_queued_vehicles, axis=1))/data_length
+            self.average[grid_ind]["avg_queue_length"] = self.average[grid_ind]["avg_num_queued_vehicles"]/4
             
-            self.average[grid_ind]["N"]["avg_queue_length"] = sum([sum(self.output[grid_ind]["N"]["queue_length"][i])/len(self.output[grid_ind]["N"]["queue_length"][i]) for i in range(self.num_trials)])/self.num_trials
-            self.average[grid_ind]["E"]["avg_queue_length"] = sum([sum(self.output[grid_ind]["E"]["queue_length"][i])/len(self.output[grid_ind]["E"]["queue_length"][i]) for i in range(self.num_trials)])/self.num_trials
-            self.average[grid_ind]["S"]["avg_queue_length"] = sum([sum(self.output[grid_ind]["S"]["queue_length"][i])/len(self.output[grid_ind]["S"]["queue_length"][i]) for i in range(self.num_trials)])/self.num_trials
-            self.average[grid_ind]["W"]["avg_queue_length"] = sum([sum(self.output[grid_ind]["W"]["queue_length"][i])/len(self.output[grid_ind]["W"]["queue_length"][i]) for i in range(self.num_trials)])/self.num_trials
+            for direction in ["N", "E", "S", "W"]:
+                queue_length = stacked(output[direction]["queue_length"])
+                self.average[grid_ind][direction] = {"avg_wait_time": np.mean(stacked(output[direction]["avg_wait_time"])),
+                                                     "avg_queue_length": np.mean(np.mean(queue_length, axis=1)),
+                                                     "queue_length": np.mean(queue_length[:,:data_length], axis=0)}
             
-            #self.average[grid_ind]["avg_queue_length"] = sum([self.average[grid_ind][direction]["avg_queue_length"] for direction in ["N", "E", "S", "W"]])/4
+        return self.average
+    
+    def compute_streaming_average(self) -> dict():
+        """
+        Computes the averages of compute_average from the running statistics, which is possible
+        since every average is linear in the trial outputs.
+        """
+        data_length = int(self.end_time/self.delta_t)
+        
+        self.average["avg_wait_time"] = self.statistics["avg_wait_time"].mean
+        
+        for grid_ind in self.grid_inds:
+            statistics = self.statistics[grid_ind]
+            self.average[grid_ind] = {}
             
-            self.average[grid_ind]["N"]["queue_length"] = [sum([queue_length[i]/self.num_trials for queue_length in self.output[grid_ind]["N"]["queue_length"].values()]) for i in range(data_length)]
-            self.average[grid_ind]["E"]["queue_length"] = [sum([queue_length[i]/self.num_trials for queue_length in self.output[grid_ind]["E"]["queue_length"].values()]) for i in range(data_length)]
-            self.average[grid_ind]["S"]["queue_length"] = [sum([queue_length[i]/self.num_trials for queue_length in self.output[grid_ind]["S"]["queue_length"].values()]) for i in range(data_length)]
-            self.average[grid_ind]["W"]["queue_length"] = [sum([queue_length[i]/self.num_trials for queue_length in self.output[grid_ind]["W"]["queue_length"].values()]) for i in range(data_length)]
+            for key in ["avg_clearance_rate_ns", "avg_clearance_rate_ew", "avg_wait_time", "tot_switches_ns", "tot_switches_ew", "arrivals_on_green_rate"]:
+                self.average[grid_ind][key] = statistics[key].mean
+                
+            self.average[grid_ind]["avg_clearance_rate"] = (self.average[grid_ind]["avg_clearance_rate_ns"]+self.average[grid_ind]["avg_clearance_rate_ew"])/2
+            self.average[grid_ind]["num_queued_vehicles"] = statistics["num_queued_vehicles"].mean[:data_length]
+            self.average[grid_ind]["avg_num_queued_vehicles"] = np.sum(statistics["num_queued_vehicles"].mean)/data_length
+            self.average[grid_ind]["avg_queue_length"] = self.average[grid_ind]["avg_num_queued_vehicles"]/4
             
+            for direction in ["N", "E", "S", "W"]:
+                self.average[grid_ind][direction] = {"avg_wait_time": statistics[direction]["avg_wait_time"].mean,
+                                                     "avg_queue_length": np.mean(statistics[direction]["queue_length"].mean),
+                                                     "queue_length": statistics[direction]["queue_length"].mean[:data_length]}
+                
         return self.average
             
             
@@ -176,6 +552,105 @@ class Evaluator:
         
         return fig,axs
     
+    def open_store(self, store, shard_size=1, compress=False) -> ResultStore.ResultStore:
+        """
+        Returns the store to write the trials of this evaluation to, creating it if a directory is given.
+        
+        store : str or ResultStore.ResultStore
+            Directory of the store, or the store itself. None for no store.
+        shard_size : int (optional)
+            The nbr. of trials per shard of a created store. Defaults to 1.
+        compress : bool (optional)
+            Whether to compress the shards of a created store. Defaults to False.
+        """
+        if store == None or isinstance(store, ResultStore.ResultStore):
+            return store
+        
+        metadata = {"num_trials": self.num_trials, "end_time": self.end_time, "delta_t": self.delta_t, "grid_inds": [list(grid_ind) for grid_ind in self.grid_inds]}
+        
+        result_store = ResultStore.ResultStore()
+        result_store.initialize(directory=store, metadata=metadata, shard_size=shard_size, compress=compress)
+        
+        return result_store
+    
+    def save_results(self, directory: str, compress=False) -> None:
+        """
+        Writes the output of every trial to a result store in a single shard, without pickling the
+        network. See read_results.
+        
+        directory : str
+            The directory of the store.
+        compress : bool (optional)
+            Whether to compress the shard. Defaults to False, so that it can be memory-mapped.
+        """
+        if self.streaming:
+            raise ValueError("A streaming evaluation only keeps the statistics of its trials.")
+        
+        store = self.open_store(directory, shard_size=max(self.num_trials, 1), compress=compress)
+        
+        def trial_slice(output, trial):
+            if isinstance(output, dict):
+                return {key: trial_slice(value, trial) for key, value in output.items()}
+            
+            return stacked(output)[trial]
+        
+        for trial in range(self.num_trials):
+            store.append(trial=trial, output=trial_slice(self.output, trial))
+            
+        store.flush()
+        
+    def read_results(self, directory: str):
+        """
+        Loads the trials of a result store, e.g. one that simulate was writing to when it was
+        interrupted, in ascending trial order. The outputs are lazy views of the columns, see
+        ResultStore.Column, that are read only as far as they are indexed and memory-mapped where
+        the shards are uncompressed. The statistics are merged shard by shard, so the store need
+        not be consolidated first, see ResultStore.ResultStore.consolidate. The network is not
+        restored.
+        
+        directory : str
+            The directory of the store.
+        
+        Returns the evaluator.
+        """
+        store = ResultStore.load(directory)
+        metadata = store.metadata()
+        
+        self.network = None
+        self.store = None
+        self.streaming = False
+        self.grid_inds = [tuple(grid_ind) for grid_ind in metadata["grid_inds"]]
+        self.end_time = metadata["end_time"]
+        self.delta_t = metadata["delta_t"]
+        self.num_trials = len(store.trials())
+        self.initialize_statistics()
+        self.initialize_output()
+        
+        for name in store.columns():
+            column = store.column(name, sort=True)
+            
+            path = ResultStore.column_path(name)
+            output = self.output
+            statistics = self.statistics
+            for key in path[:-1]:
+                output = output[key]
+                statistics = statistics[key]
+                
+            output[path[-1]] = column
+            
+            for array in column.shards:
+                statistics[path[-1]].update_batch(array)
+            
+        return self
+    
+    def __setstate__(self, state: dict) -> None:
+        # Evaluators pickled before some attributes existed get their defaults.
+        self.__init__()
+        self.__dict__.update(state)
+        
+        if len(self.grid_inds) == 0 and self.network != None:
+            self.grid_inds = [tuple(int(i) for i in grid_ind) for grid_ind in self.network.grid_inds]
+    
     def save_to_file(self, file_name: str, output_destination="../../data/evals/") -> None:
         f = open(Path(output_destination) / file_name,"xb")
         pickle.dump(self,f)
@@ -367,6 +842,47 @@ class MultiEvaluator:
         pickle.dump(self,f)
         f.close()
         
+    def save_results(self, directory: str, compress=False) -> None:
+        """
+        Writes each evaluator to a result store in a subdirectory, and the labels and variable to a
+        JSON manifest. See read_results.
+        
+        directory : str
+            The directory of the stores.
+        compress : bool (optional)
+            Whether to compress the shards. Defaults to False.
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        manifest = {"variable": self.variable, "labels": [], "directories": []}
+        
+        for i, (label, evaluator) in enumerate(self.evaluators.items()):
+            evaluator.save_results(directory / str(i), compress=compress)
+            manifest["labels"] += [label if isinstance(label, (int, float, str)) else str(label)]
+            manifest["directories"] += [str(i)]
+            
+        with open(directory / ResultStore.MANIFEST, "w") as file:
+            json.dump(manifest, file, indent=1)
+            
+    def read_results(self, directory: str):
+        """
+        Loads evaluators written by save_results.
+        
+        directory : str
+            The directory of the stores.
+        
+        Returns the multi-evaluator.
+        """
+        directory = Path(directory)
+        
+        with open(directory / ResultStore.MANIFEST, "r") as file:
+            manifest = json.load(file)
+            
+        evaluators = [Evaluator().read_results(directory / evaluator_directory) for evaluator_directory in manifest["directories"]]
+        self.initialize(evaluators=evaluators, labels=manifest["labels"], variable=manifest["variable"])
+        
+        return self
+        
     def read_file(self, file_name: str, destination="../data/evals/multi/"):
         with open(Path(destination) / file_name, 'rb') as f:
             return pickle.load(f)
\ No newline at end of file
@@ -0,0 +1,341 @@
+import numpy as np
+import RandomPool
+import TrafficLight
+
+DIRECTIONS = ["N", "W", "S", "E"]
+
+def queues(intersection) -> list:
+    """
+    Returns the queues of an intersection, in the order of DIRECTIONS.
+    """
+    return [intersection.queue_n, intersection.queue_w, intersection.queue_s, intersection.queue_e]
+
+class ConstantRate:
+    def __init__(self, rate: float):
+        """
+        A constant arrival rate, as a function of time. Unlike a lambda, it can be pickled without
+        dill, so that networks of Model1 can be sent to other processes as plain data.
+
+        rate : float
+            The arrival rate [vehicles/s].
+        """
+        self.rate = rate
+
+    def __call__(self, t: float) -> float:
+        return self.rate
+
+    def upper_bound(self, start: float, end: float) -> float:
+        """
+        Returns the largest arrival rate between two times, see Model1.PoissonQueueSimulator.
+
+        start : float
+            The start time [s].
+        end : float
+            The end time [s].
+        """
+        return self.rate
+
+    def __repr__(self) -> str:
+        return "ConstantRate("+repr(self.rate)+")"
+
+class NetworkSpec:
+    def __init__(self):
+        """
+        The configuration of a network as plain data, from which fresh networks are built, e.g.
+        one per trial. Holds no simulation state, so it is small and cheap to pickle.
+
+        network_type : type
+            The network class, e.g. Model1.IntersectionNetworkSimulator.
+        edge_type : type
+            The class of the queues entering the grid.
+        intersection_type : type
+            The class of the intersections.
+        grid_dimensions : (int,int)
+            The grid dimensions of the network.
+        grid_distance : float
+            The distance [m] between each intersection centerpoint.
+        vectorized : bool
+            Whether to keep the vehicle states in a VehicleArray.VehicleArray.
+        avg_departure_times : np.ndarray
+            The average time [s] between departures of each queue, indexed by (row, col, direction)
+            with directions in the order of DIRECTIONS.
+        arrival_rates : np.ndarray
+            The arrival rate of each queue, indexed as avg_departure_times: a float [vehicles/s]
+            for Model2, a function of time for Model1.
+        platoon_size_distributions : np.ndarray
+            The platoon size distribution of each queue, indexed as avg_departure_times.
+        traffic_lights : dict
+            The traffic lights of each intersection, keyed by grid index and then 'ns' or 'ew', as
+            {'type': class name in TrafficLight, 'parameters': arguments of initialize}. A
+            TrafficLightMirror mirrors the other traffic light of its intersection.
+        observable_grid_inds : [(int,int)]
+            The grid indices of the observable intersections.
+        seed : np.random.SeedSequence
+            The seed of the random streams of built networks. None if they draw from the global
+            random state.
+        """
+        self.network_type = None
+        self.edge_type = None
+        self.intersection_type = None
+        self.grid_dimensions = (0,0)
+        self.grid_distance = 0.
+        self.vectorized = False
+        self.avg_departure_times = np.zeros((0,0,4))
+        self.arrival_rates = np.zeros((0,0,4), dtype=object)
+        self.platoon_size_distributions = np.zeros((0,0,4), dtype=object)
+        self.traffic_lights = dict()
+        self.observable_grid_inds = []
+        self.seed = None
+
+    def initialize(self, network_type: type, grid_dimensions: (int,int), grid_distance=150, vectorized=False, avg_departure_time=np.inf, arrival_rate=0., platoon_size_distribution=[1.], seed=None) -> None:
+        """
+        Initializes the NetworkSpec instance with the same parameters for every queue and no
+        traffic lights. Individual queues, traffic lights and observability are then set through
+        the attributes, set_queue and set_traffic_lights.
+
+        network_type : type
+            The network class, e.g. Model1.IntersectionNetworkSimulator.
+        grid_dimensions : (int,int)
+            The grid dimensions of the network.
+        grid_distance : float (optional)
+            The distance [m] between each intersection centerpoint. Defaults to 150.
+        vectorized : bool (optional)
+            Whether to keep the vehicle states in a VehicleArray.VehicleArray. Defaults to False.
+        avg_departure_time : float (optional)
+            The average time [s] between departures of every queue. Defaults to infinity.
+        arrival_rate : float or callable (optional)
+            The arrival rate of every queue. Defaults to 0.
+        platoon_size_distribution : [float] (optional)
+            The platoon size distribution of every queue. Defaults to [1.].
+        seed : int or np.random.SeedSequence (optional)
+            The seed of the random streams of built networks. Defaults to None.
+        """
+        network = network_type()
+        shape = tuple(grid_dimensions)+(4,)
+
+        self.network_type = network_type
+        self.edge_type = network.edge_type
+        self.intersection_type = network.intersection_type
+        self.grid_dimensions = tuple(grid_dimensions)
+        self.grid_distance = grid_distance
+        self.vectorized = vectorized
+        self.avg_departure_times = np.full(shape, avg_departure_time, dtype=float)
+        self.arrival_rates = np.empty(shape, dtype=object)
+        self.arrival_rates.fill(arrival_rate)
+        self.platoon_size_distributions = np.empty(shape, dtype=object)
+        self.platoon_size_distributions.fill(list(platoon_size_distribution))
+        self.traffic_lights = dict()
+        self.observable_grid_inds = []
+        self.seed = None if seed == None else RandomPool.seed_sequence(seed)
+
+    def set_queue(self, grid_ind: (int,int), direction: str, avg_departure_time=None, arrival_rate=None, platoon_size_distribution=None) -> None:
+        """
+        Sets the parameters of a queue. Parameters left as None are kept.
+
+        grid_ind : (int,int)
+            The grid index of the intersection.
+        direction : str
+            The direction of the queue: 'N', 'W', 'S' or 'E'.
+        avg_departure_time : float (optional)
+            The average time [s] between departures.
+        arrival_rate : float or callable (optional)
+            The arrival rate.
+        platoon_size_distribution : [float] (optional)
+            The platoon size distribution.
+        """
+        ind = tuple(grid_ind)+(DIRECTIONS.index(direction),)
+
+        if avg_departure_time != None:
+            self.avg_departure_times[ind] = avg_departure_time
+        if arrival_rate is not None:
+            self.arrival_rates[ind] = arrival_rate
+        if platoon_size_distribution != None:
+            self.platoon_size_distributions[ind] = list(platoon_size_distribution)
+
+    def set_traffic_lights(self, grid_ind: (int,int), traffic_light_ns: dict, traffic_light_ew: dict) -> None:
+        """
+        Sets the traffic lights of an intersection.
+
+        grid_ind : (int,int)
+            The grid index of the intersection.
+        traffic_light_ns : dict
+            The traffic light controlling the north- and southbound queues, as
+            {'type': class name in TrafficLight, 'parameters': arguments of initialize}.
+        traffic_light_ew : dict
+            The traffic light controlling the east- and westbound queues, likewise.
+        """
+        self.traffic_lights[tuple(int(i) for i in grid_ind)] = {"ns": traffic_light_ns, "ew": traffic_light_ew}
+
+    def edge_queue_inds(self) -> list:
+        """
+        Returns the indices (row, col, direction) of the queues entering the grid, in the layout
+        of avg_departure_times.
+        """
+        rows, cols = self.grid_dimensions
+        inds = []
+
+        for row in range(rows):
+            for col in range(cols):
+                if row == 0: # upper edge
+                    inds += [(row, col, DIRECTIONS.index("S"))]
+                if row == rows-1: # lower edge
+                    inds += [(row, col, DIRECTIONS.index("N"))]
+                if col == 0: # left edge
+                    inds += [(row, col, DIRECTIONS.index("E"))]
+                if col == cols-1: # right edge
+                    inds += [(row, col, DIRECTIONS.index("W"))]
+
+        return inds
+
+    def set_arrival_rate(self, arrival_rate) -> None:
+        """
+        Sets the arrival rate of every queue entering the grid. A float is wrapped in a
+        ConstantRate where the queues take a function of time, i.e. for Model1.
+
+        arrival_rate : float or callable
+            The arrival rate.
+        """
+        for ind in self.edge_queue_inds():
+            if callable(self.arrival_rates[ind]) and not callable(arrival_rate):
+                self.arrival_rates[ind] = ConstantRate(arrival_rate)
+            else:
+                self.arrival_rates[ind] = arrival_rate
+
+    def set_traffic_light_parameter(self, name: str, value) -> None:
+        """
+        Sets a parameter of every traffic light that has it, e.g. 'period', 'green_ratio',
+        'time_delay', 'sensor_depth' or 'rule'. Mirrors follow the lights they mirror.
+
+        name : str
+            The name of the parameter, as an argument of the traffic light's initialize.
+        value : object
+            The value of the parameter.
+        """
+        found = False
+
+        for specs in self.traffic_lights.values():
+            for spec in specs.values():
+                if name in spec["parameters"]:
+                    spec["parameters"][name] = value
+                    found = True
+
+        if not found:
+            raise ValueError("No traffic light has a parameter '"+name+"'.")
+
+    def build_traffic_lights(self, grid_ind: (int,int)) -> (TrafficLight.TrafficLight, TrafficLight.TrafficLight):
+        """
+        Returns new north-south and east-west traffic lights of an intersection.
+
+        grid_ind : (int,int)
+            The grid index of the intersection.
+        """
+        specs = self.traffic_lights[tuple(int(i) for i in grid_ind)]
+        traffic_lights = dict()
+
+        # Mirrors need the light they mirror, so they are built last.
+        for name in sorted(specs, key=lambda name: specs[name]["type"] == "TrafficLightMirror"):
+            traffic_light = getattr(TrafficLight, specs[name]["type"])()
+
+            if specs[name]["type"] == "TrafficLightMirror":
+                other = traffic_lights.get("ew" if name == "ns" else "ns")
+                if other == None:
+                    raise ValueError("The traffic lights of intersection "+str(grid_ind)+" mirror each other.")
+                traffic_light.initialize(traffic_light=other)
+            else:
+                traffic_light.initialize(**specs[name]["parameters"])
+
+            traffic_lights[name] = traffic_light
+
+        return traffic_lights["ns"], traffic_lights["ew"]
+
+    def build(self, seed=None):
+        """
+        Returns a new network of this configuration, at time 0.
+
+        seed : int or np.random.SeedSequence (optional)
+            The seed of the network's random streams. Defaults to None, in which case the seed of
+            the spec is used.
+        """
+        network = self.network_type()
+        network.edge_type = self.edge_type
+        network.intersection_type = self.intersection_type
+        network.initialize(grid_dimensions=self.grid_dimensions, grid_distance=self.grid_distance, vectorized=self.vectorized)
+
+        avg_departure_times = self.avg_departure_times.tolist()
+
+        for grid_ind in network.grid_inds:
+            row, col = int(grid_ind[0]), int(grid_ind[1])
+            intersection = network.intersections[grid_ind]
+
+            for k, queue in enumerate(queues(intersection)):
+                queue.initialize(avg_departure_time=avg_departure_times[row][col][k], arrival_rate=self.arrival_rates[row,col,k], direction=queue.direction, head_position=queue.head_position, platoon_size_distribution=self.platoon_size_distributions[row,col,k])
+
+            if (row, col) in self.traffic_lights:
+                traffic_light_ns, traffic_light_ew = self.build_traffic_lights((row, col))
+                intersection.set_traffic_lights(traffic_light_ns=traffic_light_ns, traffic_light_ew=traffic_light_ew)
+
+        network.set_observable_intersections(grid_inds=list(self.observable_grid_inds))
+
+        # Seeded once all components exist, rather than per intersection as they are set.
+        if seed == None:
+            seed = self.seed
+        if seed != None:
+            network.seed(seed)
+
+        return network
+
+def traffic_light_spec(traffic_light: TrafficLight.TrafficLight, other: TrafficLight.TrafficLight) -> dict:
+    """
+    Returns the spec of a traffic light, see NetworkSpec.traffic_lights.
+
+    traffic_light : TrafficLight.TrafficLight
+        The traffic light.
+    other : TrafficLight.TrafficLight
+        The other traffic light of its intersection.
+    """
+    name = traffic_light.__class__.__name__
+
+    if getattr(TrafficLight, name, None) != traffic_light.__class__:
+        raise ValueError("Traffic lights of class "+name+" are not defined in TrafficLight.")
+
+    if isinstance(traffic_light, TrafficLight.TrafficLightMirror) and traffic_light.traffic_light is not other:
+        raise ValueError("A TrafficLightMirror can only mirror the other traffic light of its intersection.")
+
+    return {"type": name, "parameters": traffic_light.parameters()}
+
+def from_network(network) -> NetworkSpec:
+    """
+    Returns the spec of a network's configuration. Its state, e.g. vehicles, recorded series and
+    the internal state of the traffic lights, is left out.
+
+    network : BaseModel.IntersectionNetworkSimulator
+        The network.
+    """
+    spec = NetworkSpec()
+    shape = tuple(network.grid_dimensions)+(4,)
+
+    spec.network_type = network.__class__
+    spec.edge_type = network.edge_type
+    spec.intersection_type = network.intersection_type
+    spec.grid_dimensions = tuple(int(i) for i in network.grid_dimensions)
+    spec.grid_distance = network.grid_distance
+    spec.vectorized = network.vehicle_array is not None
+    spec.avg_departure_times = np.empty(shape, dtype=float)
+    spec.arrival_rates = np.empty(shape, dtype=object)
+    spec.platoon_size_distributions = np.empty(shape, dtype=object)
+    spec.observable_grid_inds = [tuple(int(i) for i in grid_ind) for grid_ind in network.observable_intersection_grid_inds]
+    spec.seed = network.seed_sequence
+
+    for grid_ind in network.grid_inds:
+        intersection = network.intersections[grid_ind]
+
+        for k, queue in enumerate(queues(intersection)):
+            departure_rate = queue.queue.departure_rate
+            spec.avg_departure_times[grid_ind][k] = 1/departure_rate if departure_rate > 0 else np.inf
+            spec.arrival_rates[grid_ind][k] = queue.queue.arrival_rate
+            spec.platoon_size_distributions[grid_ind][k] = list(queue.queue.platoon_size_distribution)
+
+        if intersection.traffic_light_ns != None and intersection.traffic_light_ew != None:
+            spec.set_traffic_lights(grid_ind=grid_ind, traffic_light_ns=traffic_light_spec(intersection.traffic_light_ns, intersection.traffic_light_ew), traffic_light_ew=traffic_light_spec(intersection.traffic_light_ew, intersection.traffic_light_ns))
+
+    return spec
@@ -0,0 +1,963 @@
+import io
+import sys
+import math
+import secrets
+import traceback
+import threading
+import multiprocessing
+import multiprocessing.connection
+import numpy as np
+from multiprocessing import shared_memory
+import Vehicle
+import Checkpoint
+
+# Kinds of the records exchanged between blocks: a vehicle handed over to the block of its new
+# destination, the state of a vehicle sent to the blocks holding a ghost of it, and a block letting
+# go of a ghost.
+TRANSFER = 1
+UPDATE = 2
+RELEASE = 3
+
+# Fields of a record. The target is the receiving block, -1 for all of them. Transfers carry the
+# vehicle's index key, its destination as a position in grid order, whether its departure is
+# observed, whether it has left the network, and the blocks holding a ghost of it, -1 for none,
+# in the fields from HOLDERS on, one per block other than the target.
+KIND = 0
+TARGET = 1
+GID = 2
+KEY = 3
+DESTINATION = 4
+OBSERVED = 5
+EXITED = 6
+STATE = 7
+HOLDERS = STATE+8
+
+# Keys are exchanged as floats, which hold integers exactly up to MAX_KEY.
+MAX_KEY = 2**53
+# The least nbr. of vehicles arriving or departing at an intersection within a time-step that the
+# keys must leave room for, see max_events.
+MIN_EVENTS = 1024
+
+def split(grid_dimensions: (int,int), partitions: (int,int)) -> [[(int,int)]]:
+    """
+    Splits a grid into blocks of as equally many consecutive rows and columns as possible. Returns
+    the grid indices of each block in grid order, the blocks ordered row by row.
+
+    grid_dimensions : (int,int)
+        The grid dimensions.
+    partitions : (int,int)
+        The nbr. of row and column blocks.
+    """
+    rows, cols = partitions
+
+    if rows < 1 or cols < 1 or rows > grid_dimensions[0] or cols > grid_dimensions[1]:
+        raise ValueError("Cannot split a "+str(grid_dimensions[0])+"x"+str(grid_dimensions[1])+" grid into "+str(rows)+"x"+str(cols)+" blocks.")
+
+    blocks = []
+
+    for row_inds in np.array_split(np.arange(grid_dimensions[0]), rows):
+        for col_inds in np.array_split(np.arange(grid_dimensions[1]), cols):
+            blocks += [[(i, j) for i in row_inds for j in col_inds]]
+
+    return blocks
+
+def max_events(num_steps: int, num_intersections: int) -> int:
+    """
+    Returns the largest nbr. of vehicles arriving or departing at an intersection within a time-step
+    that the keys of a run leave room for, see Block.key.
+
+    num_steps : int
+        The nbr. of time-steps of the run.
+    num_intersections : int
+        The nbr. of intersections of the network.
+    """
+    return MAX_KEY//(max(num_steps, 1)*num_intersections*2)
+
+def vehicle_state(vehicle: Vehicle.Vehicle) -> list:
+    """
+    Returns the part of a vehicle's state that changes as it moves, as the state fields of a record.
+
+    vehicle : Vehicle.Vehicle
+        The vehicle.
+    """
+    return [vehicle.position[0], vehicle.position[1], vehicle.heading, vehicle.full_speed, vehicle.speed, vehicle.length, vehicle.wait_time, vehicle.tot_wait_time]
+
+def set_vehicle_state(vehicle: Vehicle.Vehicle, record: np.ndarray) -> None:
+    """
+    Sets the state of a vehicle from the state fields of a record, see vehicle_state.
+
+    vehicle : Vehicle.Vehicle
+        The vehicle.
+    record : np.ndarray
+        The record.
+    """
+    state = record[STATE:HOLDERS].tolist()
+    vehicle.position = (state[0], state[1])
+    vehicle.heading = int(state[2])
+    vehicle.full_speed = state[3]
+    vehicle.speed = state[4]
+    vehicle.length = state[5]
+    vehicle.wait_time = state[6]
+    vehicle.tot_wait_time = state[7]
+
+class Exchange:
+    def __init__(self):
+        """
+        Shared-memory outboxes through which the blocks of a partitioned run exchange records once per
+        time-step. Each block writes its records to its own outbox and reads those of the others
+        after all blocks have written. Outboxes are double-buffered by the parity of the time-step, so
+        that a block may write the records of the next time-step while others still read.
+
+        A block with more records than its outbox holds writes them to a new outbox of twice the
+        capacity instead, a generation later. Outboxes are named by block and generation, so that
+        the other blocks can attach to it, and are only unlinked by close, as others may still read
+        the older ones.
+
+        name : str
+            The prefix of the names of the shared memory.
+        num_fields : int
+            The nbr. of fields of a record.
+        capacity : int
+            The nbr. of records each block's first outbox holds per time-step.
+        headers : np.ndarray
+            The nbr. of records of each block and parity, and the generation of the outbox holding
+            them, shape (blocks, 2, 2).
+        memories : dict
+            The shared memory of each attached outbox, keyed by block and generation. The header is
+            kept under the key None.
+        outboxes : dict
+            Each attached outbox, keyed as memories, shape (2, records, num_fields) indexed by parity.
+        """
+        self.name = ""
+        self.num_fields = 0
+        self.capacity = 0
+        self.headers = np.zeros((0,2,2))
+        self.memories = dict()
+        self.outboxes = dict()
+
+    def initialize(self, num_blocks: int, capacity: int) -> None:
+        """
+        Initializes the Exchange instance.
+
+        num_blocks : int
+            The nbr. of blocks.
+        capacity : int
+            The nbr. of records each outbox initially holds per time-step.
+        """
+        self.name = "partition_"+secrets.token_hex(6)
+        self.num_fields = HOLDERS+max(num_blocks-1, 1)
+        self.capacity = capacity
+        self.memories = dict()
+        self.outboxes = dict()
+
+        memory = shared_memory.SharedMemory(name=self.name, create=True, size=num_blocks*4*8)
+        self.memories[None] = memory
+        self.headers = np.ndarray((num_blocks, 2, 2), dtype=float, buffer=memory.buf)
+        self.headers[:] = 0
+
+        for block in range(num_blocks):
+            self.attach(block, 0, create=True)
+
+    def num_holders(self) -> int:
+        """
+        Returns the nbr. of holder fields of a record.
+        """
+        return self.num_fields-HOLDERS
+
+    def outbox_name(self, block: int, generation: int) -> str:
+        return self.name+"_"+str(block)+"_"+str(generation)
+
+    def attach(self, block: int, generation: int, create=False) -> np.ndarray:
+        """
+        Returns an outbox of a block, attaching to its shared memory, or creating it, if need be.
+
+        block : int
+            The block.
+        generation : int
+            The generation of the outbox.
+        create : bool (optional)
+            Whether to create the outbox. Defaults to False.
+        """
+        if (block, generation) not in self.outboxes:
+            shape = (2, self.capacity*2**generation, self.num_fields)
+            memory = shared_memory.SharedMemory(name=self.outbox_name(block, generation), create=create, size=int(np.prod(shape))*8)
+            self.memories[(block, generation)] = memory
+            self.outboxes[(block, generation)] = np.ndarray(shape, dtype=float, buffer=memory.buf)
+
+        return self.outboxes[(block, generation)]
+
+    def write(self, block: int, parity: int, records: list) -> None:
+        """
+        Writes the records of a block to its outbox, moving to a larger one if they do not fit.
+
+        block : int
+            The block.
+        parity : int
+            The parity of the time-step.
+        records : [list]
+            The records.
+        """
+        generation = int(self.headers[block].max(axis=0)[1])
+
+        while len(records) > self.capacity*2**generation:
+            generation += 1
+
+        outbox = self.attach(block, generation, create=generation > self.headers[block].max(axis=0)[1])[parity]
+
+        if len(records) > 0:
+            outbox[:len(records)] = records
+
+        # Published last, so that a block reading the header finds the records in place.
+        self.headers[block, parity] = [len(records), generation]
+
+    def read(self, block: int, parity: int) -> np.ndarray:
+        """
+        Returns the records in the outbox of a block.
+
+        block : int
+            The block.
+        parity : int
+            The parity of the time-step.
+        """
+        num_records, generation = self.headers[block, parity]
+
+        return self.attach(block, int(generation))[parity][:int(num_records)]
+
+    def close(self) -> None:
+        """
+        Releases the shared memory, unlinking every outbox any block created.
+        """
+        generations = self.headers.max(axis=1)[:,1].astype(int).tolist()
+        self.headers = np.zeros((0,2,2))
+
+        # A block may have failed after creating an outbox but before publishing it.
+        for block, generation in enumerate(generations):
+            for g in range(generation+2):
+                try:
+                    self.attach(block, g)
+                except FileNotFoundError:
+                    pass
+
+        for memory in self.memories.values():
+            memory.close()
+            memory.unlink()
+
+        self.memories = dict()
+        self.outboxes = dict()
+
+class BlockPickler(Checkpoint.CheckpointPickler):
+    def __init__(self, file, functions: dict, vehicles: dict):
+        """
+        Pickles the intersections of a block, referring to vehicles by their global id, so that they
+        can be joined with those of the other blocks.
+
+        functions : dict
+            The arrival rate functions of the network, see Checkpoint.callables.
+        vehicles : dict
+            The global id of each vehicle, and its state if it is a ghost, keyed by id of the vehicle.
+        """
+        super().__init__(file, functions=functions)
+        self.vehicles = vehicles
+
+    def persistent_id(self, obj):
+        if isinstance(obj, Vehicle.Vehicle) and id(obj) in self.vehicles:
+            return ("vehicle",)+self.vehicles[id(obj)]
+
+        return super().persistent_id(obj)
+
+class BlockUnpickler(Checkpoint.CheckpointUnpickler):
+    def __init__(self, file, functions: dict, vehicles: dict):
+        """
+        Unpickles the intersections of a block, taking the vehicles from those owned by the blocks.
+
+        functions : dict
+            The arrival rate functions of the network, see Checkpoint.callables.
+        vehicles : dict
+            The vehicles owned by the blocks, keyed by global id. Ghosts of vehicles owned by no block
+            are added.
+        """
+        super().__init__(file, functions=functions)
+        self.vehicles = vehicles
+
+    def persistent_load(self, pid):
+        if pid[0] == "vehicle":
+            if pid[1] not in self.vehicles:
+                vehicle = Vehicle.Vehicle()
+                vehicle.__setstate__(pid[2])
+                self.vehicles[pid[1]] = vehicle
+
+            return self.vehicles[pid[1]]
+
+        return super().persistent_load(pid)
+
+class Block:
+    def __init__(self):
+        """
+        Advances a block of a network's intersections in a worker process, in lockstep with the
+        other blocks.
+
+        A block owns the vehicles heading for its intersections and those leaving the network from
+        them, and hands a vehicle over to another block when its departure gives it a destination
+        there. The intersection it departed from still refers to it until it has crossed, so the
+        block keeps a ghost of it, kept up to date by the owner until the vehicle has cleared the
+        intersection. Vehicles have global ids and index keys that order them as in a single
+        network, so that every block runs exactly as the network would.
+
+        network : BaseModel.IntersectionNetworkSimulator
+            The worker's copy of the network. Only the block's intersections and own vehicles are
+            kept up to date.
+        index : int
+            The nbr. of the block.
+        grid_inds : [(int,int)]
+            The grid indices of the block, in grid order.
+        blocks : dict
+            The block of each grid index.
+        positions : dict
+            The position in grid order of each grid index.
+        boundary : [(int,int)]
+            The grid indices of the block next to another block.
+        exchange : Exchange
+            The outboxes shared by the blocks.
+        barrier : multiprocessing.Barrier
+            Waited at by all blocks once per time-step, after writing their outboxes.
+        max_events : int
+            The nbr. of vehicles arriving or departing at an intersection within a time-step that
+            the keys leave room for, see max_events.
+        gids : dict
+            The global id of each own vehicle and ghost. Ids of vehicles in the network at the start
+            are negative, those arriving later order them by time-step, grid order and arrival. Own
+            vehicles include those that have left the network while still queued, which the network
+            keeps in the queue and, once they depart, in vehicle_index.
+        index_keys : dict
+            The key ordering each own vehicle within its vehicle_index entry.
+        ghosts : dict
+            The ghosts of the block, as [vehicle, kept up to date, grid index departed from], keyed
+            by global id.
+        holders : dict
+            The own vehicles that other blocks hold ghosts of, as [vehicle, blocks], keyed by
+            global id.
+        releases : [list]
+            The release records to send at the next exchange.
+        exits : [(int, int, float)]
+            The time-step, global id and total waiting time of each vehicle that has left the
+            network from the block.
+        num_steps : int
+            The nbr. of time-steps run.
+        """
+        self.network = None
+        self.index = 0
+        self.grid_inds = []
+        self.blocks = dict()
+        self.positions = dict()
+        self.boundary = []
+        self.exchange = None
+        self.barrier = None
+        self.max_events = MIN_EVENTS
+        self.gids = dict()
+        self.index_keys = dict()
+        self.ghosts = dict()
+        self.holders = dict()
+        self.releases = []
+        self.exits = []
+        self.num_steps = 0
+
+    def initialize(self, network, index: int, blocks: dict, exchange: Exchange, barrier, max_events=MIN_EVENTS) -> None:
+        """
+        Initializes the Block instance, taking over the vehicles of the network that it owns.
+
+        network : BaseModel.IntersectionNetworkSimulator
+            The worker's copy of the network.
+        index : int
+            The nbr. of the block.
+        blocks : dict
+            The block of each grid index.
+        exchange : Exchange
+            The outboxes shared by the blocks.
+        barrier : multiprocessing.Barrier
+            Waited at by all blocks once per time-step.
+        max_events : int (optional)
+            The nbr. of vehicles arriving or departing at an intersection within a time-step that
+            the keys leave room for, the same in every block. Defaults to MIN_EVENTS.
+        """
+        self.network = network
+        self.index = index
+        self.blocks = blocks
+        self.positions = {grid_ind: position for position, grid_ind in enumerate(network.grid_inds)}
+        self.grid_inds = [grid_ind for grid_ind in network.grid_inds if blocks[grid_ind] == index]
+        self.boundary = [grid_ind for grid_ind in self.grid_inds if len({blocks.get(neighbour, index) for neighbour in Block.neighbours(grid_ind)}) > 1]
+        self.exchange = exchange
+        self.barrier = barrier
+        self.max_events = max_events
+        self.gids = dict()
+        self.index_keys = dict()
+        self.ghosts = dict()
+        self.holders = dict()
+        self.releases = []
+        self.exits = []
+        self.num_steps = 0
+
+        vehicles = dict.fromkeys(network.vehicles)
+
+        # Vehicles that have left the network may still be queued or indexed.
+        for grid_ind in network.grid_inds:
+            intersection = network.intersections[grid_ind]
+            for queue in [intersection.queue_n, intersection.queue_w, intersection.queue_s, intersection.queue_e]:
+                vehicles.update(dict.fromkeys(queue.queue.vehicles))
+
+        for entry in network.vehicle_index.values():
+            vehicles.update(dict.fromkeys(entry))
+
+        gids = {vehicle: rank-len(vehicles) for rank, vehicle in enumerate(vehicles)}
+
+        # Every block finds the same vehicles departed toward other blocks, being deterministic.
+        for grid_ind in network.grid_inds:
+            for vehicle in Block.references(network.intersections[grid_ind]):
+                if vehicle not in gids:
+                    continue
+
+                owner = self.owner(vehicle)
+
+                if blocks[grid_ind] == index and owner != index:
+                    self.ghosts[gids[vehicle]] = [vehicle, vehicle in network.vehicles, grid_ind]
+                    self.gids[vehicle] = gids[vehicle]
+                elif owner == index and blocks[grid_ind] != index and vehicle in network.vehicles:
+                    holder = self.holders.setdefault(gids[vehicle], [vehicle, []])
+                    if blocks[grid_ind] not in holder[1]:
+                        holder[1] += [blocks[grid_ind]]
+
+        in_network = network.vehicles
+        network.vehicles = dict()
+
+        for vehicle in vehicles:
+            if self.owner(vehicle) == index:
+                self.gids[vehicle] = gids[vehicle]
+
+                if vehicle in in_network:
+                    network.vehicles[vehicle] = None
+
+        for key in network.vehicle_index:
+            if blocks[key[0]] != index:
+                network.vehicle_index[key] = dict()
+                continue
+
+            entry = network.vehicle_index[key]
+            for rank, vehicle in enumerate(entry):
+                self.index_keys[vehicle] = rank-len(entry)
+
+        network.observations = []
+
+    @staticmethod
+    def neighbours(grid_ind: (int,int)) -> [(int,int)]:
+        """
+        Returns the grid indices next to a grid index.
+
+        grid_ind : (int,int)
+            The grid index.
+        """
+        return [(grid_ind[0]-1, grid_ind[1]), (grid_ind[0], grid_ind[1]-1), (grid_ind[0]+1, grid_ind[1]), (grid_ind[0], grid_ind[1]+1)]
+
+    @staticmethod
+    def references(intersection) -> list:
+        """
+        Returns the vehicles that an intersection refers to after they have departed from it: those
+        crossing it, and the last to depart from each of its queues.
+
+        intersection : BaseModel.FourWayIntersectionSimulator
+            The intersection.
+        """
+        departing_vehicles = [queue.queue.departing_vehicle for queue in [intersection.queue_n, intersection.queue_w, intersection.queue_s, intersection.queue_e]]
+
+        return intersection.horizontal_crossers+intersection.vertical_crossers+[vehicle for vehicle in departing_vehicles if vehicle != None]
+
+    def owner(self, vehicle: Vehicle.Vehicle) -> int:
+        """
+        Returns the block owning a vehicle: that of its destination, or of the intersection it
+        departed from if it is leaving the network.
+
+        vehicle : Vehicle.Vehicle
+            The vehicle.
+        """
+        destination = vehicle.destination
+
+        if destination in self.blocks:
+            return self.blocks[destination]
+
+        direction = vehicle.direction
+
+        return self.blocks[(destination[0]+direction[1], destination[1]-direction[0])]
+
+    def key(self, grid_ind: (int,int), phase: int, rank: int) -> int:
+        """
+        Returns the key ordering a vehicle that arrives (phase 0) or departs (phase 1) at an
+        intersection in the current time-step, as a single network orders them.
+
+        grid_ind : (int,int)
+            The grid index of the intersection.
+        phase : int
+            0 for arrivals, 1 for departures.
+        rank : int
+            The order of the vehicle among those of the same phase.
+        """
+        if rank >= self.max_events:
+            raise RuntimeError("More than "+str(self.max_events)+" vehicles arrived at "+str(grid_ind)+" within a time-step.")
+
+        return ((self.num_steps*len(self.positions)+self.positions[grid_ind])*2+phase)*self.max_events+rank
+
+    def queued(self, vehicle: Vehicle.Vehicle) -> bool:
+        """
+        Returns whether a vehicle is queued at its destination.
+
+        vehicle : Vehicle.Vehicle
+            The vehicle.
+        """
+        if vehicle.destination not in self.blocks:
+            return False
+
+        intersection = self.network.intersections[vehicle.destination]
+        queue = [intersection.queue_n, intersection.queue_w, intersection.queue_s, intersection.queue_e][vehicle.heading]
+
+        return vehicle in queue.queue.members
+
+    def cleared(self, vehicle: Vehicle.Vehicle, grid_ind: (int,int)) -> bool:
+        """
+        Returns whether a vehicle has cleared an intersection it departed from, so that the
+        intersection no longer depends on where it is.
+
+        vehicle : Vehicle.Vehicle
+            The vehicle.
+        grid_ind : (int,int)
+            The grid index of the intersection.
+        """
+        intersection = self.network.intersections[grid_ind]
+        code = vehicle.heading
+        axis = Vehicle.AXES[code]
+        sign = Vehicle.SIGNS[code]
+        # The queue whose head is on the far side of the intersection.
+        queue = [intersection.queue_s, intersection.queue_e, intersection.queue_n, intersection.queue_w][code]
+
+        return sign*vehicle.tail_position[axis] >= sign*queue.queue.head_position[axis]
+
+    def simulate(self, delta_t: float, end_time: float) -> None:
+        """
+        Runs the block until end_time.
+
+        delta_t : float
+            The time-step size [s].
+        end_time : float
+            The simulation time [s] to stop at.
+        """
+        num_steps = int(math.ceil((end_time-self.network.time)/delta_t))+1
+
+        for grid_ind in self.grid_inds:
+            self.network.intersections[grid_ind].reserve(num_steps)
+
+        while self.network.time < end_time:
+            self.run_event(delta_t=delta_t)
+
+    def run_event(self, delta_t: float) -> None:
+        """
+        Runs a time-step of the block, as IntersectionNetworkSimulator.run_event does for the whole
+        network, exchanging the vehicles that change blocks before the traffic lights sense.
+
+        delta_t : float
+            The time-step size.
+        """
+        network = self.network
+
+        network.exits.append(network.exits[-1])
+
+        for vehicle in network.scan_vehicles(delta_t=delta_t):
+            gid = self.gids[vehicle]
+            self.exits += [(self.num_steps, gid, vehicle.tot_wait_time)]
+            self.index_keys.pop(vehicle, None)
+            self.holders.pop(gid, None)
+            del network.vehicles[vehicle]
+            network.unindex_vehicle(vehicle)
+
+            if not self.queued(vehicle):
+                del self.gids[vehicle]
+
+        records = self.releases
+        self.releases = []
+        observations = []
+        num_holders = self.exchange.num_holders()
+
+        for grid_ind in self.grid_inds:
+            intersection = network.intersections[grid_ind]
+            arrivals, departures = intersection.run_event(delta_t=delta_t)
+
+            for rank, arrival in enumerate(arrivals):
+                arrival.destination = grid_ind
+                network.vehicles[arrival] = None
+                network.index_vehicle(arrival)
+                self.gids[arrival] = self.key(grid_ind, 0, rank)
+                self.index_keys[arrival] = self.gids[arrival]
+
+            departures = network.update_destinations([(departure, grid_ind) for departure in departures])
+
+            for rank, departure in enumerate(departures):
+                key = self.key(grid_ind, 1, rank)
+                destination = departure.destination
+                block = self.blocks.get(destination, self.index)
+
+                if block == self.index:
+                    if destination in self.blocks:
+                        self.index_keys[departure] = key
+
+                        if intersection.observable:
+                            observations += [(key, self.observation(departure))]
+                    else:
+                        self.index_keys.pop(departure, None)
+
+                        if departure not in network.vehicles:
+                            del self.gids[departure]
+                    continue
+
+                gid = self.gids[departure]
+                exited = departure not in network.vehicles
+                holders = [holder for holder in self.holders.pop(gid, [None, []])[1] if holder != block]
+
+                # Vehicles that have left the network no longer move, so their ghosts need no updates.
+                if not exited:
+                    holders = [self.index]+holders
+
+                network.vehicles.pop(departure, None)
+                network.unindex_vehicle(departure)
+                self.index_keys.pop(departure, None)
+                self.ghosts[gid] = [departure, not exited, grid_ind]
+                records += [[TRANSFER, block, gid, key, self.positions[destination], intersection.observable, exited]+vehicle_state(departure)+holders+[-1]*(num_holders-len(holders))]
+
+        for gid, (vehicle, holders) in self.holders.items():
+            for holder in holders:
+                records += [[UPDATE, holder, gid, 0, 0, 0, 0]+vehicle_state(vehicle)+[-1]*num_holders]
+
+        observations += self.receive(self.send(records))
+        observations.sort(key=lambda item: item[0])
+        network.observations = [observation for key, observation in observations]
+
+        for grid_ind in self.grid_inds:
+            network.sense(grid_ind=grid_ind, delta_t=delta_t)
+
+        self.release()
+
+        for vehicle in network.vehicles:
+            vehicle.time_step(delta_t=delta_t)
+
+        for vehicle, active, grid_ind in self.ghosts.values():
+            if active:
+                vehicle.time_step(delta_t=delta_t)
+
+        network.time = network.intersections[self.grid_inds[0]].time
+        self.num_steps += 1
+
+    def observation(self, vehicle: Vehicle.Vehicle) -> dict:
+        """
+        Returns the observation of a vehicle departing from an observable intersection, see
+        IntersectionNetworkSimulator.observe.
+
+        vehicle : Vehicle.Vehicle
+            The vehicle.
+        """
+        return {"position": vehicle.position, "direction": vehicle.direction, "speed": vehicle.speed, "destination": self.network.intersections[vehicle.destination]}
+
+    def send(self, records: list) -> int:
+        """
+        Writes the records of the block to its outbox and waits for the other blocks to do so.
+        Returns the parity of the time-step.
+
+        records : [list]
+            The records.
+        """
+        parity = self.num_steps % 2
+        self.exchange.write(self.index, parity, records)
+        self.barrier.wait()
+
+        return parity
+
+    def receive(self, parity: int) -> list:
+        """
+        Reads the records of the other blocks addressed to the block: takes over the vehicles handed
+        to it, updates its ghosts and forgets the blocks that let go of ghosts of its vehicles.
+        Returns the observations of the vehicles taken over, with their index keys.
+
+        parity : int
+            The parity of the time-step.
+        """
+        network = self.network
+        observations = []
+        entries = set()
+
+        for block in range(len(self.exchange.headers)):
+            if block == self.index:
+                continue
+
+            for record in self.exchange.read(block, parity):
+                kind = int(record[KIND])
+                gid = int(record[GID])
+
+                if kind == RELEASE:
+                    holder = self.holders.get(gid)
+
+                    if holder != None and block in holder[1]:
+                        holder[1].remove(block)
+                        if len(holder[1]) <= 0:
+                            del self.holders[gid]
+                    continue
+
+                if int(record[TARGET]) != self.index:
+                    continue
+
+                if kind == UPDATE:
+                    ghost = self.ghosts.get(gid)
+
+                    if ghost != None and ghost[1]:
+                        set_vehicle_state(ghost[0], record)
+                    continue
+
+                # A vehicle returning to a block that holds a ghost of it is that ghost.
+                ghost = self.ghosts.pop(gid, None)
+                vehicle = Vehicle.Vehicle() if ghost == None else ghost[0]
+                set_vehicle_state(vehicle, record)
+                vehicle.destination = network.grid_inds[int(record[DESTINATION])]
+
+                key = int(record[KEY])
+                self.gids[vehicle] = gid
+                self.index_keys[vehicle] = key
+                network.index_vehicle(vehicle)
+
+                if not record[EXITED]:
+                    network.vehicles[vehicle] = None
+
+                entries.add((vehicle.destination, vehicle.direction))
+
+                holders = [int(holder) for holder in record[HOLDERS:] if holder >= 0 and holder != self.index]
+                if len(holders) > 0:
+                    self.holders[gid] = [vehicle, holders]
+
+                if record[OBSERVED]:
+                    observations += [(key, self.observation(vehicle))]
+
+        if len(entries) > 0:
+            network.vehicles = dict.fromkeys(sorted(network.vehicles, key=self.gids.__getitem__))
+
+            for entry in entries:
+                network.vehicle_index[entry] = dict.fromkeys(sorted(network.vehicle_index[entry], key=self.index_keys.__getitem__))
+
+        return observations
+
+    def release(self) -> None:
+        """
+        Stops keeping up ghosts of vehicles that have cleared the intersection they departed from,
+        and forgets those no intersection of the block refers to any longer, letting their owners
+        know at the next exchange.
+        """
+        referenced = set()
+        for grid_ind in self.boundary:
+            referenced.update(id(vehicle) for vehicle in Block.references(self.network.intersections[grid_ind]))
+
+        for gid in list(self.ghosts):
+            ghost = self.ghosts[gid]
+            vehicle, active, grid_ind = ghost
+
+            if id(vehicle) not in referenced:
+                del self.ghosts[gid]
+                del self.gids[vehicle]
+            elif active and self.cleared(vehicle, grid_ind):
+                ghost[1] = False
+            else:
+                continue
+
+            if active:
+                self.releases += [[RELEASE, -1, gid, 0, 0, 0, 0]+vehicle_state(vehicle)+[-1]*self.exchange.num_holders()]
+
+    def dumps(self) -> dict:
+        """
+        Returns the state of the block: its intersections, pickled with vehicles referred to by
+        global id, its own vehicles with their global ids, index keys and whether they are in the
+        network, its exits, the nbr. of time-steps run and its clock.
+        """
+        vehicles = {id(vehicle): (gid, None) for vehicle, gid in self.gids.items()}
+        for gid, (vehicle, active, grid_ind) in self.ghosts.items():
+            vehicles[id(vehicle)] = (gid, vehicle.__getstate__())
+
+        own = [vehicle for vehicle, gid in self.gids.items() if gid not in self.ghosts]
+
+        file = io.BytesIO()
+        intersections = {grid_ind: self.network.intersections[grid_ind] for grid_ind in self.grid_inds}
+        BlockPickler(file, functions=Checkpoint.callables(self.network), vehicles=vehicles).dump(intersections)
+
+        return {"intersections": file.getvalue(), "vehicles": [(self.gids[vehicle], self.index_keys.get(vehicle), vehicle.__getstate__(), vehicle in self.network.vehicles) for vehicle in own], "exits": self.exits, "num_steps": self.num_steps, "time": self.network.time}
+
+def run_block(network, index: int, blocks: dict, exchange: Exchange, barrier, connection, delta_t: float, end_time: float, max_events: int) -> None:
+    """
+    Runs a block in a worker process and sends its state, see Block.dumps, or the traceback of the
+    error it failed with, over a connection.
+    """
+    try:
+        block = Block()
+        block.initialize(network=network, index=index, blocks=blocks, exchange=exchange, barrier=barrier, max_events=max_events)
+        block.simulate(delta_t=delta_t, end_time=end_time)
+        connection.send(("done", block.dumps()))
+    except BaseException as error:
+        # Lets the other blocks stop waiting for this one.
+        barrier.abort()
+        connection.send(("broken" if isinstance(error, threading.BrokenBarrierError) else "error", traceback.format_exc()))
+    finally:
+        connection.close()
+
+def simulate(network, delta_t: float, end_time: float, partitions: (int,int)) -> None:
+    """
+    Runs a network until end_time with its intersections split into blocks, each advanced by a worker
+    process in lockstep with the others, see Block. The vehicles changing blocks are exchanged
+    through shared memory once per time-step. The network ends up as if it had been run in a single
+    process.
+
+    The workers are forked, so that they start from the network as it is, which Windows does not
+    support and macOS does not do safely. The outboxes of the exchange grow with the records, and
+    the limits of the keys are checked before the workers start, so that a long run does not
+    fail partway.
+
+    network : BaseModel.IntersectionNetworkSimulator
+        The network. Must be seeded, so that every queue and traffic light draws from a stream of its
+        own, and keep its vehicles as plain Vehicle.Vehicle instances.
+    delta_t : float
+        The time-step size [s].
+    end_time : float
+        The simulation time [s] to stop at.
+    partitions : (int,int)
+        The nbr. of row and column blocks, see split.
+    """
+    if network.seed_sequence == None:
+        raise ValueError("A partitioned run requires a seeded network, so that the blocks draw from streams of their own.")
+
+    if network.vehicle_array != None:
+        raise ValueError("A partitioned run requires plain vehicles rather than a vehicle array.")
+
+    if sys.platform == "darwin" or "fork" not in multiprocessing.get_all_start_methods():
+        raise ValueError("A partitioned run forks its worker processes, which is unavailable on Windows and unsafe on macOS (this is "+sys.platform+").")
+
+    if network.time >= end_time:
+        return
+
+    events = max_events(int(math.ceil((end_time-network.time)/delta_t))+1, len(network.grid_inds))
+
+    if events < MIN_EVENTS:
+        raise ValueError("A partitioned run of "+str(end_time-network.time)+" s at delta_t = "+str(delta_t)+" has too many time-steps to key the vehicles by. Split it into shorter runs.")
+
+    grid_inds = split(network.grid_dimensions, partitions)
+    blocks = {grid_ind: block for block, block_grid_inds in enumerate(grid_inds) for grid_ind in block_grid_inds}
+    num_boundary = max(len([neighbour for grid_ind in block_grid_inds for neighbour in Block.neighbours(grid_ind) if blocks.get(neighbour, block) != block]) for block, block_grid_inds in enumerate(grid_inds))
+
+    exchange = Exchange()
+    exchange.initialize(num_blocks=len(grid_inds), capacity=64+64*num_boundary)
+    # Workers are forked, so that they start from the network as it is, arrival rate functions and all.
+    context = multiprocessing.get_context("fork")
+    barrier = context.Barrier(len(grid_inds))
+    processes = []
+    pending = dict()
+    results = [None]*len(grid_inds)
+
+    try:
+        for block in range(len(grid_inds)):
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(target=run_block, args=(network, block, blocks, exchange, barrier, sender, delta_t, end_time, events), daemon=True)
+            process.start()
+            sender.close()
+            processes += [process]
+            pending[receiver] = block
+
+        while len(pending) > 0:
+            ready = multiprocessing.connection.wait(list(pending)+[processes[block].sentinel for block in pending.values()])
+
+            for receiver, block in list(pending.items()):
+                if receiver in ready or receiver.poll():
+                    try:
+                        results[block] = receiver.recv()
+                    except EOFError:
+                        results[block] = ("error", "The worker exited with code "+str(processes[block].exitcode)+".")
+                elif processes[block].sentinel in ready:
+                    results[block] = ("error", "The worker exited with code "+str(processes[block].exitcode)+".")
+                else:
+                    continue
+
+                if results[block][0] != "done":
+                    barrier.abort()
+
+                receiver.close()
+                del pending[receiver]
+
+        for process in processes:
+            process.join()
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+        exchange.close()
+
+    failures = [(block, result[1]) for block, result in enumerate(results) if result[0] == "error"]
+    failures += [(block, result[1]) for block, result in enumerate(results) if result[0] == "broken"]
+
+    if len(failures) > 0:
+        raise RuntimeError("Block "+str(failures[0][0])+" failed:\n"+failures[0][1])
+
+    merge(network, [result[1] for result in results])
+
+def merge(network, states: [dict]) -> None:
+    """
+    Joins the states of the blocks of a partitioned run into a network, see Block.dumps.
+
+    network : BaseModel.IntersectionNetworkSimulator
+        The network.
+    states : [dict]
+        The state of each block.
+    """
+    vehicles = dict()
+    index_keys = dict()
+    owned = []
+
+    for state in states:
+        for gid, key, vehicle_state, in_network in state["vehicles"]:
+            vehicle = Vehicle.Vehicle()
+            vehicle.__setstate__(vehicle_state)
+            vehicles[gid] = vehicle
+
+            if key != None:
+                index_keys[vehicle] = key
+
+            if in_network:
+                owned += [gid]
+
+    owned.sort()
+    functions = Checkpoint.callables(network)
+
+    for state in states:
+        intersections = BlockUnpickler(io.BytesIO(state["intersections"]), functions=functions, vehicles=vehicles).load()
+
+        for grid_ind, intersection in intersections.items():
+            network.intersections[grid_ind] = intersection
+
+    network.vehicles = dict.fromkeys(vehicles[gid] for gid in owned)
+
+    for key in network.vehicle_index:
+        network.vehicle_index[key] = dict()
+
+    for vehicle in sorted(index_keys, key=index_keys.__getitem__):
+        network.index_vehicle(vehicle)
+
+    exits = sorted(exit for state in states for exit in state["exits"])
+    network.exits.reserve(states[0]["num_steps"])
+    i = 0
+
+    for step in range(states[0]["num_steps"]):
+        network.exits.append(network.exits[-1])
+
+        while i < len(exits) and exits[i][0] == step:
+            network.exits[-1] += 1
+            network.tot_wait_time += exits[i][2]
+            i += 1
+
+        if network.exits[-1] > 0:
+            network.avg_wait_time = network.tot_wait_time/network.exits[-1]
+
+    network.time = states[0]["time"]
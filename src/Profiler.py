@@ -0,0 +1,104 @@
+import time
+
+class Profiler:
+    def __init__(self):
+        """
+        Gathers the cumulative wall time and nbr. of calls of each phase of a simulation step.
+
+        times : dict
+            Cumulative wall time [s] of each phase.
+        calls : dict
+            Nbr. of calls of each phase.
+        intersection_times : dict
+            Cumulative wall time [s] of each per-intersection phase, keyed by (phase, grid_ind).
+        intersection_calls : dict
+            Nbr. of calls of each per-intersection phase, keyed by (phase, grid_ind).
+        """
+        self.times = dict()
+        self.calls = dict()
+        self.intersection_times = dict()
+        self.intersection_calls = dict()
+
+    def clock(self) -> float:
+        """
+        Returns the current wall time [s].
+        """
+        return time.perf_counter()
+
+    def record(self, phase: str, start: float, grid_ind=None) -> float:
+        """
+        Adds the time elapsed since start to a phase and returns the current wall time [s], so that
+        it can serve as the start of the next phase.
+
+        phase : str
+            The name of the phase.
+        start : float
+            The wall time [s] at which the phase started.
+        grid_ind : (int,int) (optional)
+            The grid index of the intersection the phase ran for. Defaults to None.
+        """
+        now = time.perf_counter()
+        elapsed = now-start
+
+        self.times[phase] = self.times.get(phase, 0.)+elapsed
+        self.calls[phase] = self.calls.get(phase, 0)+1
+
+        if grid_ind != None:
+            key = (phase, grid_ind)
+            self.intersection_times[key] = self.intersection_times.get(key, 0.)+elapsed
+            self.intersection_calls[key] = self.intersection_calls.get(key, 0)+1
+
+        return now
+
+    def total_time(self) -> float:
+        """
+        Returns the wall time [s] spent in all phases.
+        """
+        return sum(self.times.values())
+
+    def table(self, per_intersection=False) -> [dict]:
+        """
+        Returns one row per phase, most time-consuming first, with its cumulative time [s], nbr. of
+        calls, time per call [s] and share of the total time.
+
+        per_intersection : bool (optional)
+            Whether to break the per-intersection phases down by grid index. Defaults to False.
+        """
+        total_time = self.total_time()
+
+        if per_intersection:
+            rows = [{"phase": phase, "grid_ind": grid_ind, "time": elapsed, "calls": self.intersection_calls[(phase, grid_ind)]} for (phase, grid_ind), elapsed in self.intersection_times.items()]
+            rows += [{"phase": phase, "grid_ind": None, "time": elapsed, "calls": self.calls[phase]} for phase, elapsed in self.times.items() if not any(key[0] == phase for key in self.intersection_times)]
+        else:
+            rows = [{"phase": phase, "grid_ind": None, "time": elapsed, "calls": self.calls[phase]} for phase, elapsed in self.times.items()]
+
+        for row in rows:
+            row["time_per_call"] = row["time"]/row["calls"]
+            row["share"] = row["time"]/total_time if total_time > 0 else 0.
+
+        rows.sort(key=lambda row: row["time"], reverse=True)
+
+        return rows
+
+    def format(self, per_intersection=False) -> str:
+        """
+        Returns the table as text.
+
+        per_intersection : bool (optional)
+            Whether to break the per-intersection phases down by grid index. Defaults to False.
+        """
+        lines = ["{:<24}{:>12}{:>10}{:>14}{:>8}".format("phase", "time [s]", "calls", "per call [us]", "share")]
+
+        for row in self.table(per_intersection=per_intersection):
+            phase = row["phase"] if row["grid_ind"] == None else row["phase"]+" "+str(tuple(int(i) for i in row["grid_ind"]))
+            lines += ["{:<24}{:>12.4f}{:>10}{:>14.1f}{:>7.1f}%".format(phase, row["time"], row["calls"], 1e6*row["time_per_call"], 100*row["share"])]
+
+        lines += ["{:<24}{:>12.4f}".format("total", self.total_time())]
+
+        return "\n".join(lines)
+
+    def __str__(self) -> str:
+        return self.format()
+
+    def __repr__(self) -> str:
+        return self.format()
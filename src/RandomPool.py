@@ -0,0 +1,254 @@
+import numpy as np
+import random
+
+BLOCK_SIZE = 4096
+MIN_BLOCK_SIZE = 16
+
+def seed_sequence(seed) -> np.random.SeedSequence:
+    """
+    Returns a seed sequence for a seed that has not spawned any children yet, so that the same
+    seed always spawns the same children.
+
+    seed : int or np.random.SeedSequence
+        The seed.
+    """
+    if isinstance(seed, np.random.SeedSequence):
+        return np.random.SeedSequence(entropy=seed.entropy, spawn_key=seed.spawn_key, pool_size=seed.pool_size)
+
+    return np.random.SeedSequence(seed)
+
+def spawned(seed_sequence: np.random.SeedSequence, spawn_key: tuple) -> np.random.SeedSequence:
+    """
+    Returns the descendant of a seed sequence that spawning children along spawn_key gives, e.g.
+    spawn_key (2,7) gives the same seed sequence as seed_sequence.spawn(3)[2].spawn(8)[7], without
+    creating its siblings.
+
+    seed_sequence : np.random.SeedSequence
+        The seed sequence, which must not have spawned any children yet, see seed_sequence.
+    spawn_key : tuple
+        The index of the child at each generation.
+    """
+    return np.random.SeedSequence(entropy=seed_sequence.entropy, spawn_key=tuple(seed_sequence.spawn_key)+tuple(spawn_key), pool_size=seed_sequence.pool_size)
+
+class RandomPool:
+    def __init__(self, block_size=BLOCK_SIZE):
+        """
+        generator : np.random.Generator
+            The stream the buffers are refilled from. None if unseeded, in which case draws are
+            taken one at a time from the global state they were always taken from: uniforms from
+            Python's random, and exponential and normal draws from np.random.
+        seed_sequence : np.random.SeedSequence
+            The seed of a stream that has not been created yet. The generator is only created on
+            the first draw, as many pools of a large network never draw at all.
+        block_size : int
+            The largest nbr. of draws generated each time a buffer runs empty. Refills start at
+            MIN_BLOCK_SIZE draws and double up to block_size, so that rarely used pools stay small.
+        uniforms : np.ndarray
+            Buffered draws from U(0,1).
+        exponentials : np.ndarray
+            Buffered draws from Exp(1).
+        normals : np.ndarray
+            Buffered draws from N(0,1).
+        uniform_ind : int
+            The index of the next unused uniform draw.
+        exponential_ind : int
+            The index of the next unused exponential draw.
+        normal_ind : int
+            The index of the next unused normal draw.
+        """
+        self.generator = None
+        self.seed_sequence = None
+        self.block_size = block_size
+        self.uniforms = np.zeros(0)
+        self.exponentials = np.zeros(0)
+        self.normals = np.zeros(0)
+        self.uniform_ind = 0
+        self.exponential_ind = 0
+        self.normal_ind = 0
+
+    def seed(self, seed_sequence: np.random.SeedSequence) -> None:
+        """
+        Draws from a stream of its own from now on, discarding any buffered draws.
+
+        seed_sequence : np.random.SeedSequence
+            The seed sequence of the stream.
+        """
+        self.generator = None
+        self.seed_sequence = seed_sequence
+        self.clear()
+
+    def clear(self) -> None:
+        """
+        Discards all buffered draws.
+        """
+        self.uniforms = np.zeros(0)
+        self.exponentials = np.zeros(0)
+        self.normals = np.zeros(0)
+        self.uniform_ind = 0
+        self.exponential_ind = 0
+        self.normal_ind = 0
+
+    def source(self):
+        """
+        Returns the stream the buffers are refilled from.
+        """
+        if self.seed_sequence != None:
+            self.generator = np.random.default_rng(self.seed_sequence)
+            self.seed_sequence = None
+            
+        if self.generator != None:
+            return self.generator
+
+        return np.random
+
+    def refill_size(self, size: int) -> int:
+        """
+        Returns the nbr. of draws to generate for a buffer that held the given nbr. of draws.
+        """
+        return min(max(2*size, MIN_BLOCK_SIZE), self.block_size)
+
+    def random(self) -> float:
+        """
+        Returns a draw from U(0,1).
+        """
+        if not self.independent():
+            return random.random()
+
+        if self.uniform_ind >= len(self.uniforms):
+            self.uniforms = self.source().random(self.refill_size(len(self.uniforms)))
+            self.uniform_ind = 0
+
+        self.uniform_ind += 1
+
+        return self.uniforms.item(self.uniform_ind-1)
+
+    def skip(self, num_draws: int) -> None:
+        """
+        Discards the next draws from U(0,1), leaving the pool as that many calls to random would.
+
+        num_draws : int
+            The nbr. of draws to discard.
+        """
+        if not self.independent():
+            for i in range(num_draws):
+                random.random()
+            return
+
+        while num_draws > 0:
+            if self.uniform_ind >= len(self.uniforms):
+                self.uniforms = self.source().random(self.refill_size(len(self.uniforms)))
+                self.uniform_ind = 0
+
+            num_skipped = min(num_draws, len(self.uniforms)-self.uniform_ind)
+            self.uniform_ind += num_skipped
+            num_draws -= num_skipped
+
+    def independent(self) -> bool:
+        """
+        Returns whether the pool draws from a stream of its own rather than the global random state,
+        so that the order of its draws relative to other pools does not matter.
+        """
+        return self.generator != None or self.seed_sequence != None
+
+    def exponential(self, scale=1.) -> float:
+        """
+        Returns a draw from an exponential distribution.
+
+        scale : float (optional)
+            The mean of the distribution. Defaults to 1.
+        """
+        if not self.independent():
+            return np.random.exponential(scale=scale)
+
+        if self.exponential_ind >= len(self.exponentials):
+            self.exponentials = self.source().standard_exponential(self.refill_size(len(self.exponentials)))
+            self.exponential_ind = 0
+
+        self.exponential_ind += 1
+
+        return scale*self.exponentials.item(self.exponential_ind-1)
+
+    def normal(self, loc=0., scale=1.) -> float:
+        """
+        Returns a draw from a normal distribution.
+
+        loc : float (optional)
+            The mean of the distribution. Defaults to 0.
+        scale : float (optional)
+            The standard deviation of the distribution. Defaults to 1.
+        """
+        if not self.independent():
+            return np.random.normal(loc=loc, scale=scale)
+
+        if self.normal_ind >= len(self.normals):
+            self.normals = self.source().standard_normal(self.refill_size(len(self.normals)))
+            self.normal_ind = 0
+
+        self.normal_ind += 1
+
+        return loc+scale*self.normals.item(self.normal_ind-1)
+
+    def __getstate__(self) -> dict:
+        # Copies (e.g. one per trial) must not replay the same buffered draws.
+        state = self.__dict__.copy()
+        state["uniforms"] = np.zeros(0)
+        state["exponentials"] = np.zeros(0)
+        state["normals"] = np.zeros(0)
+        state["uniform_ind"] = 0
+        state["exponential_ind"] = 0
+        state["normal_ind"] = 0
+
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        # Pools pickled before generators were created lazily have no seed_sequence.
+        self.seed_sequence = None
+        self.__dict__.update(state)
+
+class AliasTable:
+    def __init__(self, probabilities=[1.]):
+        """
+        Walker's alias table, for drawing from a discrete distribution with a single uniform draw.
+
+        probabilities : [float] (optional)
+            The probability of each outcome 0, 1, ... Defaults to [1.].
+        acceptance : [float]
+            The probability of keeping each column's own outcome.
+        alias : [int]
+            The outcome drawn instead when a column's own outcome is rejected.
+        """
+        n = len(probabilities)
+        scaled = [p*n/sum(probabilities) for p in probabilities]
+        small = [i for i,p in enumerate(scaled) if p < 1]
+        large = [i for i,p in enumerate(scaled) if p >= 1]
+
+        self.acceptance = [1.]*n
+        self.alias = list(range(n))
+
+        while len(small) > 0 and len(large) > 0:
+            i = small.pop()
+            j = large.pop()
+
+            self.acceptance[i] = scaled[i]
+            self.alias[i] = j
+            scaled[j] = scaled[j]+scaled[i]-1
+
+            if scaled[j] < 1:
+                small += [j]
+            else:
+                large += [j]
+
+    def sample(self, u: float) -> int:
+        """
+        Returns an outcome.
+
+        u : float
+            A draw from U(0,1).
+        """
+        x = u*len(self.alias)
+        i = int(x)
+
+        if x-i < self.acceptance[i]:
+            return i
+
+        return self.alias[i]
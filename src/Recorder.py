@@ -0,0 +1,137 @@
+import numpy as np
+
+def cumulative(start: float, increments: np.ndarray) -> np.ndarray:
+    """
+    Returns the values reached by adding the increments to start one at a time, rounded exactly as
+    repeated += would round them.
+
+    start : float
+        The initial value.
+    increments : np.ndarray
+        The increments, in order.
+    """
+    return np.add.accumulate(np.concatenate([[start], increments]))[1:]
+
+class TimeSeries:
+    def __init__(self, values=[0], dtype=np.int64, capacity=16):
+        """
+        values : np.ndarray
+            The preallocated column. Only the first size entries are recorded.
+        size : int
+            The nbr. of recorded entries.
+        last :
+            The most recently recorded value, as stored, i.e. cast to the dtype of the column. None
+            if nothing is recorded.
+        """
+        self.values = np.zeros(max(capacity, len(values)), dtype=dtype)
+        self.values[:len(values)] = values
+        self.size = len(values)
+        self.last = self.values.item(self.size-1) if self.size > 0 else None
+
+    def reserve(self, num_steps: int) -> None:
+        """
+        Preallocates room for a known nbr. of additional entries.
+
+        num_steps : int
+            The nbr. of entries still to be recorded.
+        """
+        if self.size+num_steps > len(self.values):
+            self.resize(capacity=self.size+num_steps)
+
+    def resize(self, capacity: int) -> None:
+        """
+        Moves the recorded entries to a column of the given capacity.
+
+        capacity : int
+            The new nbr. of preallocated entries. At least size.
+        """
+        values = np.zeros(capacity, dtype=self.values.dtype)
+        values[:self.size] = self.values[:self.size]
+        self.values = values
+
+    def append(self, value) -> None:
+        """
+        Records one entry. Doubles the capacity if the column is full.
+
+        value
+            The value of the entry.
+        """
+        if self.size >= len(self.values):
+            self.resize(capacity=max(2*len(self.values), 1))
+
+        self.values[self.size] = value
+        self.size += 1
+        self.last = self.values.item(self.size-1)
+
+    def extend(self, values: np.ndarray) -> None:
+        """
+        Records several entries at once.
+
+        values : np.ndarray
+            The values of the entries, in order.
+        """
+        if len(values) <= 0:
+            return
+
+        self.reserve(len(values))
+        self.values[self.size:self.size+len(values)] = values
+        self.size += len(values)
+        self.last = self.values.item(self.size-1)
+
+    def pad(self, length: int, value) -> None:
+        """
+        Extends the series to the given length with a constant value.
+
+        length : int
+            The target length of the series.
+        value
+            The value of the appended entries.
+        """
+        if self.size >= length:
+            return
+
+        if length > len(self.values):
+            self.resize(capacity=max(2*len(self.values), length))
+
+        self.values[self.size:length] = value
+        self.size = length
+        self.last = self.values.item(self.size-1)
+
+    def view(self) -> np.ndarray:
+        """
+        Returns the recorded entries, without copying them.
+        """
+        return self.values[:self.size]
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self):
+        return iter(self.view())
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        if dtype != None:
+            return self.view().astype(dtype)
+
+        return self.view()
+
+    def __getitem__(self, key):
+        if isinstance(key, int) and key == -1 and self.size > 0:
+            return self.last
+
+        return self.view()[key]
+
+    def __setitem__(self, key, value) -> None:
+        self.view()[key] = value
+
+        if isinstance(key, int) and (key == -1 or key == self.size-1):
+            self.last = self.values.item(self.size-1)
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state["values"] = self.view().copy()
+
+        return state
+
+    def __repr__(self) -> str:
+        return "TimeSeries("+repr(self.view().tolist())+")"
@@ -0,0 +1,545 @@
+import math
+import subprocess
+import numpy as np
+import matplotlib
+import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+from matplotlib.transforms import Bbox
+from pathlib import Path
+from PIL import Image
+import NetworkSpec
+import Vehicle
+
+# The offset of each queue's label from the queue's head and its alignment, by travel direction.
+QUEUE_LABELS = {Vehicle.NORTH: ((40,-20), "right", "bottom"),
+                Vehicle.WEST: ((20,40), "right", "top"),
+                Vehicle.SOUTH: ((-40,20), "left", "top"),
+                Vehicle.EAST: ((-20,-40), "left", "bottom")}
+
+# The area [pt^2] of the traffic light markers.
+MARKER_SIZE = 36
+
+# The nbr. of characters of the elapsed time, e.g. '12345.6s'.
+TIME_LENGTH = 8
+
+# The nbr. of characters per line of the congestion sensed by adaptive traffic lights.
+CONGESTION_LENGTH = 16
+
+def padded(extent: (float,float,float,float)) -> (int,int,int,int):
+    """
+    Returns a display extent widened to whole pixels and by a pixel on each side, so that it also
+    covers the antialiased edges of what is drawn within it.
+
+    extent : (float,float,float,float)
+        The extent (x0, y0, x1, y1) [px].
+    """
+    x0, y0, x1, y1 = extent
+
+    return (math.floor(x0)-1, math.floor(y0)-1, math.ceil(x1)+1, math.ceil(y1)+1)
+
+def traffic_lights(network) -> list:
+    """
+    Returns the traffic lights of a network, the north-south and east-west traffic light of each
+    intersection in turn.
+
+    network : BaseModel.IntersectionNetworkSimulator
+        The network.
+    """
+    return [traffic_light for grid_ind in network.grid_inds for traffic_light in [network.intersections[grid_ind].traffic_light_ns, network.intersections[grid_ind].traffic_light_ew]]
+
+def queues(network) -> list:
+    """
+    Returns the queues of a network, the north-, west-, south- and eastbound queue of each
+    intersection in turn.
+
+    network : BaseModel.IntersectionNetworkSimulator
+        The network.
+    """
+    return [queue for grid_ind in network.grid_inds for queue in NetworkSpec.queues(network.intersections[grid_ind])]
+
+def vehicle_segments(network) -> np.ndarray:
+    """
+    Returns the head and tail position of each vehicle in a network.
+
+    network : BaseModel.IntersectionNetworkSimulator
+        The network.
+    """
+    return np.array([(vehicle.position, vehicle.tail_position) for vehicle in network.vehicles], dtype=float).reshape(-1,2,2)
+
+def congestion_text(traffic_light) -> str:
+    """
+    Returns the congestion sensed by an adaptive traffic light as shown by a Renderer: its first two
+    lines, cut off at CONGESTION_LENGTH characters.
+
+    traffic_light : TrafficLight.AdaptiveTrafficLight
+        The traffic light.
+    """
+    return "\n".join(line[:CONGESTION_LENGTH] for line in traffic_light.congestion_text().split("\n")[:2])
+
+def overlaps(extents: np.ndarray, rects: np.ndarray) -> np.ndarray:
+    """
+    Returns whether each extent overlaps each rectangle, as a boolean array indexed by (extent,
+    rectangle). Empty extents overlap nothing.
+
+    extents : np.ndarray
+        The extents (x0, y0, x1, y1) [px], one per row.
+    rects : np.ndarray
+        The rectangles (x0, y0, x1, y1) [px], one per row.
+    """
+    return ((extents[:,None,0] < rects[None,:,2]) & (rects[None,:,0] < extents[:,None,2])
+            & (extents[:,None,1] < rects[None,:,3]) & (rects[None,:,1] < extents[:,None,3]))
+
+class FrameWriter:
+    def __init__(self):
+        """
+        Writes RGBA frames to a video file: through an ffmpeg pipe, or with Pillow for .gif files.
+
+        file_name : Path
+            The video file.
+        frame_size : (int,int)
+            The width and height [px] of the frames.
+        fps : float
+            The nbr. of frames per second of video.
+        process : subprocess.Popen
+            The ffmpeg process the frames are piped to. None when writing a .gif.
+        images : [PIL.Image.Image]
+            The frames of a .gif, saved when the writer is closed.
+        """
+        self.file_name = None
+        self.frame_size = (0,0)
+        self.fps = 0.
+        self.process = None
+        self.images = []
+
+    def initialize(self, file_name: str, frame_size: (int,int), fps: float) -> None:
+        """
+        Initializes the FrameWriter instance and starts ffmpeg unless writing a .gif.
+
+        file_name : str
+            The video file. Its directory is created if missing.
+        frame_size : (int,int)
+            The width and height [px] of the frames.
+        fps : float
+            The nbr. of frames per second of video.
+        """
+        self.file_name = Path(file_name)
+        self.frame_size = frame_size
+        self.fps = fps
+        self.images = []
+
+        self.file_name.parent.mkdir(parents=True, exist_ok=True)
+
+        if self.file_name.suffix.lower() != ".gif":
+            # Odd frame sizes are padded, as the yuv420p pixel format needs even ones.
+            command = [matplotlib.rcParams["animation.ffmpeg_path"], "-y", "-loglevel", "error",
+                       "-f", "rawvideo", "-vcodec", "rawvideo", "-pix_fmt", "rgba",
+                       "-s", "{}x{}".format(*frame_size), "-r", str(fps), "-i", "-",
+                       "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", "-vcodec", "libx264", "-pix_fmt", "yuv420p",
+                       str(self.file_name)]
+            self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+
+    def write(self, frame) -> None:
+        """
+        Adds a frame.
+
+        frame : memoryview
+            The RGBA pixels of the frame, row by row.
+        """
+        if self.process != None:
+            self.process.stdin.write(frame)
+        else:
+            self.images += [Image.frombuffer("RGBA", self.frame_size, bytes(frame), "raw", "RGBA", 0, 1).convert("P")]
+
+    def close(self) -> None:
+        """
+        Finishes the video file.
+        """
+        if self.process != None:
+            self.process.stdin.close()
+            if self.process.wait() != 0:
+                raise RuntimeError("ffmpeg failed to write "+str(self.file_name)+".")
+            self.process = None
+        elif len(self.images) > 0:
+            self.images[0].save(self.file_name, save_all=True, append_images=self.images[1:], duration=1000/self.fps, loop=0)
+            self.images = []
+
+class Renderer:
+    def __init__(self):
+        """
+        Renders frames of a network with blitting. The roads are drawn once, a traffic light or label
+        is only redrawn when it changes, and all vehicles are drawn as a single LineCollection, so
+        that a frame costs a few draws however many vehicles there are.
+
+        The traffic light markers and labels are the items of the overlay. When items change, they
+        are redrawn along with every item they overlap, onto the roads. An item that overlaps no
+        other is kept as an image, which is copied back when it returns to an earlier text or color.
+        Texts that change every frame are drawn a character at a time, each clipped to its own
+        cell, so that only changed characters are redrawn.
+
+        network : BaseModel.IntersectionNetworkSimulator
+            The rendered network.
+        fig : matplotlib.figure.Figure
+            The figure.
+        ax : matplotlib.axes.Axes
+            The axes of the grid.
+        background : matplotlib.backends.backend_agg.BufferRegion
+            The rendered roads.
+        overlay : matplotlib.backends.backend_agg.BufferRegion
+            The rendered roads and items.
+        vehicles : matplotlib.collections.LineCollection
+            The vehicles.
+        traffic_lights : matplotlib.collections.PathCollection
+            The traffic light markers being drawn.
+        traffic_light_list : [TrafficLight.TrafficLight]
+            The traffic lights, two per intersection.
+        positions : np.ndarray
+            The position of each traffic light marker, two per traffic light in the order of
+            traffic_light_list. The markers are the first items.
+        queue_labels : [(BaseModel.QueueSimulator, matplotlib.text.Text)]
+            The label showing the length of each queue.
+        congestion_labels : [(TrafficLight.AdaptiveTrafficLight, [[matplotlib.text.Text]])]
+            The characters of the label showing the sensed congestion of each adaptive traffic
+            light, by line.
+        time_labels : [[matplotlib.text.Text]]
+            The characters of the elapsed time.
+        labels : [matplotlib.text.Text]
+            The labels, in the order of the items following the markers.
+        cells : dict
+            The display extent [px] of each character label, which it is clipped to.
+        contents : list
+            The service of each marker and the text of each label, as last drawn.
+        extents : np.ndarray
+            The display extent [px] of each item, as last drawn.
+        images : dict
+            The rendered items that overlap no other, keyed by (item, content).
+        """
+        self.network = None
+        self.fig = None
+        self.ax = None
+        self.background = None
+        self.overlay = None
+        self.vehicles = None
+        self.traffic_lights = None
+        self.traffic_light_list = []
+        self.positions = np.zeros((0,2))
+        self.queue_labels = []
+        self.congestion_labels = []
+        self.time_labels = []
+        self.labels = []
+        self.cells = dict()
+        self.contents = []
+        self.extents = np.zeros((0,4))
+        self.images = dict()
+
+    def initialize(self, network, fig_width=4, dpi=100) -> None:
+        """
+        Initializes the Renderer instance and draws the roads, traffic lights and labels.
+
+        network : BaseModel.IntersectionNetworkSimulator
+            The network to render.
+        fig_width : float (optional)
+            The width [in] of the figure. The height follows from the grid dimensions. Defaults to 4.
+        dpi : int (optional)
+            The resolution of the frames. Defaults to 100.
+        """
+        self.network = network
+        self.cells = dict()
+        self.images = dict()
+
+        fig_height = fig_width*network.grid_dimensions[0]/network.grid_dimensions[1]
+        self.fig, self.ax = network.initialize_plot((fig_width, fig_height), plt)
+        self.fig.set_dpi(dpi)
+
+        linewidth = 4.5/math.log(math.sqrt(5*len(network.grid_inds)))
+        self.vehicles = LineCollection([], colors="b", linewidths=linewidth, animated=True)
+        self.ax.add_collection(self.vehicles)
+
+        self.traffic_light_list = traffic_lights(network)
+        self.queue_labels = []
+
+        for queue in queues(network):
+            offset, ha, va = QUEUE_LABELS[queue.queue.direction]
+            position = (queue.queue.head_position[0]+offset[0], queue.queue.head_position[1]+offset[1])
+            self.queue_labels += [(queue, self.ax.text(position[0], position[1], "", ha=ha, va=va, animated=True))]
+
+        sensor_positions = [(traffic_light, (traffic_light.sensor_position[0]+12, traffic_light.sensor_position[1]-12)) for traffic_light in self.traffic_light_list if traffic_light.adaptive]
+        self.positions = np.array([position for traffic_light in self.traffic_light_list for position in traffic_light.positions], dtype=float).reshape(-1,2)
+        self.traffic_lights = self.ax.scatter(self.positions[:,0], self.positions[:,1], s=MARKER_SIZE, zorder=3, animated=True)
+
+        # Only the number of the elapsed time changes, so the rest is part of the background.
+        time_label = self.fig.text(0, 0.95, "Elapsed time: ", fontsize=14)
+        self.fig.canvas.draw()
+        time_position = (time_label.get_window_extent(self.fig.canvas.get_renderer()).x1, 0.95*self.frame_size()[1])
+
+        self.time_labels = self.character_labels(position=time_position, num_lines=1, num_characters=TIME_LENGTH, fontsize=14, va="baseline")
+        self.congestion_labels = [(traffic_light, self.character_labels(position=self.ax.transData.transform(position), num_lines=2, num_characters=CONGESTION_LENGTH, fontsize=8, va="top")) for traffic_light, position in sensor_positions]
+
+        self.labels = [label for queue, label in self.queue_labels]
+        for traffic_light, labels in self.congestion_labels:
+            self.labels += [label for line in labels for label in line]
+        self.labels += [label for line in self.time_labels for label in line]
+
+        self.fig.canvas.draw()
+        self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+
+        # Nothing is drawn yet, so that every item is drawn by the first update.
+        radius = (math.sqrt(MARKER_SIZE)+self.traffic_lights.get_linewidths()[0])/2*self.fig.dpi/72
+        self.extents = np.zeros((len(self.positions)+len(self.labels), 4))
+        self.extents[:len(self.positions)] = [padded((x-radius, y-radius, x+radius, y+radius)) for x, y in self.ax.transData.transform(self.positions)]
+        self.contents = [None]*len(self.extents)
+
+        self.overlay = self.background
+        self.update_overlay()
+
+    def character_labels(self, position: (float,float), num_lines: int, num_characters: int, fontsize: float, va: str) -> [[matplotlib.text.Text]]:
+        """
+        Returns a grid of single character labels in a monospace font, by line, each clipped to its
+        own cell.
+
+        position : (float,float)
+            The display position [px] of the first character.
+        num_lines : int
+            The nbr. of lines.
+        num_characters : int
+            The nbr. of characters per line.
+        fontsize : float
+            The font size.
+        va : str
+            The vertical alignment of the characters.
+        """
+        size = self.frame_size()
+        probe = self.fig.text(position[0]/size[0], position[1]/size[1], "0"*num_characters, fontsize=fontsize, family="monospace", va=va)
+        self.fig.canvas.draw()
+        extent = probe.get_window_extent(self.fig.canvas.get_renderer())
+        probe.remove()
+
+        width = extent.width/num_characters
+        line_height = math.ceil(1.2*fontsize*self.fig.dpi/72)
+        labels = []
+
+        for j in range(num_lines):
+            line = []
+            for i in range(num_characters):
+                label = self.fig.text((position[0]+i*width)/size[0], (position[1]-j*line_height)/size[1], "", fontsize=fontsize, family="monospace", va=va, animated=True)
+                cell = (round(extent.x0+i*width), math.floor(extent.y0)-j*line_height, round(extent.x0+(i+1)*width), math.floor(extent.y0)-(j-1)*line_height)
+                label.set_clip_box(Bbox.from_extents(*cell))
+                self.cells[label] = cell
+                line += [label]
+            labels += [line]
+
+        return labels
+
+    def frame_size(self) -> (int,int):
+        """
+        Returns the width and height [px] of the frames.
+        """
+        width, height = self.fig.canvas.get_width_height()
+
+        return (int(width), int(height))
+
+    def vehicle_segments(self) -> np.ndarray:
+        """
+        Returns the head and tail position of each vehicle to draw.
+        """
+        return vehicle_segments(self.network)
+
+    def state(self) -> (list, list, list, float):
+        """
+        Returns the state to draw: the service of each traffic light, the length of each queue,
+        the congestion text of each adaptive traffic light and the elapsed time.
+        """
+        services = [traffic_light.service for traffic_light in self.traffic_light_list]
+        queue_lengths = [queue.queue.queue_length for queue, label in self.queue_labels]
+        congestion_texts = [congestion_text(traffic_light) for traffic_light, labels in self.congestion_labels]
+
+        return services, queue_lengths, congestion_texts, self.network.time
+
+    def item_contents(self) -> list:
+        """
+        Returns the current service of each marker and text of each label.
+        """
+        services, queue_lengths, congestion_texts, time = self.state()
+
+        contents = [bool(service) for service in services for marker in range(2)]
+        contents += [str(queue_length) for queue_length in queue_lengths]
+
+        for (traffic_light, labels), text in zip(self.congestion_labels, congestion_texts):
+            contents += characters(labels, text.split("\n"))
+
+        contents += characters(self.time_labels, [str(round(time,1))+"s"])
+
+        return contents
+
+    def item_extent(self, item: int, content) -> (int,int,int,int):
+        """
+        Returns the display extent [px] of an item with some content.
+
+        item : int
+            The item.
+        content : bool or str
+            The service of a marker or the text of a label.
+        """
+        if item < len(self.positions):
+            return self.extents[item]
+
+        if content == "":
+            return (0,0,0,0)
+
+        label = self.labels[item-len(self.positions)]
+
+        if label in self.cells:
+            return self.cells[label]
+
+        if (item, content) in self.images:
+            return self.images[(item, content)][1]
+
+        label.set_text(content)
+
+        return padded(label.get_window_extent(self.fig.canvas.get_renderer()).extents)
+
+    def clear(self, extent: (int,int,int,int)) -> None:
+        """
+        Restores the roads within a display extent.
+
+        extent : (int,int,int,int)
+            The extent (x0, y0, x1, y1) [px], from the bottom left corner of the figure.
+        """
+        x0, y0, x1, y1 = extent
+
+        if x0 < x1 and y0 < y1:
+            # Regions are addressed from the top left corner of the figure, and include their last
+            # row and column.
+            height = self.fig.bbox.height
+            self.fig.canvas.restore_region(self.background, bbox=(x0, height-y1, x1-1, height-y0-1), xy=(0,0))
+
+    def draw_items(self, items: [int]) -> None:
+        """
+        Draws items with their current contents, the markers below the labels.
+
+        items : [int]
+            The items, in ascending order.
+        """
+        markers = [item for item in items if item < len(self.positions)]
+
+        if len(markers) > 0:
+            self.traffic_lights.set_offsets(self.positions[markers])
+            self.traffic_lights.set_facecolor(["green" if self.contents[item] else "red" for item in markers])
+            self.ax.draw_artist(self.traffic_lights)
+
+        renderer = self.fig.canvas.get_renderer()
+
+        for item in items[len(markers):]:
+            if self.contents[item] != "":
+                label = self.labels[item-len(self.positions)]
+                label.set_text(self.contents[item])
+                label.draw(renderer)
+
+    def update_overlay(self) -> None:
+        """
+        Redraws the items that have changed since the last frame, on top of the last overlay.
+        """
+        self.fig.canvas.restore_region(self.overlay)
+
+        contents = self.item_contents()
+        changed = [item for item, (content, last) in enumerate(zip(contents, self.contents)) if content != last]
+
+        if len(changed) == 0:
+            return
+
+        # Both where a changed item was drawn and where it will be drawn are cleared.
+        rects = [tuple(self.extents[item]) for item in changed]
+        owners = list(changed)
+
+        for item in changed:
+            self.contents[item] = contents[item]
+            self.extents[item] = self.item_extent(item, contents[item])
+
+        rects += [tuple(self.extents[item]) for item in changed]
+        owners += changed
+
+        # Whatever a cleared rectangle overlaps is redrawn, and so cleared as a whole in turn.
+        parents = {item: item for item in changed}
+        new_rects, new_owners = rects, owners
+
+        while len(new_rects) > 0:
+            items, inds = np.nonzero(overlaps(self.extents, np.array(new_rects, dtype=float)))
+            added = []
+
+            for item, ind in zip(items.tolist(), inds.tolist()):
+                if item not in parents:
+                    parents[item] = item
+                    added += [item]
+                union(parents, item, new_owners[ind])
+
+            new_rects = [tuple(self.extents[item]) for item in added]
+            new_owners = added
+            rects += new_rects
+            owners += new_owners
+
+        clusters = dict()
+        for item in sorted(parents):
+            clusters.setdefault(find(parents, item), []).append(item)
+
+        cluster_rects = dict()
+        for rect, owner in zip(rects, owners):
+            cluster_rects.setdefault(find(parents, owner), []).append(rect)
+
+        for root, items in clusters.items():
+            for rect in cluster_rects[root]:
+                self.clear(rect)
+
+            if len(items) == 1 and (items[0], self.contents[items[0]]) in self.images:
+                self.fig.canvas.restore_region(self.images[(items[0], self.contents[items[0]])][0])
+                continue
+
+            self.draw_items(items)
+
+            if len(items) == 1:
+                extent = tuple(int(i) for i in self.extents[items[0]])
+                self.images[(items[0], self.contents[items[0]])] = (self.fig.canvas.copy_from_bbox(Bbox.from_extents(*extent)), extent)
+
+        self.overlay = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+
+    def draw_frame(self):
+        """
+        Draws the current state of the network and returns the RGBA pixels of the frame.
+        """
+        self.update_overlay()
+
+        self.vehicles.set_segments(self.vehicle_segments())
+        self.ax.draw_artist(self.vehicles)
+
+        return self.fig.canvas.buffer_rgba()
+
+    def close(self) -> None:
+        plt.close(self.fig)
+
+def characters(labels: [[matplotlib.text.Text]], lines: [str]) -> [str]:
+    """
+    Returns the character of each character label showing some lines, see
+    Renderer.character_labels. Longer lines are cut off.
+
+    labels : [[matplotlib.text.Text]]
+        The character labels, by line.
+    lines : [str]
+        The lines.
+    """
+    lines = lines+[""]*(len(labels)-len(lines))
+
+    return [character.strip() for line_labels, line in zip(labels, lines) for character in line[:len(line_labels)].ljust(len(line_labels))]
+
+def find(parents: dict, item: int) -> int:
+    """
+    Returns the root of an item in a union-find forest.
+    """
+    while parents[item] != item:
+        parents[item] = parents[parents[item]]
+        item = parents[item]
+
+    return item
+
+def union(parents: dict, item: int, other: int) -> None:
+    """
+    Joins the trees of two items in a union-find forest.
+    """
+    parents[find(parents, item)] = find(parents, other)
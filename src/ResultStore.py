@@ -0,0 +1,364 @@
+import os
+import json
+import struct
+import zipfile
+import numpy as np
+from pathlib import Path
+
+MANIFEST = "manifest.json"
+VERSION = 1
+
+def column_name(path: tuple) -> str:
+    """
+    Returns the name of the column holding a nested output, e.g. '0,1/N/queue_length'.
+
+    path : tuple
+        The keys leading to the output. Grid indices are written as 'row,col'.
+    """
+    return "/".join(",".join(str(int(i)) for i in key) if isinstance(key, tuple) else str(key) for key in path)
+
+def column_path(name: str) -> tuple:
+    """
+    Returns the keys leading to the output held by a column, the inverse of column_name.
+
+    name : str
+        The name of the column.
+    """
+    return tuple(tuple(int(i) for i in key.split(",")) if "," in key else key for key in name.split("/"))
+
+def flatten(output: dict, path=()) -> dict:
+    """
+    Returns the values of a nested trial output, keyed by column name.
+
+    output : dict
+        The output of a trial, as returned by ModelEvaluation.trial_output.
+    """
+    columns = dict()
+
+    for key, value in output.items():
+        if isinstance(value, dict):
+            columns.update(flatten(value, path+(key,)))
+        else:
+            columns[column_name(path+(key,))] = value
+
+    return columns
+
+def memmap_member(file_name: Path, member: str):
+    """
+    Memory-maps an array stored uncompressed in an .npz file. Returns None if the array is
+    compressed and has to be read instead.
+
+    file_name : Path
+        The .npz file.
+    member : str
+        The name of the array's .npy file within the archive.
+    """
+    with zipfile.ZipFile(file_name) as archive:
+        info = archive.getinfo(member)
+
+    if info.compress_type != zipfile.ZIP_STORED:
+        return None
+
+    with open(file_name, "rb") as file:
+        file.seek(info.header_offset)
+        local_header = file.read(30)
+        name_length, extra_length = struct.unpack("<HH", local_header[26:30])
+        file.seek(info.header_offset+30+name_length+extra_length)
+
+        version = np.lib.format.read_magic(file)
+        if version == (1,0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(file)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(file)
+        offset = file.tell()
+
+    if dtype.hasobject or 0 in shape:
+        return None
+
+    return np.memmap(file_name, dtype=dtype, mode="r", shape=shape, order="F" if fortran_order else "C", offset=offset)
+
+class Column:
+    def __init__(self, shards: list, order=None):
+        """
+        A lazy view of a column stored in several shards, indexed like an array with a row per
+        trial. Only the rows indexed are read, and numpy functions read the whole column.
+
+        shards : list
+            The part of the column in each shard, memory-mapped where the shard is uncompressed.
+        offsets : np.ndarray
+            The row of the column at which each shard starts, followed by the nbr. of rows.
+        order : np.ndarray
+            The stored row of each row of the view, e.g. to sort the trials. None if they are
+            stored in order.
+        """
+        self.shards = shards
+        self.offsets = np.cumsum([0]+[len(array) for array in shards])
+        self.order = order
+
+    def __len__(self) -> int:
+        return int(self.offsets[-1])
+
+    @property
+    def shape(self) -> tuple:
+        if len(self.shards) == 0:
+            return (0,)
+
+        return (len(self),)+self.shards[0].shape[1:]
+
+    @property
+    def ndim(self) -> int:
+        return len(self.shape)
+
+    @property
+    def dtype(self) -> np.dtype:
+        if len(self.shards) == 0:
+            return np.dtype(float)
+
+        return self.shards[0].dtype
+
+    def __getitem__(self, index):
+        if not isinstance(index, tuple):
+            index = (index,)
+
+        rows = np.arange(len(self)) if self.order is None else self.order
+        rows = rows[index[0]]
+        other = index[1:]
+
+        if np.ndim(rows) == 0:
+            shard = int(np.searchsorted(self.offsets, rows, side="right"))-1
+            return self.shards[shard][(int(rows-self.offsets[shard]),)+other]
+
+        shard_inds = np.searchsorted(self.offsets, rows, side="right")-1
+
+        # A contiguous run of rows of a single shard is sliced, so that it stays memory-mapped.
+        if len(rows) > 0 and shard_inds[0] == shard_inds[-1] and np.all(np.diff(rows) == 1):
+            start = int(rows[0]-self.offsets[shard_inds[0]])
+            return self.shards[shard_inds[0]][(slice(start, start+len(rows)),)+other]
+
+        column = None
+
+        for shard in np.unique(shard_inds):
+            selected = shard_inds == shard
+            array = self.shards[shard][(rows[selected]-self.offsets[shard],)+other]
+
+            if column is None:
+                column = np.empty((len(rows),)+array.shape[1:], dtype=array.dtype)
+            column[selected] = array
+
+        if column is None:
+            return np.empty((0,)+self.shape[1:], dtype=self.dtype)[(slice(None),)+other]
+
+        return column
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+    def __array__(self, dtype=None, copy=None):
+        column = np.asarray(self[:])
+
+        return column if dtype is None else column.astype(dtype)
+
+class ResultStore:
+    def __init__(self):
+        """
+        An on-disk, columnar store of trial outputs. Trials are buffered and written in shards of
+        shard_size trials, each an .npz file with one array per column and a row per trial, and
+        a JSON manifest lists the shards written so far. A shard only enters the manifest once it is
+        completely written, so an interrupted evaluation keeps every finished shard.
+
+        directory : Path
+            The directory of the store.
+        manifest : dict
+            The metadata, the column names, the file name and trials of each shard and the number
+            of the next shard.
+        shard_size : int
+            The nbr. of trials per shard.
+        compress : bool
+            Whether shards are compressed. Uncompressed shards can be memory-mapped when read.
+        buffer : dict
+            The values of the trials not yet written, per column.
+        buffered_trials : [int]
+            The indices of the trials not yet written.
+        """
+        self.directory = None
+        self.manifest = dict()
+        self.shard_size = 1
+        self.compress = False
+        self.buffer = dict()
+        self.buffered_trials = []
+
+    def initialize(self, directory: str, metadata=dict(), shard_size=1, compress=False) -> None:
+        """
+        Creates a store, or reopens the store in the directory to append further trials.
+
+        directory : str
+            The directory of the store. Created if missing.
+        metadata : dict (optional)
+            JSON-serializable description of the evaluation. Defaults to an empty dict. Merged into
+            the existing metadata when reopening a store.
+        shard_size : int (optional)
+            The nbr. of trials per shard. Defaults to 1, which writes each trial as it finishes.
+        compress : bool (optional)
+            Whether to compress the shards. Defaults to False, so that they can be memory-mapped.
+        """
+        self.directory = Path(directory)
+        self.shard_size = shard_size
+        self.compress = compress
+        self.buffer = dict()
+        self.buffered_trials = []
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        if (self.directory / MANIFEST).exists():
+            self.read_manifest()
+            self.manifest["metadata"].update(metadata)
+        else:
+            self.manifest = {"version": VERSION, "metadata": dict(metadata), "columns": [], "shards": [], "next_shard": 0}
+
+        self.write_manifest()
+
+    def read_manifest(self) -> None:
+        with open(self.directory / MANIFEST, "r") as file:
+            self.manifest = json.load(file)
+
+    def write_manifest(self) -> None:
+        # Written to a temporary file first, so that a crash never leaves a partial manifest.
+        temporary = self.directory / (MANIFEST+".tmp")
+
+        with open(temporary, "w") as file:
+            json.dump(self.manifest, file, indent=1)
+
+        os.replace(temporary, self.directory / MANIFEST)
+
+    def append(self, trial: int, output: dict) -> None:
+        """
+        Adds the output of a trial, writing a shard once shard_size trials are buffered.
+
+        trial : int
+            The trial index.
+        output : dict
+            The output of the trial, as returned by ModelEvaluation.trial_output.
+        """
+        for name, value in flatten(output).items():
+            if name not in self.buffer:
+                self.buffer[name] = []
+            self.buffer[name] += [np.asarray(value)]
+
+        self.buffered_trials += [int(trial)]
+
+        if len(self.buffered_trials) >= self.shard_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Writes the buffered trials as a shard.
+        """
+        if len(self.buffered_trials) == 0:
+            return
+
+        file_name = "shard_{:05d}.npz".format(self.manifest["next_shard"])
+        arrays = {name: np.stack(values) for name, values in self.buffer.items()}
+        arrays["trial"] = np.array(self.buffered_trials)
+
+        temporary = self.directory / (file_name+".tmp")
+        with open(temporary, "wb") as file:
+            if self.compress:
+                np.savez_compressed(file, **arrays)
+            else:
+                np.savez(file, **arrays)
+        os.replace(temporary, self.directory / file_name)
+
+        self.manifest["columns"] = sorted(set(self.manifest["columns"]) | set(self.buffer))
+        self.manifest["shards"] += [{"file": file_name, "trials": self.buffered_trials}]
+        self.manifest["next_shard"] += 1
+        self.write_manifest()
+
+        self.buffer = dict()
+        self.buffered_trials = []
+
+    def metadata(self) -> dict:
+        return self.manifest["metadata"]
+
+    def columns(self) -> [str]:
+        """
+        Returns the names of the columns, see column_name.
+        """
+        return list(self.manifest["columns"])
+
+    def trials(self) -> [int]:
+        """
+        Returns the indices of the written trials, in the order of the rows of each column.
+        """
+        return [trial for shard in self.manifest["shards"] for trial in shard["trials"]]
+
+    def shard_arrays(self, name: str):
+        """
+        Yields a column shard by shard, memory-mapped where the shard is uncompressed.
+
+        name : str
+            The name of the column.
+        """
+        for shard in self.manifest["shards"]:
+            file_name = self.directory / shard["file"]
+            array = memmap_member(file_name, name+".npy")
+
+            if array is None:
+                with np.load(file_name) as shard_file:
+                    array = shard_file[name]
+
+            yield array
+
+    def column(self, name: str, sort=False) -> Column:
+        """
+        Returns a lazy view of a column, with a row per written trial, see Column. Nothing is read
+        until the view is indexed, and uncompressed shards are memory-mapped.
+
+        name : str
+            The name of the column.
+        sort : bool (optional)
+            Whether the rows are in ascending trial order rather than in the order of trials, as
+            trials of a pool finish out of order. Defaults to False.
+        """
+        order = None
+
+        if sort:
+            trials = np.array(self.trials(), dtype=int)
+            order = np.argsort(trials, kind="stable")
+
+            if np.all(order == np.arange(len(order))):
+                order = None
+
+        return Column(shards=list(self.shard_arrays(name)), order=order)
+
+    def consolidate(self) -> None:
+        """
+        Rewrites all shards as a single shard in ascending trial order, whose columns can then be
+        memory-mapped whole.
+        """
+        self.flush()
+        shards = self.manifest["shards"]
+
+        if len(shards) <= 1:
+            return
+
+        self.buffer = {name: list(self.column(name, sort=True)) for name in self.columns()}
+        self.buffered_trials = sorted(self.trials())
+        self.manifest["shards"] = []
+        self.flush()
+
+        for shard in shards:
+            (self.directory / shard["file"]).unlink()
+
+def load(directory: str) -> ResultStore:
+    """
+    Opens an existing store for reading. Shards are only read when a column is requested.
+
+    directory : str
+        The directory of the store.
+    """
+    store = ResultStore()
+    store.directory = Path(directory)
+    store.read_manifest()
+
+    return store
@@ -0,0 +1,176 @@
+import copy
+import itertools
+import numpy as np
+import RandomPool
+import NetworkSpec
+import ModelEvaluation
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import dill as pickle
+
+ARRIVAL_RATE = "arrival_rate"
+
+def configurations(grid: dict) -> list:
+    """
+    Returns every combination of the parameter values of a grid, as dicts from parameter name
+    to value, in the order of itertools.product over the grid.
+
+    grid : dict
+        The values of each parameter, e.g. {'period': [30, 60], 'green_ratio': [0.4, 0.5]}.
+    """
+    names = list(grid)
+
+    return [dict(zip(names, values)) for values in itertools.product(*[list(grid[name]) for name in names])]
+
+def configure(spec: NetworkSpec.NetworkSpec, parameters: dict) -> NetworkSpec.NetworkSpec:
+    """
+    Returns a copy of a spec with parameters set. 'arrival_rate' sets the arrival rate of every
+    queue entering the grid, and any other name the parameter of every traffic light that has it,
+    see NetworkSpec.NetworkSpec.set_traffic_light_parameter.
+
+    spec : NetworkSpec.NetworkSpec
+        The spec of the base network.
+    parameters : dict
+        The value of each parameter.
+    """
+    spec = copy.deepcopy(spec)
+
+    for name, value in parameters.items():
+        if name == ARRIVAL_RATE:
+            spec.set_arrival_rate(value)
+        else:
+            spec.set_traffic_light_parameter(name, value)
+
+    return spec
+
+class Sweep:
+    def __init__(self):
+        """
+        A parameter sweep, simulating a base network for every combination of parameter values.
+        The trials of all configurations share one process pool, so that workers move on to the
+        next configuration's trials instead of waiting for the slowest trial of each.
+
+        spec : NetworkSpec.NetworkSpec
+            The spec of the base network.
+        grid : dict
+            The values of each parameter, see configurations.
+        configurations : [dict]
+            Every combination of parameter values.
+        specs : [NetworkSpec.NetworkSpec]
+            The spec of each configuration.
+        evaluators : [ModelEvaluation.Evaluator]
+            The evaluator of each configuration.
+        """
+        self.spec = None
+        self.grid = dict()
+        self.configurations = []
+        self.specs = []
+        self.evaluators = []
+
+    def initialize(self, network, grid: dict) -> None:
+        """
+        Initializes the Sweep instance.
+
+        network : BaseModel.IntersectionNetworkSimulator or NetworkSpec.NetworkSpec
+            The base network, or its spec.
+        grid : dict
+            The values of each parameter: 'arrival_rate' and the arguments of the traffic lights'
+            initialize, e.g. 'period', 'green_ratio', 'time_delay', 'sensor_depth' and 'rule'.
+        """
+        if isinstance(network, NetworkSpec.NetworkSpec):
+            self.spec = network
+        else:
+            self.spec = NetworkSpec.from_network(network)
+
+        self.grid = dict(grid)
+        self.configurations = configurations(self.grid)
+        self.specs = [configure(self.spec, parameters) for parameters in self.configurations]
+        self.evaluators = []
+
+    def labels(self) -> list:
+        """
+        Returns the label of each configuration: its value for a single parameter, and the tuple of
+        its values otherwise.
+        """
+        if len(self.grid) == 1:
+            return [list(parameters.values())[0] for parameters in self.configurations]
+
+        return [tuple(parameters.values()) for parameters in self.configurations]
+
+    def variable(self) -> str:
+        """
+        Returns the names of the parameters, as the variable of the MultiEvaluator.
+        """
+        return ", ".join(self.grid)
+
+    def simulate(self, num_trials: int, end_time: float, delta_t: float, num_workers=1, seed=None, streaming=False) -> ModelEvaluation.MultiEvaluator:
+        """
+        Simulates every configuration num_trials times and returns a MultiEvaluator with an
+        averaged evaluator per configuration.
+
+        Every configuration gets the trial seeds that Evaluator.simulate gets for the same seed, so
+        that the configurations are compared on common random numbers and each evaluator holds the
+        output that simulating it alone would have given.
+
+        num_trials : int
+            The nbr. of trials per configuration.
+        end_time : float
+            The end time [s] of each trial.
+        delta_t : float
+            The time-step size.
+        num_workers : int (optional)
+            The nbr. of worker processes. Defaults to 1, which runs all trials in this process.
+        seed : int or np.random.SeedSequence (optional)
+            Seed from which each trial gets its own random streams. Defaults to None, in which case
+            the base network's seed is used if it has one, and fresh entropy otherwise.
+        streaming : bool (optional)
+            Whether the evaluators only keep the running statistics of the trials. Defaults to False.
+        """
+        if seed == None:
+            seed = self.spec.seed
+
+        trial_seeds = RandomPool.seed_sequence(seed).spawn(num_trials)
+        self.evaluators = []
+
+        for spec in self.specs:
+            evaluator = ModelEvaluation.Evaluator()
+            evaluator.num_trials = num_trials
+            evaluator.end_time = end_time
+            evaluator.delta_t = delta_t
+            evaluator.streaming = streaming
+            evaluator.initialize(network=spec.build())
+            self.evaluators += [evaluator]
+
+        spec_states = [pickle.dumps(spec) for spec in self.specs]
+        tasks = [(config, trial) for config in range(len(self.specs)) for trial in range(num_trials)]
+        num_finished = 0
+
+        if num_workers == 1:
+            for config, trial in tasks:
+                output = ModelEvaluation.run_trial(spec_states[config], trial_seeds[trial], end_time, delta_t)
+                self.evaluators[config].store_trial_output(trial=trial, output=output)
+                num_finished += 1
+
+                if num_finished % 10 == 0:
+                    print("Finished", num_finished, "of", len(tasks), "trials.")
+        else:
+            with ProcessPoolExecutor(max_workers=num_workers) as executor:
+                # Submitted one trial at a time, so that idle workers take whichever trial is next.
+                futures = {executor.submit(ModelEvaluation.run_trial, spec_states[config], trial_seeds[trial], end_time, delta_t): (config, trial) for config, trial in tasks}
+
+                for future in as_completed(futures):
+                    config, trial = futures[future]
+                    self.evaluators[config].store_trial_output(trial=trial, output=future.result())
+                    num_finished += 1
+
+                    if num_finished % 10 == 0:
+                        print("Finished", num_finished, "of", len(tasks), "trials.")
+
+        for evaluator in self.evaluators:
+            evaluator.compute_average()
+
+        print("Finished", len(tasks), "trials.")
+
+        multi_evaluator = ModelEvaluation.MultiEvaluator()
+        multi_evaluator.initialize(evaluators=self.evaluators, labels=self.labels(), variable=self.variable())
+
+        return multi_evaluator
@@ -1,18 +1,20 @@
 import numpy as np
 import random
 import Vehicle
+import Recorder
+import RandomPool
 import math
 
 class TrafficLight:
     def __init__(self):
         self.visuals = [None, None]
         self.service = False
-        self.service_history = [self.service]
+        self.service_history = Recorder.TimeSeries([self.service], dtype=float)
         self.positions = [(0,0), (0,0)]
         self.time = 0
         self.adaptive = False
-        self.num_cycles = [0]
-        self.switches = [0]
+        self.num_cycles = Recorder.TimeSeries()
+        self.switches = Recorder.TimeSeries([0], dtype=float)
         
     def time_step(self, delta_t: float) -> None:
         """
@@ -20,18 +22,49 @@ class TrafficLight:
         """
         self.time += delta_t
         self.service = self.saturation_rate()
-        self.service_history += [self.service]
+        self.service_history.append(self.service)
         
-        self.num_cycles += [self.num_cycles[-1]]
+        self.num_cycles.append(self.num_cycles[-1])
         
         switch = self.service - self.service_history[-2]
-        self.switches += [switch]
+        self.switches.append(switch)
         
         if switch < 0:
             self.num_cycles[-1] += 1
         
+    def can_skip(self) -> bool:
+        """
+        Returns whether the light's service only depends on time, so that several time-steps can be
+        run at once with skip.
+        """
+        return False
+        
+    def record_services(self, services: np.ndarray) -> None:
+        """
+        Records the services of several time-steps at once, as time_step records them one at a time.
+        
+        services : np.ndarray
+            The service after each time-step.
+        """
+        switches = np.diff(np.concatenate([[self.service_history[-1]], services]))
+        
+        self.service_history.extend(services)
+        self.switches.extend(switches)
+        self.num_cycles.extend(self.num_cycles[-1]+np.cumsum(switches < 0))
+        
+    def hold(self, num_steps: int) -> None:
+        """
+        Records time-steps without a switch, repeating the last recorded service.
+        
+        num_steps : int
+            The nbr. of time-steps to record.
+        """
+        self.service_history.pad(len(self.service_history)+num_steps, self.service_history[-1])
+        self.num_cycles.pad(len(self.num_cycles)+num_steps, self.num_cycles[-1])
+        self.switches.pad(len(self.switches)+num_steps, 0)
+        
     def red_to_green_stats(self):
-        switches = [service-prev_service for service,prev_service in zip(self.service_history+[0],[0]+self.service_history)][:-2]
+        switches = [service-prev_service for service,prev_service in zip(list(self.service_history)+[0],[0]+list(self.service_history))][:-2]
         
         res = [0]
         for switch in switches:
@@ -58,30 +91,50 @@ class TrafficLight:
                 vis.set_color('red')
                 
         if self.adaptive:
-            platoon_metrics = [(metric[0],round(metric[1],1)) for metric in self.platoon_metrics]
-            opposite_platoon_metrics = [(metric[0],round(metric[1],1)) for metric in self.opposite_platoon_metrics]
-            
-            congestion = ''
-            opposite_congestion = ''
-            
-            if self.congestion != None:
-                congestion = self.congestion
-                
-            if self.opposite_congestion != None:
-                opposite_congestion = self.opposite_congestion
-              
-            self.text.set_text(congestion+'\n'+opposite_congestion)
+            self.text.set_text(self.congestion_text())
                 
     def plot_green_light(self, ax, time):
         y_lim = ax.get_ylim()
         
         ax.fill_between(time, y_lim[0], y_lim[1], where=self.service_history[:len(time)], facecolor='g', alpha=0.2)
         
+    def time_until_switch(self) -> float:
+        """
+        Returns the time [s] until the light next changes on its own. Infinite if it never does.
+        """
+        return np.inf
+        
+    def reserve(self, num_steps: int) -> None:
+        """
+        Preallocates the recorded series for a known nbr. of additional time-steps.
+        
+        num_steps : int
+            The nbr. of time-steps still to be run.
+        """
+        self.service_history.reserve(num_steps)
+        self.num_cycles.reserve(num_steps)
+        self.switches.reserve(num_steps)
+        
+    def seed(self, seed_sequence) -> None:
+        """
+        Seeds the random stream of the traffic light. Lights without randomness ignore it.
+        
+        seed_sequence : np.random.SeedSequence
+            The seed sequence of the stream.
+        """
+        pass
+        
+    def parameters(self) -> dict:
+        """
+        Returns the arguments of initialize that give a traffic light of the same configuration.
+        """
+        return dict()
+        
     def reset(self):
         self.service = self.saturation_rate()
-        self.service_history = [self.service]
-        self.num_cycles = [0]
-        self.switches = [0]
+        self.service_history = Recorder.TimeSeries([self.service], dtype=float)
+        self.num_cycles = Recorder.TimeSeries()
+        self.switches = Recorder.TimeSeries([0], dtype=float)
         self.time = 0.
         
         return self
@@ -98,11 +151,11 @@ class TrafficLightMirror(TrafficLight):
         self.time = 0.
         self.visuals = [None, None]
         self.positions = [(0,0), (0,0)]
-        self.service = False
-        self.service_history = []
+        self._service = False
+        self._service_history = Recorder.TimeSeries([], dtype=float)
         self.adaptive = False
-        self.num_cycles = [0]
-        self.switches = [0]
+        self.num_cycles = Recorder.TimeSeries()
+        self.switches = Recorder.TimeSeries([0], dtype=float)
         
     def initialize(self, traffic_light: TrafficLight) -> None:
         """
@@ -112,8 +165,89 @@ class TrafficLightMirror(TrafficLight):
             The traffic light instance to mirror.
         """
         self.traffic_light = traffic_light
-        self.service = not traffic_light.service
-        self.service_history += [self.service]
+        self._service_history = None
+        
+    @property
+    def service(self) -> bool:
+        """
+        Whether the traffic light is at service. The initial service is only copied from the
+        mirrored light once it is first needed, as that light may not have drawn it yet.
+        """
+        if self._service_history is None:
+            self.copy_initial_service()
+            
+        return self._service
+    
+    @service.setter
+    def service(self, service: bool) -> None:
+        self._service = service
+        
+    @property
+    def service_history(self) -> Recorder.TimeSeries:
+        if self._service_history is None:
+            self.copy_initial_service()
+            
+        return self._service_history
+    
+    @service_history.setter
+    def service_history(self, service_history: Recorder.TimeSeries) -> None:
+        self._service_history = service_history
+        
+    def copy_initial_service(self) -> None:
+        """
+        Copies the initial service of the mirrored light, and restarts the service history from it.
+        """
+        self._service = not self.traffic_light.service
+        self._service_history = Recorder.TimeSeries([self._service], dtype=float)
+        
+    def __setstate__(self, state: dict) -> None:
+        # Mirrors pickled before the initial service was copied lazily hold it as plain attributes.
+        state = dict(state)
+        if "service" in state:
+            state["_service"] = state.pop("service")
+            state["_service_history"] = state.pop("service_history")
+            
+        self.__dict__.update(state)
+        
+    def parameters(self) -> dict:
+        """
+        Returns no arguments, as the mirrored traffic light is not part of the configuration.
+        """
+        return dict()
+        
+    def seed(self, seed_sequence) -> None:
+        """
+        Copies the initial service of the mirrored light again, as seeding may have redrawn it.
+        
+        seed_sequence : np.random.SeedSequence
+            Unused.
+        """
+        if self.traffic_light != None:
+            self.copy_initial_service()
+        
+    def can_skip(self) -> bool:
+        """
+        Returns whether the mirrored light can be skipped, see TrafficLight.can_skip.
+        """
+        return not isinstance(self.traffic_light, TrafficLightMirror) and self.traffic_light.can_skip()
+        
+    def skip(self, delta_ts: np.ndarray, lag=0) -> None:
+        """
+        Elapses several time-steps at once. The mirrored light must have been skipped over them already.
+        
+        delta_ts : np.ndarray
+            The time-step sizes.
+        lag : int (optional)
+            1 if this light is stepped before the mirrored one within a time-step, so that it sees the
+            mirrored light's service of the previous time-step. Defaults to 0.
+        """
+        history = self.traffic_light.service_history.view()
+        seen = history[len(history)-len(delta_ts)-lag:len(history)-lag]
+        services = (seen == 0).astype(float)
+        
+        self.time = Recorder.cumulative(self.time, delta_ts)[-1].item()
+        self.record_services(services)
+        self.service = services[-1].item()
         
     def saturation_rate(self, delta_t=0.):
         """
@@ -138,10 +272,10 @@ class PeriodicTrafficLight(TrafficLight):
         self.visuals = [None, None]
         self.positions = [(0,0), (0,0)]
         self.service = False
-        self.service_history = [self.service]
+        self.service_history = Recorder.TimeSeries([self.service], dtype=float)
         self.adaptive = False
-        self.num_cycles = [0]
-        self.switches = [0]
+        self.num_cycles = Recorder.TimeSeries()
+        self.switches = Recorder.TimeSeries([0], dtype=float)
         
     def initialize(self, period: float, time_delay: float, green_ratio=0.5) -> None:
         """
@@ -156,6 +290,12 @@ class PeriodicTrafficLight(TrafficLight):
         self.time_delay = time_delay
         self.green_ratio = green_ratio
         
+    def parameters(self) -> dict:
+        """
+        Returns the arguments of initialize that give a traffic light of the same configuration.
+        """
+        return {"period": self.period, "time_delay": self.time_delay, "green_ratio": self.green_ratio}
+        
     def saturation_rate(self, delta_t=0.) -> float:
         """
         Returns the saturation rate for a given time.
@@ -167,6 +307,37 @@ class PeriodicTrafficLight(TrafficLight):
             return 1
         else:
             return 0
+        
+    def can_skip(self) -> bool:
+        """
+        Returns True, as the service only depends on time, see TrafficLight.can_skip.
+        """
+        return True
+        
+    def skip(self, delta_ts: np.ndarray) -> None:
+        """
+        Elapses several time-steps at once, as repeated calls to time_step would.
+        
+        delta_ts : np.ndarray
+            The time-step sizes.
+        """
+        times = Recorder.cumulative(self.time, delta_ts)
+        services = ((((times-self.time_delay) % self.period)/self.period) < self.green_ratio).astype(float)
+        
+        self.time = times[-1].item()
+        self.record_services(services)
+        self.service = self.saturation_rate()
+        
+    def time_until_switch(self) -> float:
+        """
+        Returns the time [s] until the next green-to-red or red-to-green switch.
+        """
+        phase = ((self.time-self.time_delay) % self.period)/self.period
+        
+        if phase < self.green_ratio:
+            return (self.green_ratio-phase)*self.period
+        
+        return (1-phase)*self.period
             
 class MemoryLessTrafficLight(TrafficLight):
     def __init__(self):
@@ -179,17 +350,20 @@ class MemoryLessTrafficLight(TrafficLight):
             Probability of a red to green transition.
         time : float
             The current simulation time.
+        random_pool : RandomPool.RandomPool
+            The buffered random draws of the traffic light.
         """
-        self.service = bool(random.getrandbits(1))
-        self.service_history = [self.service]
+        self._service = None
+        self._service_history = None
         self.green_to_red_probability = 0.
         self.red_to_green_probability = 0.
         self.time = 0.
         self.visuals = [None, None]
         self.positions = [(0,0), (0,0)]
         self.adaptive = False
-        self.num_cycles = [0]
-        self.switches = [0]
+        self.num_cycles = Recorder.TimeSeries()
+        self.switches = Recorder.TimeSeries([0], dtype=float)
+        self.random_pool = RandomPool.RandomPool()
         
     def initialize(self, green_to_red_rate: float, red_to_green_rate: float) -> None:
         """
@@ -203,6 +377,69 @@ class MemoryLessTrafficLight(TrafficLight):
         self.green_to_red_rate = green_to_red_rate
         self.red_to_green_rate = red_to_green_rate
         
+    def parameters(self) -> dict:
+        """
+        Returns the arguments of initialize that give a traffic light of the same configuration.
+        """
+        return {"green_to_red_rate": self.green_to_red_rate, "red_to_green_rate": self.red_to_green_rate}
+        
+    @property
+    def service(self) -> bool:
+        """
+        Whether the traffic light is at service. The initial service is only drawn once it is first
+        needed, so that a light seeded before then never touches the global random state.
+        """
+        if self._service_history is None:
+            self.draw_initial_service()
+            
+        return self._service
+    
+    @service.setter
+    def service(self, service: bool) -> None:
+        self._service = service
+        
+    @property
+    def service_history(self) -> Recorder.TimeSeries:
+        if self._service_history is None:
+            self.draw_initial_service()
+            
+        return self._service_history
+    
+    @service_history.setter
+    def service_history(self, service_history: Recorder.TimeSeries) -> None:
+        self._service_history = service_history
+        
+    def draw_initial_service(self) -> None:
+        """
+        Draws the initial service, from the light's own stream if it is seeded and from the global
+        random state otherwise, and restarts the service history from it.
+        """
+        if self.random_pool.independent():
+            self._service = self.random_pool.random() < 0.5
+        else:
+            self._service = bool(random.getrandbits(1))
+            
+        self._service_history = Recorder.TimeSeries([self._service], dtype=float)
+        
+    def __setstate__(self, state: dict) -> None:
+        # Lights pickled before the initial service was drawn lazily hold it as plain attributes.
+        state = dict(state)
+        if "service" in state:
+            state["_service"] = state.pop("service")
+            state["_service_history"] = state.pop("service_history")
+            
+        self.__dict__.update(state)
+        
+    def seed(self, seed_sequence) -> None:
+        """
+        Draws from a stream of its own from now on, and draws the initial service from it.
+        
+        seed_sequence : np.random.SeedSequence
+            The seed sequence of the stream.
+        """
+        self.random_pool.seed(seed_sequence)
+        self.draw_initial_service()
+        
     def time_step(self, delta_t: float) -> None:
         """
         Elapses time by one time-step.
@@ -210,12 +447,12 @@ class MemoryLessTrafficLight(TrafficLight):
         delta_t : float
             Time-step size
         """
-        if self.service and random.random() < delta_t*self.green_to_red_rate:
+        if self.service and self.random_pool.random() < delta_t*self.green_to_red_rate:
             self.service = False
-        elif not self.service and random.random() < delta_t*self.red_to_green_rate:
+        elif not self.service and self.random_pool.random() < delta_t*self.red_to_green_rate:
             self.service = True
             
-        self.service_history += [self.service]
+        self.service_history.append(self.service)
         self.time += delta_t
             
     def saturation_rate(self, delta_t=0.) -> float:
@@ -225,6 +462,17 @@ class MemoryLessTrafficLight(TrafficLight):
         
         return self.service
     
+    def time_until_switch(self) -> float:
+        """
+        Returns a sampled time [s] until the next switch.
+        """
+        rate = self.green_to_red_rate if self.service else self.red_to_green_rate
+        
+        if rate > 0:
+            return self.random_pool.exponential(scale=1/rate)
+        
+        return np.inf
+    
 class AdaptiveTrafficLight(TrafficLight):
     global EMPTY, EMPTY_OTHER, EMPTY_MIDWAY, EMPTY_OTHER_MIDWAY, WAIT_FOR_VEHICLE, WAIT_FOR_OTHER_VEHICLE, IDLE
     
@@ -239,15 +487,15 @@ class AdaptiveTrafficLight(TrafficLight):
     def __init__(self):
         self.visuals = [None, None]
         self.service = False
-        self.service_history = [self.service]
+        self.service_history = Recorder.TimeSeries([self.service], dtype=float)
         self.positions = [(0,0), (0,0)]
         self.sensor_position = (0,0)
         self.time = 0
         self.adaptive = True
         self.objective_length = 0
         self.case = IDLE
-        self.num_cycles = [0]
-        self.switches = [0]
+        self.num_cycles = Recorder.TimeSeries()
+        self.switches = Recorder.TimeSeries([0], dtype=float)
         self.sensor_depth = 0
         self.rule = 0
         self.range = 50
@@ -264,6 +512,27 @@ class AdaptiveTrafficLight(TrafficLight):
         self.sensor_depth = sensor_depth
         self.rule = rule
         
+    def parameters(self) -> dict:
+        """
+        Returns the arguments of initialize that give a traffic light of the same configuration.
+        """
+        return {"sensor_depth": self.sensor_depth, "rule": self.rule}
+        
+    def congestion_text(self) -> str:
+        """
+        Returns the sensed congestion in each direction, as shown next to the traffic light.
+        """
+        congestion = ''
+        opposite_congestion = ''
+        
+        if self.congestion != None:
+            congestion = self.congestion
+            
+        if self.opposite_congestion != None:
+            opposite_congestion = self.opposite_congestion
+            
+        return congestion+'\n'+opposite_congestion
+        
     def distance_to_sensor(self, position: (float, float)):
         return math.hypot(position[0]-self.sensor_position[0], position[1]-self.sensor_position[1])
     
@@ -387,7 +656,7 @@ class AdaptiveTrafficLight(TrafficLight):
             opposite_platoon_metrics = []
             
             for i in range(1, len(vehicles)): #split into platoons
-                if (vehicles[i].direction == Vehicle.NORTH and vehicles[i-1].tail_position[1]-vehicles[i].position[1] <= vehicles[i].length) or (vehicles[i].direction == Vehicle.EAST and vehicles[i-1].tail_position[0]-vehicles[i].position[0] <= vehicles[i].length) or (vehicles[i].direction == Vehicle.SOUTH and vehicles[i].position[1]-vehicles[i-1].tail_position[1] <= vehicles[i].length) or (vehicles[i].direction == Vehicle.WEST and vehicles[i].position[0]-vehicles[i-1].tail_position[0] <= vehicles[i].length):
+                if (vehicles[i].heading == Vehicle.NORTH_CODE and vehicles[i-1].tail_position[1]-vehicles[i].position[1] <= vehicles[i].length) or (vehicles[i].heading == Vehicle.EAST_CODE and vehicles[i-1].tail_position[0]-vehicles[i].position[0] <= vehicles[i].length) or (vehicles[i].heading == Vehicle.SOUTH_CODE and vehicles[i].position[1]-vehicles[i-1].tail_position[1] <= vehicles[i].length) or (vehicles[i].heading == Vehicle.WEST_CODE and vehicles[i].position[0]-vehicles[i-1].tail_position[0] <= vehicles[i].length):
                     platoons[-1] += [vehicles[i]]
                 else:
                     platoons += [[vehicles[i]]]
@@ -399,7 +668,7 @@ class AdaptiveTrafficLight(TrafficLight):
             self.platoon_metrics = platoon_metrics
             
             for i in range(1, len(opposite_vehicles)):
-                if (opposite_vehicles[i].direction == Vehicle.NORTH and opposite_vehicles[i-1].tail_position[1]-opposite_vehicles[i].position[1] <= opposite_vehicles[i].length) or (opposite_vehicles[i].direction == Vehicle.EAST and opposite_vehicles[i-1].tail_position[0]-opposite_vehicles[i].position[0] <= opposite_vehicles[i].length) or (opposite_vehicles[i].direction == Vehicle.SOUTH and opposite_vehicles[i].position[1]-opposite_vehicles[i-1].tail_position[1] <= opposite_vehicles[i].length) or (opposite_vehicles[i].direction == Vehicle.WEST and opposite_vehicles[i].position[0]-opposite_vehicles[i-1].tail_position[0] <= opposite_vehicles[i].length):
+                if (opposite_vehicles[i].heading == Vehicle.NORTH_CODE and opposite_vehicles[i-1].tail_position[1]-opposite_vehicles[i].position[1] <= opposite_vehicles[i].length) or (opposite_vehicles[i].heading == Vehicle.EAST_CODE and opposite_vehicles[i-1].tail_position[0]-opposite_vehicles[i].position[0] <= opposite_vehicles[i].length) or (opposite_vehicles[i].heading == Vehicle.SOUTH_CODE and opposite_vehicles[i].position[1]-opposite_vehicles[i-1].tail_position[1] <= opposite_vehicles[i].length) or (opposite_vehicles[i].heading == Vehicle.WEST_CODE and opposite_vehicles[i].position[0]-opposite_vehicles[i-1].tail_position[0] <= opposite_vehicles[i].length):
                     opposite_platoons[-1] += [opposite_vehicles[i]]
                 else:
                     opposite_platoons += [[opposite_vehicles[i]]]
@@ -0,0 +1,541 @@
+import os
+import sys
+import json
+import argparse
+import math
+import shutil
+import subprocess
+import tempfile
+import dill as pickle
+import numpy as np
+import matplotlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from PIL import Image, ImageSequence
+import NetworkSpec
+import Renderer
+
+MANIFEST = "manifest.json"
+SPEC = "network.pkl"
+VERSION = 1
+
+def open_array(file_name: Path, dtype: np.dtype, shape: tuple, mode: str) -> np.ndarray:
+    """
+    Memory-maps a raw array file. Arrays without elements cannot be mapped and are returned as plain
+    arrays instead.
+
+    file_name : Path
+        The file.
+    dtype : np.dtype
+        The data type of the array.
+    shape : tuple
+        The shape of the array.
+    mode : str
+        The mode of np.memmap, 'r' or 'r+'.
+    """
+    if math.prod(shape) == 0:
+        return np.zeros(shape, dtype=dtype)
+
+    return np.memmap(file_name, dtype=dtype, mode=mode, shape=shape)
+
+class MemmapArray:
+    def __init__(self):
+        """
+        A growable array of rows, memory-mapped to a raw file. As for Recorder.TimeSeries, the
+        capacity doubles when the array is full: the file is then extended and mapped again.
+
+        file_name : Path
+            The file.
+        dtype : np.dtype
+            The data type of the rows.
+        row_shape : tuple
+            The shape of each row.
+        values : np.memmap
+            The mapped rows. Only the first size rows are recorded.
+        size : int
+            The nbr. of recorded rows.
+        """
+        self.file_name = None
+        self.dtype = np.dtype(float)
+        self.row_shape = ()
+        self.values = None
+        self.size = 0
+
+    def initialize(self, file_name: Path, dtype: np.dtype, row_shape=(), capacity=1024) -> None:
+        """
+        Initializes the MemmapArray instance, creating an empty file.
+
+        file_name : Path
+            The file. Overwritten if it exists.
+        dtype : np.dtype
+            The data type of the rows.
+        row_shape : tuple (optional)
+            The shape of each row. Defaults to (), i.e. scalar rows.
+        capacity : int (optional)
+            The initial nbr. of mapped rows. Defaults to 1024.
+        """
+        self.file_name = Path(file_name)
+        self.dtype = np.dtype(dtype)
+        self.row_shape = tuple(row_shape)
+        self.values = None
+        self.size = 0
+
+        open(self.file_name, "wb").close()
+        self.resize(capacity=max(capacity, 1))
+
+    def row_bytes(self) -> int:
+        return self.dtype.itemsize*math.prod(self.row_shape)
+
+    def resize(self, capacity: int) -> None:
+        """
+        Extends or truncates the file to the given nbr. of rows and maps it again.
+
+        capacity : int
+            The new nbr. of mapped rows. At least size.
+        """
+        if isinstance(self.values, np.memmap):
+            self.values.flush()
+        self.values = None
+
+        with open(self.file_name, "r+b") as file:
+            file.truncate(capacity*self.row_bytes())
+
+        self.values = open_array(self.file_name, dtype=self.dtype, shape=(capacity,)+self.row_shape, mode="r+")
+
+    def append(self, rows) -> None:
+        """
+        Records rows, doubling the capacity as needed.
+
+        rows : array_like
+            The rows, stacked along the first axis.
+        """
+        rows = np.asarray(rows, dtype=self.dtype)
+        rows = rows.reshape((len(rows),)+self.row_shape)
+
+        if self.size+len(rows) > len(self.values):
+            self.resize(capacity=max(2*len(self.values), self.size+len(rows)))
+
+        self.values[self.size:self.size+len(rows)] = rows
+        self.size += len(rows)
+
+    def flush(self) -> None:
+        if isinstance(self.values, np.memmap):
+            self.values.flush()
+
+    def close(self) -> None:
+        """
+        Truncates the file to the recorded rows and unmaps it.
+        """
+        self.flush()
+        self.values = None
+
+        with open(self.file_name, "r+b") as file:
+            file.truncate(self.size*self.row_bytes())
+
+class TrajectoryRecorder:
+    def __init__(self):
+        """
+        Records what a Renderer.Renderer draws of a network during a headless simulation: the head
+        and tail position of each vehicle, the service of each traffic light, the length of each
+        queue, the congestion sensed by each adaptive traffic light and the time. Each is appended
+        to a memory-mapped file in a directory, so that a recording longer than memory can be
+        rendered later, see render, at any resolution and without simulating again.
+
+        network : BaseModel.IntersectionNetworkSimulator
+            The recorded network.
+        directory : Path
+            The directory of the recording.
+        manifest : dict
+            The time-step size, frames per time-step, nbr. of frames and the data type and row shape
+            of each array.
+        traffic_lights : [TrafficLight.TrafficLight]
+            The traffic lights, in the order of Renderer.traffic_lights.
+        queues : [BaseModel.QueueSimulator]
+            The queues, in the order of Renderer.queues.
+        adaptive_traffic_lights : [TrafficLight.AdaptiveTrafficLight]
+            The adaptive traffic lights, in the same order.
+        arrays : dict
+            The MemmapArray of each recorded quantity. The vehicles of frame i are the rows
+            vehicle_offsets[i] to vehicle_offsets[i+1] of segments.
+        """
+        self.network = None
+        self.directory = None
+        self.manifest = dict()
+        self.traffic_lights = []
+        self.queues = []
+        self.adaptive_traffic_lights = []
+        self.arrays = dict()
+
+    def initialize(self, network, directory: str, delta_t: float, frame_interval=1) -> None:
+        """
+        Initializes the TrajectoryRecorder instance and creates the recording, along with the
+        configuration of the network to draw it on.
+
+        network : BaseModel.IntersectionNetworkSimulator
+            The network to record.
+        directory : str
+            The directory of the recording. Created if missing, and overwritten if it holds another
+            recording.
+        delta_t : float
+            The time-step size [s] of the simulation.
+        frame_interval : int (optional)
+            The nbr. of time-steps per recorded frame. Defaults to 1.
+        """
+        self.network = network
+        self.directory = Path(directory)
+        self.traffic_lights = Renderer.traffic_lights(network)
+        self.queues = Renderer.queues(network)
+        self.adaptive_traffic_lights = [traffic_light for traffic_light in self.traffic_lights if traffic_light.adaptive]
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        with open(self.directory / SPEC, "wb") as file:
+            pickle.dump(NetworkSpec.from_network(network), file)
+
+        shapes = {"time": (np.float64, ()),
+                  "services": (np.bool_, (len(self.traffic_lights),)),
+                  "queue_lengths": (np.int32, (len(self.queues),)),
+                  "congestion_texts": ("<U"+str(2*Renderer.CONGESTION_LENGTH+1), (len(self.adaptive_traffic_lights),)),
+                  "vehicle_offsets": (np.int64, ()),
+                  "segments": (np.float32, (2,2))}
+
+        self.arrays = dict()
+        for name, (dtype, row_shape) in shapes.items():
+            self.arrays[name] = MemmapArray()
+            self.arrays[name].initialize(file_name=self.directory / (name+".bin"), dtype=dtype, row_shape=row_shape)
+
+        self.arrays["vehicle_offsets"].append([0])
+
+        self.manifest = {"version": VERSION, "delta_t": delta_t, "frame_interval": frame_interval, "num_frames": 0,
+                         "arrays": {name: {"dtype": array.dtype.str, "row_shape": list(array.row_shape)} for name, array in self.arrays.items()}}
+        self.write_manifest()
+
+    def write_manifest(self) -> None:
+        # Written to a temporary file first, so that a crash never leaves a partial manifest.
+        temporary = self.directory / (MANIFEST+".tmp")
+
+        with open(temporary, "w") as file:
+            json.dump(self.manifest, file, indent=1)
+
+        os.replace(temporary, self.directory / MANIFEST)
+
+    def record(self) -> None:
+        """
+        Records the current state of the network as a frame.
+        """
+        segments = Renderer.vehicle_segments(self.network)
+
+        self.arrays["time"].append([self.network.time])
+        self.arrays["services"].append([[bool(traffic_light.service) for traffic_light in self.traffic_lights]])
+        self.arrays["queue_lengths"].append([[queue.queue.queue_length for queue in self.queues]])
+        self.arrays["congestion_texts"].append([[Renderer.congestion_text(traffic_light) for traffic_light in self.adaptive_traffic_lights]])
+        self.arrays["segments"].append(segments)
+        self.arrays["vehicle_offsets"].append([self.arrays["segments"].size])
+
+        self.manifest["num_frames"] += 1
+
+    def flush(self) -> None:
+        """
+        Writes the recorded frames to disk, so that they can be read while recording continues.
+        """
+        for array in self.arrays.values():
+            array.flush()
+
+        self.write_manifest()
+
+    def close(self) -> None:
+        """
+        Finishes the recording.
+        """
+        for array in self.arrays.values():
+            array.close()
+
+        self.write_manifest()
+
+class Recording:
+    def __init__(self):
+        """
+        A recording written by a TrajectoryRecorder, with its arrays memory-mapped.
+
+        directory : Path
+            The directory of the recording.
+        manifest : dict
+            See TrajectoryRecorder.manifest.
+        spec : NetworkSpec.NetworkSpec
+            The configuration of the recorded network.
+        time : np.ndarray
+            The time [s] of each frame.
+        services : np.ndarray
+            The service of each traffic light, indexed by (frame, traffic light).
+        queue_lengths : np.ndarray
+            The length of each queue, indexed by (frame, queue).
+        congestion_texts : np.ndarray
+            The congestion sensed by each adaptive traffic light, indexed by (frame, traffic light).
+        vehicle_offsets : np.ndarray
+            The first row of segments of each frame, followed by the nbr. of rows.
+        segments : np.ndarray
+            The head and tail position of the vehicles of every frame.
+        """
+        self.directory = None
+        self.manifest = dict()
+        self.spec = None
+        self.time = np.zeros(0)
+        self.services = np.zeros((0,0), dtype=bool)
+        self.queue_lengths = np.zeros((0,0), dtype=np.int32)
+        self.congestion_texts = np.zeros((0,0), dtype=str)
+        self.vehicle_offsets = np.zeros(1, dtype=np.int64)
+        self.segments = np.zeros((0,2,2), dtype=np.float32)
+
+    def num_frames(self) -> int:
+        return self.manifest["num_frames"]
+
+    def frame_segments(self, frame: int) -> np.ndarray:
+        """
+        Returns the head and tail position of each vehicle in a frame.
+
+        frame : int
+            The frame.
+        """
+        return self.segments[self.vehicle_offsets[frame]:self.vehicle_offsets[frame+1]]
+
+    def fps(self, speed=1) -> float:
+        """
+        Returns the nbr. of frames per second of video.
+
+        speed : float (optional)
+            Simulated seconds per second of video. Defaults to 1.
+        """
+        return speed/(self.manifest["frame_interval"]*self.manifest["delta_t"])
+
+    def network(self):
+        """
+        Returns a new network of the recorded configuration, to draw the frames on.
+        """
+        return self.spec.build()
+
+def load(directory: str) -> Recording:
+    """
+    Opens a recording, memory-mapping its arrays.
+
+    directory : str
+        The directory of the recording.
+    """
+    recording = Recording()
+    recording.directory = Path(directory)
+
+    with open(recording.directory / MANIFEST, "r") as file:
+        recording.manifest = json.load(file)
+
+    if recording.manifest["version"] != VERSION:
+        raise ValueError("Unsupported recording version "+str(recording.manifest["version"])+".")
+
+    with open(recording.directory / SPEC, "rb") as file:
+        recording.spec = pickle.load(file)
+
+    num_frames = recording.manifest["num_frames"]
+    offsets = open_array(recording.directory / "vehicle_offsets.bin", dtype=np.int64, shape=(num_frames+1,), mode="r")
+    sizes = {"vehicle_offsets": num_frames+1, "segments": int(offsets[-1])}
+
+    for name, array in recording.manifest["arrays"].items():
+        shape = (sizes.get(name, num_frames),)+tuple(array["row_shape"])
+        setattr(recording, name, open_array(recording.directory / (name+".bin"), dtype=np.dtype(array["dtype"]), shape=shape, mode="r"))
+
+    return recording
+
+class PlaybackRenderer(Renderer.Renderer):
+    def __init__(self):
+        """
+        Renders the frames of a recording rather than the current state of a network.
+
+        recording : Recording
+            The recording.
+        frame : int
+            The frame to draw.
+        """
+        super().__init__()
+        self.recording = None
+        self.frame = 0
+
+    def initialize(self, recording: Recording, fig_width=4, dpi=100, frame=0) -> None:
+        """
+        Initializes the PlaybackRenderer instance and draws the roads, traffic lights and labels.
+
+        recording : Recording
+            The recording to render.
+        fig_width : float (optional)
+            The width [in] of the figure. Defaults to 4.
+        dpi : int (optional)
+            The resolution of the frames. Defaults to 100.
+        frame : int (optional)
+            The first frame to draw. Defaults to 0.
+        """
+        self.recording = recording
+        self.frame = frame
+
+        super().initialize(network=recording.network(), fig_width=fig_width, dpi=dpi)
+
+    def vehicle_segments(self) -> np.ndarray:
+        return self.recording.frame_segments(self.frame)
+
+    def state(self) -> (list, list, list, float):
+        recording, frame = self.recording, self.frame
+
+        return recording.services[frame], recording.queue_lengths[frame], recording.congestion_texts[frame], recording.time[frame]
+
+    def draw_frame(self, frame: int):
+        """
+        Draws a frame of the recording and returns its RGBA pixels.
+
+        frame : int
+            The frame.
+        """
+        self.frame = frame
+
+        return super().draw_frame()
+
+def render_frames(directory: str, file_name: str, start: int, stop: int, fig_width=4, dpi=100, speed=1) -> None:
+    """
+    Renders a range of frames of a recording to a video file.
+
+    directory : str
+        The directory of the recording.
+    file_name : str
+        The video file, see Renderer.FrameWriter.
+    start : int
+        The first frame.
+    stop : int
+        The frame to stop before.
+    fig_width : float (optional)
+        The width [in] of the video. Defaults to 4.
+    dpi : int (optional)
+        The resolution of the video. Defaults to 100.
+    speed : float (optional)
+        Simulated seconds per second of video. Defaults to 1.
+    """
+    recording = load(directory)
+    renderer = PlaybackRenderer()
+    renderer.initialize(recording=recording, fig_width=fig_width, dpi=dpi, frame=start)
+    writer = Renderer.FrameWriter()
+    writer.initialize(file_name=file_name, frame_size=renderer.frame_size(), fps=recording.fps(speed))
+
+    try:
+        for frame in range(start, stop):
+            writer.write(renderer.draw_frame(frame))
+    finally:
+        writer.close()
+        renderer.close()
+
+def palette_frame(image: Image.Image) -> Image.Image:
+    """
+    Returns a frame read from a .gif as a palette image again. Frames of at most 256 colors, as
+    written by Renderer.FrameWriter, get a palette of their own colors rather than being quantized
+    again, so that joining .gif files keeps their colors.
+
+    image : PIL.Image.Image
+        The frame, in RGB.
+    """
+    colors = image.getcolors(256)
+
+    if colors == None:
+        return image.quantize()
+
+    palette = Image.new("P", (1,1))
+    palette.putpalette([value for count, color in colors for value in color])
+
+    return image.quantize(palette=palette, dither=Image.Dither.NONE)
+
+def concatenate(file_names: [Path], file_name: Path, fps: float) -> None:
+    """
+    Joins video files of the same format and frame size into one.
+
+    file_names : [Path]
+        The video files, in order.
+    file_name : Path
+        The joined video file.
+    fps : float
+        The nbr. of frames per second of video.
+    """
+    file_name = Path(file_name)
+
+    if file_name.suffix.lower() == ".gif":
+        images = []
+        for part in file_names:
+            with Image.open(part) as image:
+                images += [palette_frame(frame.convert("RGB")) for frame in ImageSequence.Iterator(image)]
+        images[0].save(file_name, save_all=True, append_images=images[1:], duration=1000/fps, loop=0)
+        return
+
+    # The clips share their encoding, so the concat demuxer joins them without re-encoding.
+    playlist = file_name.parent / (file_name.name+".txt")
+    with open(playlist, "w") as file:
+        for part in file_names:
+            file.write("file '"+str(Path(part).resolve())+"'\n")
+
+    try:
+        command = [matplotlib.rcParams["animation.ffmpeg_path"], "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", str(playlist), "-c", "copy", str(file_name)]
+        if subprocess.run(command).returncode != 0:
+            raise RuntimeError("ffmpeg failed to write "+str(file_name)+".")
+    finally:
+        playlist.unlink()
+
+def render(directory: str, file_name="simulation.mp4", output_destination="../data/vids/", fig_width=4, dpi=100, speed=1, num_workers=1) -> None:
+    """
+    Renders a recording to a video file. With several workers, the frames are split into one
+    contiguous chunk per worker, rendered to separate clips in parallel and then joined.
+
+    directory : str
+        The directory of the recording, see TrajectoryRecorder.
+    file_name : str (optional)
+        The video file, see Renderer.FrameWriter. Defaults to 'simulation.mp4'.
+    output_destination : str (optional)
+        The directory of the video. Defaults to '../data/vids/'.
+    fig_width : float (optional)
+        The width [in] of the video. Defaults to 4.
+    dpi : int (optional)
+        The resolution of the video. Defaults to 100.
+    speed : float (optional)
+        Simulated seconds per second of video. Defaults to 1.
+    num_workers : int (optional)
+        The nbr. of processes rendering in parallel. Defaults to 1.
+    """
+    recording = load(directory)
+    num_frames = recording.num_frames()
+    file_name = Path(output_destination) / file_name
+    file_name.parent.mkdir(parents=True, exist_ok=True)
+
+    num_chunks = max(min(num_workers, num_frames), 1)
+
+    if num_chunks == 1:
+        render_frames(directory=directory, file_name=file_name, start=0, stop=num_frames, fig_width=fig_width, dpi=dpi, speed=speed)
+        return
+
+    bounds = np.linspace(0, num_frames, num_chunks+1).round().astype(int).tolist()
+    parts = tempfile.mkdtemp(dir=file_name.parent)
+
+    try:
+        part_names = [Path(parts) / ("part_{:05d}".format(chunk)+file_name.suffix) for chunk in range(num_chunks)]
+        arguments = ([directory]*num_chunks, part_names, bounds[:-1], bounds[1:], [fig_width]*num_chunks, [dpi]*num_chunks, [speed]*num_chunks)
+
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            list(executor.map(render_frames, *arguments))
+
+        concatenate(file_names=part_names, file_name=file_name, fps=recording.fps(speed))
+    finally:
+        shutil.rmtree(parts)
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Renders a recording written by a headless simulation to a video file.")
+    parser.add_argument("directory", help="directory of the recording")
+    parser.add_argument("--file-name", default="simulation.mp4", help="video file, .mp4 or .gif")
+    parser.add_argument("--output-destination", default="../data/vids/", help="directory of the video")
+    parser.add_argument("--fig-width", type=float, default=4., help="width [in] of the video")
+    parser.add_argument("--dpi", type=int, default=100, help="resolution of the video")
+    parser.add_argument("--speed", type=float, default=1., help="simulated seconds per second of video")
+    parser.add_argument("--num-workers", type=int, default=1, help="processes rendering contiguous chunks of frames in parallel")
+    args = parser.parse_args(argv)
+
+    render(directory=args.directory, file_name=args.file_name, output_destination=args.output_destination, fig_width=args.fig_width, dpi=args.dpi, speed=args.speed, num_workers=args.num_workers)
+    print("Rendered", load(args.directory).num_frames(), "frames to", Path(args.output_destination) / args.file_name, file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -5,63 +5,98 @@ WEST = (-1,0)
 SOUTH = (0,-1)
 EAST = (1,0)
 
+# Integer codes of the travel directions, indexing DIRECTIONS and the turn tables.
+NORTH_CODE = 0
+WEST_CODE = 1
+SOUTH_CODE = 2
+EAST_CODE = 3
+NO_DIRECTION = 4
+
+DIRECTIONS = [NORTH, WEST, SOUTH, EAST]
+UNIT_VECTORS = DIRECTIONS+[(0,0)]
+# The coordinate each direction travels along, and its sign along that coordinate.
+AXES = [1, 0, 1, 0, 0]
+SIGNS = [1., -1., -1., 1., 0.]
+RIGHT_TURNS = [EAST_CODE, NORTH_CODE, WEST_CODE, SOUTH_CODE, NO_DIRECTION]
+LEFT_TURNS = [WEST_CODE, SOUTH_CODE, EAST_CODE, NORTH_CODE, NO_DIRECTION]
+DIRECTION_CODES = {direction: code for code, direction in enumerate(DIRECTIONS)}
+
+def direction_code(direction: (int, int)) -> int:
+    """
+    Returns the integer code of a travel direction, NO_DIRECTION if it is none of the four.
+
+    direction : (int, int)
+        The travel direction.
+    """
+    return DIRECTION_CODES.get(tuple(direction), NO_DIRECTION)
+
 class Vehicle:
+    # Slotted, as networks hold many vehicles and read their attributes every time-step. The tail
+    # position follows from the others, and the plotted line is kept by the network, see
+    # BaseModel.IntersectionNetworkSimulator.vehicle_visuals.
+    __slots__ = ("position", "heading", "destination", "full_speed", "speed", "length", "wait_time", "tot_wait_time")
+
     def __init__(self):
         self.position = (0,0) # upper left corner
-        self.direction = (0,0) # 4 possible directions
+        self.heading = NO_DIRECTION # code of one of 4 possible directions
         self.destination = None
         self.full_speed = 0.
         self.speed = 0. # [m/s]
         self.length = 0.
-        self.tail_position = (0,0)
         self.wait_time = 0.
         self.tot_wait_time = 0.
-        self.time = 0.
-        self.visual = None
         
+    @property
+    def tail_position(self) -> (float, float):
+        x_dir, y_dir = UNIT_VECTORS[self.heading]
+        return (self.position[0]-x_dir*self.length, self.position[1]-y_dir*self.length)
+
+    @property
+    def direction(self) -> (int, int):
+        return UNIT_VECTORS[self.heading]
+
+    @direction.setter
+    def direction(self, value: (int, int)) -> None:
+        self.heading = direction_code(value)
+
+    def __getstate__(self) -> dict:
+        return {name: getattr(self, name) for name in Vehicle.__slots__}
+
+    def __setstate__(self, state: dict) -> None:
+        # Vehicles pickled before they were slotted hold their direction as a tuple, along with
+        # their tail position, age and plotted line.
+        if "direction" in state:
+            state = dict(state)
+            state["heading"] = direction_code(state.pop("direction"))
+
+        for name, value in state.items():
+            if name in Vehicle.__slots__:
+                setattr(self, name, value)
+
     def initialize(self, position: (float, float), direction: (int, int), full_speed=14, length=5):
         self.position = position
-        self.direction = direction
+        self.heading = direction_code(direction)
         self.full_speed = full_speed
         self.speed = full_speed
         self.length = length
-        self.tail_position = (position[0]-direction[0]*length, position[1]-direction[1]*length)
         
     def update_position(self, new_position: (float, float)):
         self.position = new_position
-        self.tail_position = (self.position[0]-self.direction[0]*self.length, self.position[1]-self.direction[1]*self.length)
         
     def time_step(self, delta_t: float):
-        x = self.position[0]
-        x_dir = self.direction[0]
-        y = self.position[1]
-        y_dir = self.direction[1]
+        x, y = self.position
+        x_dir, y_dir = UNIT_VECTORS[self.heading]
         self.update_position(new_position=(x+x_dir*self.speed*delta_t, y+y_dir*self.speed*delta_t))
-        self.time += delta_t
         
         if self.speed <= 0:
             self.wait_time += delta_t
             self.tot_wait_time += delta_t
             
     def right_turn(self):
-        if self.direction == NORTH:
-            self.direction = EAST
-        elif self.direction == WEST:
-            self.direction = NORTH
-        elif self.direction == SOUTH:
-            self.direction = WEST
-        elif self.direction == EAST:
-            self.direction = SOUTH
+        self.heading = RIGHT_TURNS[self.heading]
     
     def left_turn(self):
-        if self.direction == NORTH:
-            self.direction = WEST
-        elif self.direction == WEST:
-            self.direction = SOUTH
-        elif self.direction == SOUTH:
-            self.direction = EAST
-        elif self.direction == EAST:
-            self.direction = NORTH
+        self.heading = LEFT_TURNS[self.heading]
             
     def stop(self) -> None:
         self.speed = 0
@@ -69,12 +104,13 @@ class Vehicle:
     def accelerate(self) -> None:
         self.speed = self.full_speed
         
-    def initialize_plot(self, plt, linewidth: float) -> None:
-        self.visual, = plt.plot([], [], 'b-', linewidth=linewidth)
+    def initialize_plot(self, plt, linewidth: float):
+        visual, = plt.plot([], [], 'b-', linewidth=linewidth)
+        return visual
         
-    def update_plot(self) -> None:
-        self.visual.set_data([self.position[0], self.tail_position[0]],[self.position[1], self.tail_position[1]])
+    def update_plot(self, visual) -> None:
+        visual.set_data([self.position[0], self.tail_position[0]],[self.position[1], self.tail_position[1]])
         
-    def remove_plot(self) -> None:
-        if self.visual != None:
-            self.visual.set_data(np.inf, np.inf)
\ No newline at end of file
+    def remove_plot(self, visual) -> None:
+        if visual != None:
+            visual.set_data(np.inf, np.inf)
\ No newline at end of file
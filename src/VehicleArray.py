@@ -0,0 +1,335 @@
+import numpy as np
+import math
+import itertools
+import Vehicle
+
+DIRECTIONS = Vehicle.DIRECTIONS
+NO_DIRECTION = Vehicle.NO_DIRECTION
+
+UNIT_VECTORS = np.array(Vehicle.UNIT_VECTORS, dtype=float)
+AXES = np.array(Vehicle.AXES)
+SIGNS = np.array(Vehicle.SIGNS)
+
+class VehicleArray:
+    def __init__(self):
+        """
+        The state of the vehicles moving between intersections, in preallocated rows, so that they
+        are moved, and checked for exits and arrivals to queues, with array operations.
+
+        Vehicles remain plain Vehicle.Vehicle instances throughout. While a vehicle is moving,
+        between entering the network or departing from a queue and arriving to the next queue or
+        leaving the network, its row is kept up to date and its position is written back to it
+        every time-step. While it is queued, its queue stops and starts it, so it is moved as a
+        Vehicle.Vehicle, but it is still moved along with the others, from its own position and
+        speed, and its row only keeps its position.
+
+        grid_inds : [(int,int)]
+            The grid indices of the network, in the order used by destination.
+        grid_ind_map : dict
+            Maps a grid index to its position in grid_inds.
+        rows : dict
+            The row of each vehicle within the network.
+        vehicles : [Vehicle.Vehicle]
+            The vehicle of each row. None for free rows.
+        size : int
+            Nbr. of rows in use, including free rows below the highest one in use.
+        num_added : int
+            Nbr. of vehicles added so far.
+        free : [int]
+            Free rows available for reuse.
+        queued : dict
+            The row of each queued vehicle within the network.
+        moving : np.ndarray(bool)
+            Whether the vehicle of each row is moving between intersections.
+        live : np.ndarray(int)
+            The rows of the moving vehicles, in the order they were added. None until needed after
+            a vehicle last started or stopped moving, see live_rows.
+        live_vehicles : [Vehicle.Vehicle]
+            The vehicles of the rows in live.
+        position : np.ndarray(float)
+            Head positions, shape (capacity, 2).
+        direction : np.ndarray(int)
+            Travel direction codes, indexing DIRECTIONS.
+        destination : np.ndarray(int)
+            Destination indices into grid_inds. -1 if outside the network.
+        sequence : np.ndarray(int)
+            The order in which the vehicles were added. Rows are reused, so moving vehicles are
+            visited in this order, as they are in the network's vehicle dict.
+        full_speed, speed, length : np.ndarray(float)
+            Per-vehicle counterparts of the Vehicle.Vehicle attributes.
+        """
+        self.grid_inds = []
+        self.grid_ind_map = dict()
+        self.rows = dict()
+        self.vehicles = []
+        self.size = 0
+        self.num_added = 0
+        self.free = []
+        self.queued = dict()
+        self.moving = np.zeros(0, dtype=bool)
+        self.live = None
+        self.live_vehicles = []
+        self.position = np.zeros((0,2))
+        self.direction = np.zeros(0, dtype=np.int8)
+        self.destination = np.zeros(0, dtype=np.int32)
+        self.sequence = np.zeros(0, dtype=np.int64)
+        self.full_speed = np.zeros(0)
+        self.speed = np.zeros(0)
+        self.length = np.zeros(0)
+
+    def initialize(self, grid_inds: [(int,int)], capacity=256) -> None:
+        """
+        Initializes the VehicleArray instance.
+
+        grid_inds : [(int,int)]
+            The grid indices within the network.
+        capacity : int (optional)
+            The initial nbr. of preallocated rows. Defaults to 256.
+        """
+        self.grid_inds = list(grid_inds)
+        self.grid_ind_map = {grid_ind: i for i,grid_ind in enumerate(self.grid_inds)}
+        self.rows = dict()
+        self.vehicles = [None]*capacity
+        self.size = 0
+        self.num_added = 0
+        self.free = []
+        self.queued = dict()
+        self.moving = np.zeros(capacity, dtype=bool)
+        self.live = None
+        self.live_vehicles = []
+        self.position = np.zeros((capacity,2))
+        self.direction = np.full(capacity, NO_DIRECTION, dtype=np.int8)
+        self.destination = np.full(capacity, -1, dtype=np.int32)
+        self.sequence = np.zeros(capacity, dtype=np.int64)
+        self.full_speed = np.zeros(capacity)
+        self.speed = np.zeros(capacity)
+        self.length = np.zeros(capacity)
+
+    def grow(self) -> None:
+        """
+        Doubles the nbr. of preallocated rows.
+        """
+        capacity = max(2*len(self.moving), 1)
+        extra = capacity-len(self.moving)
+
+        self.vehicles += [None]*extra
+        self.moving = np.concatenate([self.moving, np.zeros(extra, dtype=bool)])
+        self.position = np.concatenate([self.position, np.zeros((extra,2))])
+        self.direction = np.concatenate([self.direction, np.full(extra, NO_DIRECTION, dtype=np.int8)])
+        self.destination = np.concatenate([self.destination, np.full(extra, -1, dtype=np.int32)])
+        self.sequence = np.concatenate([self.sequence, np.zeros(extra, dtype=np.int64)])
+        self.full_speed = np.concatenate([self.full_speed, np.zeros(extra)])
+        self.speed = np.concatenate([self.speed, np.zeros(extra)])
+        self.length = np.concatenate([self.length, np.zeros(extra)])
+
+    def add(self, vehicle: Vehicle.Vehicle) -> None:
+        """
+        Allocates a row for a vehicle entering the network, moving toward its first queue.
+
+        vehicle : Vehicle.Vehicle
+            The vehicle.
+        """
+        if len(self.free) > 0:
+            row = self.free.pop()
+        else:
+            if self.size >= len(self.moving):
+                self.grow()
+            row = self.size
+            self.size += 1
+
+        self.rows[vehicle] = row
+        self.vehicles[row] = vehicle
+        self.sequence[row] = self.num_added
+        self.num_added += 1
+        self.launch(vehicle)
+
+    def launch(self, vehicle: Vehicle.Vehicle) -> None:
+        """
+        Copies the state of a vehicle that starts moving between intersections into its row.
+
+        vehicle : Vehicle.Vehicle
+            The vehicle.
+        """
+        row = self.rows[vehicle]
+
+        self.queued.pop(vehicle, None)
+        self.moving[row] = True
+        self.position[row] = vehicle.position
+        self.direction[row] = vehicle.heading
+        self.destination[row] = self.grid_ind_map.get(vehicle.destination, -1)
+        self.full_speed[row] = vehicle.full_speed
+        self.speed[row] = vehicle.speed
+        self.length[row] = vehicle.length
+        self.live = None
+
+    def land(self, vehicle: Vehicle.Vehicle) -> None:
+        """
+        Leaves a vehicle that has arrived to a queue to be updated by the queue.
+
+        vehicle : Vehicle.Vehicle
+            The vehicle.
+        """
+        row = self.rows[vehicle]
+
+        self.moving[row] = False
+        self.queued[vehicle] = row
+        self.live = None
+
+    def release(self, vehicle: Vehicle.Vehicle) -> None:
+        """
+        Frees the row of a vehicle that has left the network. The vehicle keeps its final state, as
+        it is written back every time-step.
+
+        vehicle : Vehicle.Vehicle
+            The vehicle.
+        """
+        row = self.rows.pop(vehicle)
+
+        self.queued.pop(vehicle, None)
+        self.moving[row] = False
+        self.vehicles[row] = None
+        self.free += [row]
+        self.live = None
+
+    def live_rows(self) -> (np.ndarray, list):
+        """
+        Returns the rows of the moving vehicles and the vehicles themselves, in the order they were
+        added. Kept until a vehicle starts or stops moving.
+        """
+        if self.live is None:
+            live = np.flatnonzero(self.moving[:self.size])
+            self.live = live[np.argsort(self.sequence[live], kind="stable")]
+            self.live_vehicles = [self.vehicles[row] for row in self.live.tolist()]
+
+        return self.live, self.live_vehicles
+
+    def scan(self, bounds: np.ndarray, tail_positions, delta_t: float) -> (list, list):
+        """
+        Returns the vehicles that have exited the network, and the moving vehicles within reach of
+        their destination queue's tail, each in the order they were added.
+
+        Queued vehicles can drive past the head of their queue without departing, so they are
+        checked for exits too, from their own positions.
+
+        bounds : np.ndarray
+            The exit coordinate for each direction code, along that direction's axis.
+        tail_positions : function
+            Returns the tail positions of the queues of the intersections at given indices into
+            grid_inds, shape (len(indices), 4, 2), indexed by direction code.
+        delta_t : float
+            The time-step size.
+        """
+        live, vehicles = self.live_rows()
+        exits = []
+        arriving = []
+
+        if len(live) > 0:
+            codes = self.direction[live]
+            axes = AXES[codes]
+            signs = SIGNS[codes]
+            positions = self.position[live]
+            heads = positions[np.arange(len(live)), axes]
+
+            # The tail is the head less the length along the vehicle's axis, as Vehicle.tail_position.
+            exiting = signs*(heads-signs*self.length[live]) > signs*bounds[codes]
+            exits = live[exiting]
+
+            destinations = self.destination[live]
+            candidates = np.flatnonzero(~exiting & (destinations >= 0) & (self.speed[live] > 0))
+
+            if len(candidates) > 0:
+                codes, axes, signs = codes[candidates], axes[candidates], signs[candidates]
+                # Only the intersections that vehicles are heading for are looked up.
+                indices, inverse = np.unique(destinations[candidates], return_inverse=True)
+                targets = tail_positions(indices)[inverse, codes]
+                offsets = targets-positions[candidates]
+                passed = np.where(signs*heads[candidates] > signs*targets[np.arange(len(candidates)), axes], -1., 1.)
+                distance = passed*np.hypot(offsets[:,0], offsets[:,1])
+                reach = 3 + self.full_speed[live[candidates]]*delta_t
+
+                # np.hypot and math.hypot can differ in the last bit, so rows within rounding
+                # distance of the reach are decided by the same expression as the scalar path.
+                within = distance < reach
+                for i in np.flatnonzero(np.abs(distance-reach) <= 1e-9*np.maximum(np.abs(reach), 1.)).tolist():
+                    within[i] = passed[i]*math.hypot(offsets[i,0], offsets[i,1]) < reach[i]
+
+                arriving = [vehicles[i] for i in candidates[within].tolist()]
+
+        if len(self.queued) > 0:
+            # Queued vehicles' positions were last written by time_step.
+            rows = np.fromiter(self.queued.values(), dtype=np.intp, count=len(self.queued))
+            codes = self.direction[rows]
+            signs = SIGNS[codes]
+            heads = self.position[rows, AXES[codes]]
+            exiting = rows[signs*(heads-signs*self.length[rows]) > signs*bounds[codes]]
+
+            if len(exiting) > 0:
+                exits = np.concatenate([exits, exiting]).astype(np.intp)
+                exits = exits[np.argsort(self.sequence[exits], kind="stable")]
+
+        return [self.vehicles[row] for row in np.asarray(exits, dtype=int).tolist()], arriving
+
+    def time_until_reach(self, tail_positions, bounds: np.ndarray) -> float:
+        """
+        Returns the time [s] until the first moving vehicle comes within 3 m of its destination
+        queue's tail or, if it is leaving the network, passes the exit coordinate. Distances are
+        measured along the vehicles' axes. Infinite if no vehicle is moving.
+
+        tail_positions : function
+            Returns the tail positions of the queues of the intersections at given indices into
+            grid_inds, shape (len(indices), 4, 2), indexed by direction code.
+        bounds : np.ndarray
+            The exit coordinate for each direction code, along that direction's axis.
+        """
+        live, vehicles = self.live_rows()
+        live = live[self.direction[live] != NO_DIRECTION]
+
+        if len(live) <= 0:
+            return np.inf
+
+        codes = self.direction[live]
+        destinations = self.destination[live]
+        axes = AXES[codes]
+        signs = SIGNS[codes]
+        heads = self.position[live, axes]
+
+        entering = destinations >= 0
+        targets = signs*bounds[codes]
+        indices, inverse = np.unique(destinations[entering], return_inverse=True)
+        targets[entering] = signs[entering]*tail_positions(indices)[inverse, codes[entering], axes[entering]]-3
+        positions = np.where(entering, heads, heads-signs*self.length[live])
+
+        return float(np.min((targets-signs*positions)/self.full_speed[live]))
+
+    def time_step(self, delta_t: float) -> None:
+        """
+        Moves all vehicles by one time-step and writes their positions back to them. The queued
+        vehicles are moved from their own positions and speeds, as their queues set them.
+
+        delta_t : float
+            The time-step size.
+        """
+        live, vehicles = self.live_rows()
+        rows = live
+        speed = self.speed[live]
+        positions = self.position[live]
+
+        if len(self.queued) > 0:
+            queued = list(self.queued)
+            vehicles = vehicles+queued
+            rows = np.concatenate([live, np.fromiter(self.queued.values(), dtype=np.intp, count=len(queued))])
+            speed = np.concatenate([speed, np.fromiter([vehicle.speed for vehicle in queued], dtype=float, count=len(queued))])
+            positions = np.concatenate([positions, np.fromiter(itertools.chain.from_iterable([vehicle.position for vehicle in queued]), dtype=float, count=2*len(queued)).reshape(-1,2)])
+
+        if len(rows) <= 0:
+            return
+
+        positions = positions+UNIT_VECTORS[self.direction[rows]]*speed[:,None]*delta_t
+        self.position[rows] = positions
+
+        for vehicle, (x, y) in zip(vehicles, positions.tolist()):
+            vehicle.position = (x, y)
+
+        for i in np.flatnonzero(speed <= 0).tolist():
+            vehicles[i].wait_time += delta_t
+            vehicles[i].tot_wait_time += delta_t
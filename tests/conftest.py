@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The modules import each other by name from src/, as the notebooks do.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
@@ -0,0 +1,82 @@
+import math
+import numpy as np
+import Model1
+import Vehicle
+
+def edge_queue(arrival_rate, seed: int) -> Model1.PoissonQueueSimulator:
+    queue = Model1.PoissonQueueSimulator()
+    queue.initialize(avg_departure_time=2, arrival_rate=arrival_rate, direction=Vehicle.NORTH, head_position=(0.,0.))
+    queue.random_pool.seed(np.random.SeedSequence(seed))
+
+    return queue
+
+def thinned_arrivals(arrival_rate, seed: int, end_time: float, delta_t: float) -> int:
+    """
+    Returns the nbr. of arrivals of a Model1 queue that is never served.
+    """
+    queue = edge_queue(arrival_rate, seed)
+
+    for step in range(int(end_time/delta_t)):
+        queue.run_event(delta_t=delta_t, saturation_rate=0.)
+
+    return queue.arrivals[-1]
+
+def cdf_arrivals(arrival_rate, rng: np.random.Generator, end_time: float, delta_t: float) -> int:
+    """
+    Returns the nbr. of arrivals of the process that Model1 used to draw every time-step: an
+    arrival once expon.cdf(time_since_arrival, scale=1/rate), written out below, exceeds a uniform
+    draw.
+    """
+    arrivals = 0
+    time = 0.
+    time_since_arrival = 0.
+    random_variable = rng.random()
+
+    for step in range(int(end_time/delta_t)):
+        rate = arrival_rate(time)
+
+        if rate > 0 and random_variable < -math.expm1(-rate*time_since_arrival):
+            arrivals += 1
+            time_since_arrival = 0.
+            random_variable = rng.random()
+
+        time += delta_t
+        time_since_arrival += delta_t
+
+    return arrivals
+
+def assert_same_mean(counts, reference_counts) -> None:
+    # Two-sample z-test at about four standard errors, so that it fails by chance very rarely.
+    counts = np.asarray(counts, dtype=float)
+    reference_counts = np.asarray(reference_counts, dtype=float)
+    standard_error = math.sqrt(np.var(counts, ddof=1)/len(counts)+np.var(reference_counts, ddof=1)/len(reference_counts))
+
+    assert abs(np.mean(counts)-np.mean(reference_counts)) < 4*standard_error
+
+def test_constant_rate_matches_cdf_process():
+    rate = lambda t: 0.2
+    rng = np.random.default_rng(0)
+    counts = [thinned_arrivals(rate, seed, end_time=300, delta_t=0.1) for seed in range(100)]
+    reference_counts = [cdf_arrivals(rate, rng, end_time=300, delta_t=0.1) for trial in range(100)]
+
+    assert_same_mean(counts, reference_counts)
+
+def test_varying_rate_matches_cdf_process():
+    rate = lambda t: 0.1+0.1*math.sin(2*math.pi*t/200)
+    rng = np.random.default_rng(1)
+    counts = [thinned_arrivals(rate, seed, end_time=400, delta_t=0.5) for seed in range(100)]
+    reference_counts = [cdf_arrivals(rate, rng, end_time=400, delta_t=0.5) for trial in range(100)]
+
+    assert_same_mean(counts, reference_counts)
+
+def test_arrivals_resume_after_a_window_without_any():
+    start = 2.5*Model1.ARRIVAL_RATE_WINDOW
+    queue = edge_queue(lambda t: 0.5 if t >= start else 0., seed=2)
+    delta_t = 5.
+
+    for step in range(int(3*Model1.ARRIVAL_RATE_WINDOW/delta_t)):
+        queue.run_event(delta_t=delta_t, saturation_rate=0.)
+
+    arrivals = queue.arrivals.view()
+    assert arrivals[int(start/delta_t)] == 0
+    assert arrivals[-1] > 0
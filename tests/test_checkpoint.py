@@ -0,0 +1,20 @@
+import Benchmark
+
+def stats(network) -> str:
+    return repr([network.avg_wait_time, network.tot_wait_time, network.get_stats()])
+
+def test_resumed_run_matches_uninterrupted_run(tmp_path):
+    for model in ["Model1", "Model2"]:
+        for light in ["periodic", "adaptive_2", "memoryless"]:
+            network = Benchmark.build_network(model=model, grid_dimensions=(3,3), light=light, arrival_rate=0.1, seed=4)
+            network.simulate(delta_t=0.1, end_time=60)
+
+            interrupted = Benchmark.build_network(model=model, grid_dimensions=(3,3), light=light, arrival_rate=0.1, seed=4)
+            interrupted.simulate(delta_t=0.1, end_time=30)
+            interrupted.save_checkpoint("checkpoint.pkl", output_destination=tmp_path)
+
+            resumed = Benchmark.build_network(model=model, grid_dimensions=(3,3), light=light, arrival_rate=0.1, seed=4)
+            resumed.load_checkpoint("checkpoint.pkl", destination=tmp_path)
+            resumed.simulate(delta_t=0.1, end_time=60)
+
+            assert stats(resumed) == stats(network), (model, light)
@@ -0,0 +1,40 @@
+import pytest
+import Benchmark
+import DiscreteEventModel
+import NetworkSpec
+from test_arrivals import assert_same_mean
+
+def event_network(network) -> DiscreteEventModel.IntersectionNetworkSimulator:
+    """
+    Returns a discrete-event network of the same configuration and seed as a time-stepped one.
+    """
+    spec = NetworkSpec.from_network(network)
+    spec.network_type = DiscreteEventModel.IntersectionNetworkSimulator
+    spec.intersection_type = DiscreteEventModel.FourWayIntersectionSimulator
+
+    return spec.build()
+
+def test_kpis_match_time_stepped_model():
+    # Only KPIs of whole trips are compared. The time-stepped queues take vehicles in while they
+    # still roll up to the stop line, so they count more vehicles as queued.
+    # Memoryless lights draw their switch times from the random pool in both simulations.
+    for light in ["periodic", "memoryless"]:
+        wait_times = {"tick": [], "event": []}
+        exits = {"tick": [], "event": []}
+
+        for seed in range(6):
+            network = Benchmark.build_network(model="Model1", grid_dimensions=(3,3), light=light, arrival_rate=0.05, seed=seed)
+
+            for key, simulated in [("tick", network), ("event", event_network(network))]:
+                simulated.simulate(delta_t=0.1, end_time=600)
+                wait_times[key] += [simulated.avg_wait_time]
+                exits[key] += [simulated.exits[-1]]
+
+        assert_same_mean(wait_times["event"], wait_times["tick"])
+        assert_same_mean(exits["event"], exits["tick"])
+
+def test_model2_queues_are_rejected():
+    network = Benchmark.build_network(model="Model2", grid_dimensions=(3,3), light="periodic", arrival_rate=0.05, seed=0)
+
+    with pytest.raises(ValueError, match="Model1 queues"):
+        event_network(network).simulate(delta_t=0.1, end_time=10)
@@ -0,0 +1,71 @@
+import numpy as np
+import Benchmark
+import ModelEvaluation
+
+def evaluator(grid_dimensions=(2,2), light="periodic") -> ModelEvaluation.Evaluator:
+    network = Benchmark.build_network(model="Model1", grid_dimensions=grid_dimensions, light=light, arrival_rate=0.1, seed=0)
+    evaluator = ModelEvaluation.Evaluator()
+    evaluator.initialize(network)
+
+    return evaluator
+
+def assert_same_output(output, reference) -> None:
+    # Compares every value exactly, where repr would summarize long series.
+    if isinstance(reference, dict):
+        assert output.keys() == reference.keys()
+
+        for key in reference:
+            assert_same_output(output[key], reference[key])
+    else:
+        assert np.array_equal(output, reference, equal_nan=True)
+
+def test_output_does_not_depend_on_num_workers():
+    single = evaluator()
+    single.simulate(num_trials=4, end_time=30, delta_t=0.1, seed=3, num_workers=1)
+    pooled = evaluator()
+    pooled.simulate(num_trials=4, end_time=30, delta_t=0.1, seed=3, num_workers=3)
+
+    assert_same_output(pooled.output, single.output)
+
+def test_running_statistics_match_numpy():
+    values = np.random.default_rng(0).normal(loc=5, scale=3, size=(20, 7))
+
+    for rows in [values, values[:,0]]:
+        # One trial at a time (Welford), and in batches merged with them (Chan et al.).
+        statistics = ModelEvaluation.RunningStatistics()
+        batch_statistics = ModelEvaluation.RunningStatistics()
+
+        for row in rows:
+            statistics.update(row)
+
+        batch_statistics.update(rows[0])
+        batch_statistics.update_batch(rows[1:8])
+        batch_statistics.update_batch(rows[8:9])
+        batch_statistics.update_batch(rows[9:])
+
+        for running in [statistics, batch_statistics]:
+            assert running.count == len(rows)
+            assert np.allclose(running.mean, np.mean(rows, axis=0))
+            assert np.allclose(running.variance(), np.var(rows, axis=0, ddof=1))
+            assert np.array_equal(running.min, np.min(rows, axis=0))
+            assert np.array_equal(running.max, np.max(rows, axis=0))
+
+def test_streaming_matches_kept_trials():
+    kept = evaluator()
+    kept.simulate(num_trials=5, end_time=30, delta_t=0.1, seed=2)
+    streamed = evaluator()
+    streamed.simulate(num_trials=5, end_time=30, delta_t=0.1, seed=2, streaming=True)
+
+    for output, statistics in [(kept.output["avg_wait_time"], streamed.statistics["avg_wait_time"]),
+                               (kept.output[(0,1)]["tot_switches_ns"], streamed.statistics[(0,1)]["tot_switches_ns"]),
+                               (kept.output[(1,0)]["num_queued_vehicles"], streamed.statistics[(1,0)]["num_queued_vehicles"]),
+                               (kept.output[(1,1)]["E"]["queue_length"], streamed.statistics[(1,1)]["E"]["queue_length"])]:
+        assert np.allclose(statistics.mean, np.mean(output, axis=0))
+        assert np.allclose(statistics.variance(), np.var(output, axis=0, ddof=1), equal_nan=True)
+
+    average = kept.compute_average()
+    streamed_average = streamed.compute_average()
+
+    assert np.isclose(streamed_average["avg_wait_time"], average["avg_wait_time"])
+    assert np.isclose(streamed_average[(1,1)]["avg_queue_length"], average[(1,1)]["avg_queue_length"])
+    assert np.allclose(streamed_average[(1,1)]["N"]["queue_length"], average[(1,1)]["N"]["queue_length"])
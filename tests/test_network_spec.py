@@ -0,0 +1,19 @@
+import Benchmark
+import NetworkSpec
+
+def stats(network) -> str:
+    return repr([network.avg_wait_time, network.tot_wait_time, network.get_stats()])
+
+def test_built_network_matches_original():
+    for model in Benchmark.MODELS:
+        for light in Benchmark.TRAFFIC_LIGHTS:
+            network = Benchmark.build_network(model=model, grid_dimensions=(2,3), light=light, arrival_rate=0.2, seed=3)
+            spec = NetworkSpec.from_network(network)
+            # Seeded explicitly, and by the seed the spec took over from the network.
+            built_networks = [spec.build(seed=3), spec.build()]
+
+            for simulated in [network]+built_networks:
+                simulated.simulate(delta_t=0.1, end_time=40)
+
+            for built in built_networks:
+                assert stats(built) == stats(network), (model, light)
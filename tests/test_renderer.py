@@ -0,0 +1,54 @@
+import numpy as np
+import Benchmark
+import Renderer
+
+def full_redraw(network, fig_width: float, dpi: float) -> np.ndarray:
+    """
+    Returns the RGBA pixels of a frame drawn in a single draw of the whole figure, without blitting.
+    """
+    renderer = Renderer.Renderer()
+    renderer.initialize(network=network, fig_width=fig_width, dpi=dpi)
+    contents = renderer.item_contents()
+    services = np.array(contents[:len(renderer.positions)], dtype=bool)
+
+    # Agg snaps markers to pixels when a collection has a single color, as the markers that are
+    # blitted one at a time have, so the markers are drawn as one collection per color.
+    renderer.traffic_lights.remove()
+    for service, color in [(True, "green"), (False, "red")]:
+        if np.any(services == service):
+            renderer.ax.scatter(renderer.positions[services == service,0], renderer.positions[services == service,1], s=Renderer.MARKER_SIZE, zorder=3, color=color)
+
+    for label, content in zip(renderer.labels, contents[len(renderer.positions):]):
+        label.set_text(content)
+        label.set_animated(False)
+
+    # Blitted vehicles are drawn over everything else.
+    renderer.vehicles.set_segments(renderer.vehicle_segments())
+    renderer.vehicles.set_zorder(10)
+    renderer.vehicles.set_animated(False)
+
+    renderer.fig.canvas.draw()
+    pixels = np.array(renderer.fig.canvas.buffer_rgba())
+    renderer.close()
+
+    return pixels
+
+def test_blitted_frames_match_full_redraw():
+    network = Benchmark.build_network(model="Model1", grid_dimensions=(2,2), light="adaptive_2", arrival_rate=0.5, seed=1)
+    renderer = Renderer.Renderer()
+    renderer.initialize(network=network, fig_width=4, dpi=60)
+    services = set()
+
+    try:
+        for frame in range(25):
+            # Three time-steps per frame, as with frame_interval=3.
+            network.simulate(delta_t=0.1, end_time=network.time+0.3)
+            pixels = np.array(renderer.draw_frame())
+            services.add(tuple(bool(traffic_light.service) for traffic_light in renderer.traffic_light_list))
+
+            assert np.array_equal(pixels, full_redraw(network, fig_width=4, dpi=60)), frame
+    finally:
+        renderer.close()
+
+    assert len(services) > 1
+    assert len(network.vehicles) > 0
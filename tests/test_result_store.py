@@ -0,0 +1,52 @@
+import numpy as np
+import Benchmark
+import ModelEvaluation
+import ResultStore
+
+def write_trials(directory, trials: list, compress: bool) -> None:
+    store = ResultStore.ResultStore()
+    store.initialize(directory=directory, shard_size=1, compress=compress)
+
+    for trial in trials:
+        store.append(trial=trial, output={"avg_wait_time": float(trial), (0,0): {"queue_length": np.arange(5.)+10*trial}})
+
+    store.flush()
+
+def test_columns_are_lazy_and_sorted(tmp_path):
+    # Pooled trials finish out of order, and each is written to its own shard.
+    trials = [2, 0, 3, 1]
+
+    for compress in [False, True]:
+        directory = tmp_path / str(compress)
+        write_trials(directory, trials, compress=compress)
+        store = ResultStore.load(directory)
+
+        column = store.column("0,0/queue_length", sort=True)
+        assert isinstance(column, ResultStore.Column)
+        assert column.shape == (4, 5)
+        assert all(isinstance(array, np.memmap) != compress for array in column.shards)
+        assert np.array_equal(column[:, 1], [1., 11., 21., 31.])
+        assert np.array_equal(column[2], np.arange(5.)+20)
+        assert np.array_equal(np.asarray(column), np.arange(5.)+10*np.arange(4)[:,None])
+        assert np.array_equal(store.column("avg_wait_time")[:], trials)
+
+        store.consolidate()
+        column = store.column("0,0/queue_length")
+        assert len(column.shards) == 1
+        assert compress or isinstance(column[:], np.memmap)
+        assert np.array_equal(column[:], np.arange(5.)+10*np.arange(4)[:,None])
+
+def test_read_results_matches_evaluation(tmp_path):
+    network = Benchmark.build_network(model="Model1", grid_dimensions=(2,2), light="periodic", arrival_rate=0.1, seed=0)
+    evaluator = ModelEvaluation.Evaluator()
+    evaluator.initialize(network)
+    evaluator.simulate(num_trials=3, end_time=20, delta_t=0.1, seed=1, store=str(tmp_path))
+
+    loaded = ModelEvaluation.Evaluator().read_results(str(tmp_path))
+    queue_length = loaded.output[(0,0)]["N"]["queue_length"]
+
+    assert all(isinstance(array, np.memmap) for array in queue_length.shards)
+    assert np.array_equal(queue_length[:], evaluator.output[(0,0)]["N"]["queue_length"])
+    assert np.array_equal(loaded.output["avg_wait_time"][:], evaluator.output["avg_wait_time"])
+    assert np.allclose(loaded.statistics[(0,0)]["N"]["queue_length"].mean, np.mean(evaluator.output[(0,0)]["N"]["queue_length"], axis=0))
+    assert loaded.compute_average()[(0,0)]["avg_queue_length"] == evaluator.compute_average()[(0,0)]["avg_queue_length"]
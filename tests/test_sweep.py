@@ -0,0 +1,19 @@
+import Benchmark
+import ModelEvaluation
+import Sweep
+from test_evaluation import assert_same_output
+
+def test_configurations_match_evaluating_them_alone():
+    network = Benchmark.build_network(model="Model1", grid_dimensions=(2,2), light="periodic", arrival_rate=0.1, seed=0)
+    sweep = Sweep.Sweep()
+    sweep.initialize(network=network, grid={"period": [30, 60]})
+    sweep.simulate(num_trials=3, end_time=30, delta_t=0.1, num_workers=2, seed=5)
+
+    for spec, swept in zip(sweep.specs, sweep.evaluators):
+        evaluator = ModelEvaluation.Evaluator()
+        evaluator.initialize(spec.build())
+        evaluator.simulate(num_trials=3, end_time=30, delta_t=0.1, seed=5)
+
+        assert_same_output(swept.output, evaluator.output)
+
+    assert list(sweep.evaluators[0].output["avg_wait_time"]) != list(sweep.evaluators[1].output["avg_wait_time"])
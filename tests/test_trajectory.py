@@ -0,0 +1,23 @@
+import numpy as np
+from PIL import Image
+import Benchmark
+import Renderer
+import Trajectory
+
+def test_recording_renders_in_chunks(tmp_path):
+    network = Benchmark.build_network(model="Model1", grid_dimensions=(2,2), light="adaptive_2", arrival_rate=0.5, seed=1)
+    network.simulate(delta_t=0.1, end_time=3, recording=tmp_path / "recording")
+
+    recording = Trajectory.load(tmp_path / "recording")
+    assert recording.num_frames() == len(network.exits)-1
+    assert all(isinstance(array, np.memmap) for array in [recording.time, recording.services, recording.queue_lengths, recording.segments])
+    assert recording.time[-1] == network.time
+    assert len(recording.frame_segments(recording.num_frames()-1)) > 0
+    assert np.array_equal(recording.frame_segments(recording.num_frames()-1), Renderer.vehicle_segments(network).astype(np.float32))
+    assert recording.queue_lengths[-1].tolist() == [queue.queue.queue_length for queue in Renderer.queues(network)]
+    assert recording.services[-1].tolist() == [bool(traffic_light.service) for traffic_light in Renderer.traffic_lights(network)]
+
+    Trajectory.main([str(tmp_path / "recording"), "--file-name", "recording.gif", "--output-destination", str(tmp_path), "--dpi", "40", "--num-workers", "2"])
+
+    with Image.open(tmp_path / "recording.gif") as image:
+        assert image.n_frames == recording.num_frames()